@@ -0,0 +1,144 @@
+
+import os
+import gc
+import sys
+import json
+import argparse
+from array import array
+
+try:
+    import tracemalloc
+except ImportError:
+    # python 2, only the deep size of objects is reported
+    tracemalloc = None
+
+
+# Measures the memory used by quick select collections loaded from JSON.
+# Must be run with mayapy, with pymetanode and rmbmenuhook on the python path,
+# since the collections module requires maya, e.g.:
+#   mayapy benchmarks/collection_memory.py --collections 10 --sets 100 --members 120
+# Reports the memory of the decoded data, where each set has its own list of node
+# name strings, as sets stored their nodes before collections used a shared string
+# table, and the memory of the collections loaded from the same data. The tracemalloc
+# current and peak sizes are reported when available (python 3), and the deep size of
+# the resulting objects, which counts each object only once, is always reported.
+
+
+def _initializeMaya():
+    import maya.standalone
+    maya.standalone.initialize()
+    scriptsDir = os.path.join(os.path.dirname(__file__), '..', 'src', 'quickmenus', 'scripts')
+    sys.path.insert(0, os.path.abspath(scriptsDir))
+
+
+def generateCollectionData(setCount, memberCount, nodeCount):
+    """
+    Return the JSON text of a collection with many sets, where
+    members are picked from a rig-like hierarchy of node names
+    """
+    nodes = ['|char:root|char:body|char:spine_{0}|char:ctl_{1}'.format(i // 10, i) for i in range(nodeCount)]
+    sets = []
+    for s in range(setCount):
+        sets.append({
+            'id': 'id{0}'.format(s),
+            'title': 'set{0}'.format(s),
+            'nodes': [nodes[(s * 37 + m) % nodeCount] for m in range(memberCount)],
+        })
+    return json.dumps({'sets': sets})
+
+
+def getDeepSize(obj, seen=None):
+    """
+    Return the size in bytes of an object and all objects it references
+    through containers, instance dicts and slots, counting each object once
+    """
+    if seen is None:
+        seen = set()
+    if id(obj) in seen or obj is None or isinstance(obj, type):
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            size += getDeepSize(k, seen) + getDeepSize(v, seen)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for item in obj:
+            size += getDeepSize(item, seen)
+    elif not isinstance(obj, (str, bytes, array, int, float)):
+        if hasattr(obj, '__dict__'):
+            size += getDeepSize(obj.__dict__, seen)
+        for cls in type(obj).__mro__:
+            for name in getattr(cls, '__slots__', ()):
+                size += getDeepSize(getattr(obj, name, None), seen)
+    return size
+
+
+def measure(func):
+    """
+    Return (result, current bytes, peak bytes) of the memory allocated by a function,
+    where current and peak are None if tracemalloc is not available
+    """
+    gc.collect()
+    if tracemalloc is None:
+        return func(), None, None
+    tracemalloc.start()
+    try:
+        result = func()
+        gc.collect()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, current, peak
+
+
+def formatSize(label, result, current, peak):
+    text = '{0}: {1:.1f} MB deep size'.format(label, getDeepSize(result) / 1e6)
+    if current is not None:
+        text += ', {0:.1f} MB traced, {1:.1f} MB peak'.format(current / 1e6, peak / 1e6)
+    return text
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the memory of loaded quick select collections")
+    parser.add_argument('--collections', type=int, default=10, help="number of collections to load")
+    parser.add_argument('--sets', type=int, default=100, help="number of sets per collection")
+    parser.add_argument('--members', type=int, default=120, help="number of members per set")
+    parser.add_argument('--nodes', type=int, default=3000, help="number of unique node names")
+    parser.add_argument('--json', help="load collection data from a JSON file instead of generating it")
+    args = parser.parse_args(argv)
+
+    _initializeMaya()
+    from quickmenus.fmenus import menus
+
+    if args.json:
+        with open(args.json, 'r') as fp:
+            text = fp.read()
+    else:
+        text = generateCollectionData(args.sets, args.members, args.nodes)
+
+    def loadData():
+        return [json.loads(text) for c in range(args.collections)]
+
+    def loadCollections():
+        collections = []
+        for c in range(args.collections):
+            collection = menus.QuickSelectCollection('benchmark{0}'.format(c))
+            collection.loadDict(json.loads(text))
+            collections.append(collection)
+        return collections
+
+    data, dataCurrent, dataPeak = measure(loadData)
+    memberCount = sum([len(s['nodes']) for d in data for s in d.get('sets', [])])
+    print('{0} collections, {1} members'.format(args.collections, memberCount))
+    print(formatSize('decoded data', data, dataCurrent, dataPeak))
+    del data
+
+    collections, current, peak = measure(loadCollections)
+    # make sure the string table returns the same nodes
+    expected = [s['nodes'] for s in json.loads(text).get('sets', [])]
+    assert [s['nodes'] for s in collections[0].getData()['sets']] == expected
+    print(formatSize('collections', collections, current, peak))
+
+
+if __name__ == '__main__':
+    main()
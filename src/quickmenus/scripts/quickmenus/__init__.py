@@ -1,5 +1,7 @@
 
 from core import *
+from events import *
+from telemetry import *
 from utils import *
 
 import fmenus
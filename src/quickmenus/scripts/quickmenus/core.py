@@ -1,23 +1,48 @@
 
 import os
+import time
 import logging
+from collections import OrderedDict
+from functools import partial
 import pymel.core as pm
 
 import rmbmenuhook
+import events
+import telemetry
 import utils
 
 
 __all__ = [
     "buildMenus",
     "destroyMenus",
+    "disablePrewarm",
+    "enablePrewarm",
     "getAllRegisteredMenus",
+    "getMenuData",
+    "getMenuItemsLayout",
+    "getMenuPriority",
+    "getActiveSession",
+    "getMenuVariants",
     "getRegisteredMenus",
+    "invalidateMenuData",
+    "isMenuRegistered",
+    "isPrewarmEnabled",
+    "iterMenuItems",
+    "layoutRadialMenuItems",
     "MarkingMenu",
+    "MenuItem",
+    "MenuItemRenderer",
+    "MenuMixin",
+    "MenuSession",
+    "prewarmMenus",
+    "queuePrewarm",
     "registerMenu",
     "registerMenuHotkeys",
+    "registerMenuVariants",
     "removeMenuHotkeys",
     "RMBMarkingMenu",
     "unregisterMenu",
+    "unregisterMenuVariants",
 ]
 
 
@@ -48,13 +73,34 @@ else:
         {secondary}
 """
 
-# all menus that have been registered,
-# stored as a list of classes indexed by menu name
+# all menus that have been registered, stored as an ordered
+# dict of {class: priority} indexed by menu name
 REGISTERED_MENUS = {}
 
-# list of any active marking menus that
-# can / should be destroyed when menu key is released
-ACTIVE_MENUS = []
+# cached build order of registered menus, stored as
+# a tuple of classes indexed by menu name
+_REGISTERED_MENU_SNAPSHOTS = {}
+
+# groups of menu names that are built together as modifier variants,
+# stored as a tuple of ((shift, ctrl, alt), menuName) indexed by menu name
+MENU_VARIANTS = {}
+
+# the MenuSession of the menu key that is currently held, if any
+_ACTIVE_SESSION = None
+
+# whether sessions that were ended by another menu key before their own key was
+# released were invoked, returned when the release is received, indexed by menu name.
+# Cleared when the key is pressed again, since its release was dropped in that case.
+_ENDED_SESSIONS = {}
+
+# menu data that was gathered ahead of time, indexed by menu data key
+MENU_DATA_CACHE = {}
+
+# the owner of the event callbacks used to invalidate prewarmed menu data
+PREWARM_EVENT_OWNER = 'quickmenus.prewarm'
+
+# whether a prewarm is currently queued to run during idle time
+_IS_PREWARM_QUEUED = False
 
 
 # Hotkey Management
@@ -177,75 +223,269 @@ def removeMenuHotkeys(menuName, hotkey):
 # Building / Destroying Menus
 # ---------------------------
 
+class MenuSession(object):
+    """
+    The state of a single hold of a menu key, from building its menus until
+    they are destroyed when the key is released. Repeated presses of the same
+    key, e.g. from key repeat or a dropped release, reuse the session instead
+    of rebuilding menus, so that a menu that is being shown is never destroyed.
+    Such presses can't be told apart from key repeat, so they continue the same
+    hold, but a press after another key has ended the session starts a new hold.
+    """
+
+    def __init__(self, menuNames, panel, modifiers=None):
+        # the names of all menus built for the key, e.g. all modifier variants
+        self.menuNames = frozenset(menuNames)
+        # the panel under the pointer when the menus were built
+        self.panel = panel
+        # the modifiers the menus were bound to, or None if
+        # the menus are modifier variants and bound individually
+        self.modifiers = modifiers
+        # the MarkingMenu instances that were built
+        self.menus = []
+        # the names of menus registered with rmbmenuhook
+        self.rmbMenuNames = set()
+        # whether an rmb menu was shown during this session, or
+        # a menu was shown during a previous session of the same key
+        self.isInvoked = False
+        # the number of presses received by this session
+        self.pressCount = 1
+
+    def __repr__(self):
+        return '<MenuSession {0} {1}>'.format(sorted(self.menuNames), self.panel)
+
+    def canReuse(self, menuNames, panel, modifiers=None):
+        """
+        Return True if this session already built the menus for a key press
+        """
+        return (self.menuNames == frozenset(menuNames) and self.panel == panel and
+                self.modifiers == modifiers and all([m.exists() for m in self.menus]))
+
+    def wasInvoked(self):
+        """
+        Return True if any menu of this session was shown
+        """
+        return self.isInvoked or any([m.wasInvoked for m in self.menus])
+
+    def build(self, menuName, modifiers=None):
+        """
+        Build the marking menus registered for a menu name
+
+        Args:
+            menuName: A string name of the registered marking menu
+            modifiers: An optional tuple of (shift, ctrl, alt) bools to
+                bind the popup menus to, defaults to the current modifiers
+        """
+        # find any registered menus by name
+        classes = getRegisteredMenus(menuName)
+        LOG.debug('Building menu classes {0}: {1}'.format(menuName, classes))
+        for menuCls in classes:
+            if issubclass(menuCls, rmbmenuhook.Menu):
+                # for rmb menus, just register with the manager
+                rmbmenuhook.registerMenu(menuName, menuCls)
+                self.rmbMenuNames.add(menuName)
+            else:
+                inst = menuCls()
+                if modifiers is not None:
+                    inst.setModifiers(*modifiers)
+                if inst.shouldBuild():
+                    LOG.debug('Building: {0}'.format(inst))
+                    self.menus.append(inst)
+                    inst.build()
+
+    def end(self):
+        """
+        Destroy all menus of this session
+
+        Returns:
+            True if any of the menus were shown at least once.
+        """
+        wasInvoked = self.wasInvoked()
+        for m in self.menus:
+            LOG.debug('Destroying menu: {0}'.format(m))
+            m.destroy()
+        self.menus = []
+        for name in self.rmbMenuNames | self.menuNames:
+            rmbmenuhook.unregisterMenu(name)
+        self.rmbMenuNames.clear()
+        return wasInvoked
+
+
+def getActiveSession():
+    """
+    Return the MenuSession of the menu key that is currently held, or None
+    """
+    return _ACTIVE_SESSION
+
+
 def buildMenus(menuName):
     """
     Build any marking menus that were registered for a menu name.
+    If the menu name is part of a group of modifier variants, all
+    menus in the group are built, each bound to its own modifiers.
+    Does nothing if the menus are already built for the same key,
+    panel, and modifiers, see `MenuSession`.
 
     Args:
         menuName: A string name of the registered marking menu
     """
-    # perform destroy before building because sometimes
-    # the release-hotkey gets skipped if the current
-    # key modifiers change while the menu is active
-    destroyMenus(menuName)
-
-    # find any registered menus by name
-    classes = getRegisteredMenus(menuName)
-    LOG.debug('Building menu classes {0}: {1}'.format(menuName, classes))
-    for menuCls in classes:
-        if issubclass(menuCls, rmbmenuhook.Menu):
-            # for rmb menus, just register with the manager
-            rmbmenuhook.registerMenu(menuName, menuCls)
-        else:
-            inst = menuCls()
-            if inst.shouldBuild():
-                LOG.debug('Building: {0}'.format(inst))
-                ACTIVE_MENUS.append(inst)
-                inst.build()
+    global _ACTIVE_SESSION
+    # apply any scene changes that are waiting to invalidate menu data
+    events.flushEvents()
+    variants = MENU_VARIANTS.get(menuName)
+    panel = pm.getPanel(up=True)
+    if variants:
+        menuNames = [name for modifiers, name in variants]
+        # variants are bound to their own modifiers, so
+        # modifiers can change without rebuilding any menus
+        modifiers = None
+    else:
+        menuNames = [menuName]
+        modifiers = utils.getModifiers()
+
+    session = _ACTIVE_SESSION
+    if session and session.canReuse(menuNames, panel, modifiers):
+        LOG.debug('Menus already built: {0}'.format(session))
+        session.pressCount += 1
+        return
+
+    # end any previous session, since the release of its
+    # key may have been skipped, e.g. if modifiers changed
+    previous = _ACTIVE_SESSION
+    wasInvoked = _endActiveSession()
+    session = MenuSession(menuNames, panel, modifiers)
+    # the release of an earlier session of this key will never be received,
+    # since this key was pressed again, so this press starts a new hold
+    for name in menuNames:
+        _ENDED_SESSIONS.pop(name, None)
+    # unless the session that was just ended is for the same key, in which case
+    # it is the same hold, e.g. after moving the pointer to another panel
+    if previous and previous.menuNames == session.menuNames:
+        session.isInvoked = wasInvoked
+    _ACTIVE_SESSION = session
+    if variants:
+        for variantModifiers, name in variants:
+            session.build(name, variantModifiers)
+    else:
+        session.build(menuName)
 
 
 def destroyMenus(menuName):
     """
-    Destroy any marking menus that are currently built.
+    Destroy the marking menus that were built for a menu name.
+    Menus of other keys that are currently held are not affected.
 
     Returns:
         True if any of the menus that were destroyed were
         shown at least once.
     """
-    wasAnyInvoked = False
-    
-    global ACTIVE_MENUS
-    for m in ACTIVE_MENUS:
-        wasAnyInvoked = wasAnyInvoked or m.wasInvoked
-        LOG.debug('Destroying menu: {0}'.format(m))
-        m.destroy()
-    ACTIVE_MENUS = []
-
-    # check RMBMarkingMenu flag for invocation
-    wasAnyInvoked = wasAnyInvoked or RMBMarkingMenu.wasInvoked
-    RMBMarkingMenu.wasInvoked = False
+    global _ACTIVE_SESSION
+    session = _ACTIVE_SESSION
+    if session and menuName in session.menuNames:
+        _ACTIVE_SESSION = None
+        return session.end()
     rmbmenuhook.unregisterMenu(menuName)
+    # the session may have been ended by another key before this release
+    return _ENDED_SESSIONS.pop(menuName, False)
+
+
+def _endActiveSession():
+    """
+    End the active session, and remember whether it was
+    invoked until the release of its key is received
+
+    Returns:
+        True if any menu of the session was shown
+    """
+    global _ACTIVE_SESSION
+    session = _ACTIVE_SESSION
+    if not session:
+        return False
+    _ACTIVE_SESSION = None
+    wasInvoked = session.end()
+    for name in session.menuNames:
+        _ENDED_SESSIONS[name] = wasInvoked
+    return wasInvoked
+
+
+def _markSessionInvoked():
+    """
+    Record that an rmb menu was shown during the active session
+    """
+    if _ACTIVE_SESSION:
+        _ACTIVE_SESSION.isInvoked = True
+
+
 
-    return wasAnyInvoked
+# Menu Variants
+# -------------
+
+def registerMenuVariants(variants):
+    """
+    Register a group of menu names as modifier variants of each other.
+    When any menu in the group is built, all menus in the group are built
+    at once, each bound to its own modifiers, and kept alive until the
+    menu key is released. Maya then picks the popup menu that matches
+    the current modifiers, so changing modifiers while the menu key
+    is held does not rebuild any menus. Since the menus exist at the
+    same time, each must use a different popupMenuId.
+
+    Args:
+        variants: A dict of {modifiers: menuName}, where modifiers is a string
+            representing modifier keys, e.g. 'Alt+Shift', or '' for no modifiers
+    """
+    group = tuple(sorted([(utils.getModifiersFromString(k), v) for k, v in variants.items()]))
+    for modifiers, menuName in group:
+        unregisterMenuVariants(menuName)
+    for modifiers, menuName in group:
+        MENU_VARIANTS[menuName] = group
+
+
+def unregisterMenuVariants(menuName):
+    """
+    Unregister the group of modifier variants that contains a menu name
+
+    Args:
+        menuName: A string name of any menu in the group of variants
+    """
+    group = MENU_VARIANTS.get(menuName)
+    if group:
+        for modifiers, name in group:
+            del MENU_VARIANTS[name]
+
+
+def getMenuVariants(menuName):
+    """
+    Return the group of modifier variants that contains a menu name,
+    as a tuple of ((shift, ctrl, alt), menuName) tuples, or None
+    if the menu is not part of a group.
+
+    Args:
+        menuName: A string name of any menu in the group of variants
+    """
+    return MENU_VARIANTS.get(menuName)
 
 
 
 # Menu Registration
 # -----------------
 
-def registerMenu(menuName, cls):
+def registerMenu(menuName, cls, priority=0):
     """
-    Register a MarkingMenu class by name
+    Register a MarkingMenu class by name. Menus are built in order of
+    priority, highest first, and then in the order they were registered.
+    Registering a class again only updates its priority.
 
     Args:
         menuName: A string name of the registered marking menu
         cls: A MarkingMenu subclass to register for being built later
+        priority: An int priority used to determine build order
     """
     global REGISTERED_MENUS
-    # get existing list of registered menus of same name
-    existing = REGISTERED_MENUS.get(menuName, [])
-    # prevent duplicates
-    REGISTERED_MENUS[menuName] = list(set(existing + [cls]))
+    if menuName not in REGISTERED_MENUS:
+        REGISTERED_MENUS[menuName] = OrderedDict()
+    REGISTERED_MENUS[menuName][cls] = priority
+    _REGISTERED_MENU_SNAPSHOTS.pop(menuName, None)
 
 
 def unregisterMenu(menuName, cls=None, all=False):
@@ -263,39 +503,606 @@ def unregisterMenu(menuName, cls=None, all=False):
     global REGISTERED_MENUS
     if menuName in REGISTERED_MENUS:
         if all:
-            REGISTERED_MENUS[menuName] = []
-        elif cls in REGISTERED_MENUS[menuName]:
-            REGISTERED_MENUS[menuName].remove(cls)
-        # remove list if empty
+            REGISTERED_MENUS[menuName].clear()
+        else:
+            REGISTERED_MENUS[menuName].pop(cls, None)
+        # remove registry if empty
         if not REGISTERED_MENUS[menuName]:
             del REGISTERED_MENUS[menuName]
+        _REGISTERED_MENU_SNAPSHOTS.pop(menuName, None)
+
+
+def isMenuRegistered(menuName, cls):
+    """
+    Return True if a MarkingMenu class is registered under the given name
+
+    Args:
+        menuName: A string name of the registered marking menu
+        cls: A MarkingMenu subclass
+    """
+    return cls in REGISTERED_MENUS.get(menuName, ())
+
+
+def getMenuPriority(menuName, cls):
+    """
+    Return the priority a MarkingMenu class was registered with,
+    or None if it is not registered under the given name
+
+    Args:
+        menuName: A string name of the registered marking menu
+        cls: A MarkingMenu subclass
+    """
+    return REGISTERED_MENUS.get(menuName, {}).get(cls)
 
 
 def getRegisteredMenus(menuName):
     """
-    Return the menu class that is registered under
-    the given name
+    Return a tuple of the menu classes that are registered under
+    the given name, in build order. The result is a cached snapshot
+    that is only rebuilt when the registry changes.
 
     Args:
         menuName: A string name of the registered marking menu
     """
-    global REGISTERED_MENUS
-    if menuName in REGISTERED_MENUS:
-        return REGISTERED_MENUS[menuName][:]
-    return []
+    snapshot = _REGISTERED_MENU_SNAPSHOTS.get(menuName)
+    if snapshot is None:
+        registered = REGISTERED_MENUS.get(menuName, {})
+        # sorting is stable, so registration order is kept for equal priorities
+        snapshot = tuple(sorted(registered, key=lambda cls: -registered[cls]))
+        _REGISTERED_MENU_SNAPSHOTS[menuName] = snapshot
+    return snapshot
 
 
 def getAllRegisteredMenus():
     """
-    Return all registered menus
+    Return all registered menus as a list of
+    (menuName, classes) tuples in build order
     """
-    global REGISTERED_MENUS
-    return REGISTERED_MENUS.items()
+    return [(menuName, getRegisteredMenus(menuName)) for menuName in REGISTERED_MENUS]
+
+
+
+
+# Menu Data Prewarming
+# --------------------
+
+def enablePrewarm():
+    """
+    Enable gathering menu data during idle time for all registered
+    menus that define `prewarmEvents`. Prewarmed data is invalidated
+    and gathered again whenever one of those events occurs.
+    Call again after registering new menus to update the events.
+    """
+    disablePrewarm()
+    prewarmEvents = set()
+    for menuCls in _getPrewarmMenuClasses():
+        prewarmEvents.update(menuCls.prewarmEvents)
+    for event in sorted(prewarmEvents):
+        events.addEventCallback(event, partial(_onPrewarmEvent, event), PREWARM_EVENT_OWNER)
+    LOG.debug('Prewarming menu data on events: {0}'.format(', '.join(sorted(prewarmEvents))))
+    queuePrewarm()
+
+
+def disablePrewarm():
+    """
+    Disable gathering menu data during idle time, and
+    clear any menu data that was already gathered.
+    """
+    events.removeEventCallbacks(PREWARM_EVENT_OWNER)
+    MENU_DATA_CACHE.clear()
+
+
+def isPrewarmEnabled():
+    """
+    Return True if menu data is being gathered during idle time
+    """
+    return events.hasEventCallbacks(PREWARM_EVENT_OWNER)
+
+
+def queuePrewarm():
+    """
+    Queue gathering any missing menu data at the lowest idle priority
+    """
+    global _IS_PREWARM_QUEUED
+    if not _IS_PREWARM_QUEUED and isPrewarmEnabled():
+        _IS_PREWARM_QUEUED = True
+        pm.evalDeferred(prewarmMenus, lowestPriority=True)
+
+
+def prewarmMenus():
+    """
+    Gather menu data for all registered menus that support
+    prewarming, for every visible model panel.
+    """
+    global _IS_PREWARM_QUEUED
+    _IS_PREWARM_QUEUED = False
+    if not isPrewarmEnabled():
+        return
+    modelPanels = pm.getPanel(type='modelPanel') or []
+    panels = [p for p in pm.getPanel(vis=True) or [] if p in modelPanels]
+    for menuCls in _getPrewarmMenuClasses():
+        for panel in panels:
+            try:
+                inst = _createPrewarmInstance(menuCls, panel)
+                if not inst.shouldBuild():
+                    continue
+                key = inst.getMenuDataKey()
+                if key in MENU_DATA_CACHE:
+                    continue
+                data = inst.getMenuData(isPrewarm=True)
+                if data is not None:
+                    MENU_DATA_CACHE[key] = data
+            except Exception as e:
+                LOG.debug('Failed to prewarm {0}: {1}'.format(menuCls.__name__, e))
+
+
+def invalidateMenuData(menuCls=None):
+    """
+    Clear any prewarmed menu data, and queue gathering it again
+
+    Args:
+        menuCls: A menu class whose data should be cleared,
+            if None, all menu data is cleared
+    """
+    if menuCls is None:
+        MENU_DATA_CACHE.clear()
+    else:
+        for key in [k for k in MENU_DATA_CACHE if k[0] is menuCls]:
+            del MENU_DATA_CACHE[key]
+    queuePrewarm()
+
+
+def getMenuData(menu):
+    """
+    Return the menu data for a menu, using prewarmed data if available.
+
+    Args:
+        menu: A MarkingMenu or RMBMarkingMenu instance
+    """
+    key = menu.getMenuDataKey()
+    if key in MENU_DATA_CACHE:
+        return MENU_DATA_CACHE[key]
+    data = menu.getMenuData()
+    # only cache data that will be invalidated when it changes
+    if data is not None and menu.prewarmEvents and isPrewarmEnabled():
+        MENU_DATA_CACHE[key] = data
+    return data
 
 
+def _onPrewarmEvent(event):
+    for menuCls in _getPrewarmMenuClasses():
+        if event in menuCls.prewarmEvents:
+            invalidateMenuData(menuCls)
 
 
-class MarkingMenu(object):
+def _getPrewarmMenuClasses():
+    """
+    Return a list of all registered menu classes that support prewarming
+    """
+    result = []
+    for menuName, classes in getAllRegisteredMenus():
+        for menuCls in classes:
+            if menuCls.prewarmEvents and menuCls not in result:
+                result.append(menuCls)
+    return result
+
+
+def _createPrewarmInstance(menuCls, panel):
+    """
+    Return an instance of a menu class for gathering menu data
+    """
+    if issubclass(menuCls, rmbmenuhook.Menu):
+        inst = menuCls(None)
+    else:
+        inst = menuCls()
+    inst.setPanel(panel)
+    return inst
+
+
+
+
+# Menu Item Model
+# ---------------
+
+class MenuItem(object):
+    """
+    A description of a single menu item, which is rendered into
+    a popup menu by a MenuItemRenderer. Menu items can be built
+    and compared without creating any UI.
+    """
+
+    def __init__(self, label=None, radialPosition=None, command=None, checkBox=None,
+                 radioButton=None, optionBox=None, subMenu=None, enabled=True,
+                 divider=False, enableCommandRepeat=True, annotation=None, italicized=False,
+                 lazySubMenu=None):
+        # the display label of the item
+        self.label = label
+        # the radial position of the item, e.g. 'N', or None for the overflow list
+        self.radialPosition = radialPosition
+        # callable called when the item is picked, with the new
+        # checked state as the only argument for checkbox items
+        self.command = command
+        # the checked state of a checkbox item, or None if not a checkbox
+        self.checkBox = checkBox
+        # the checked state of a radio button item, or None if not a radio button
+        self.radioButton = radioButton
+        # callable called when the item's option box is picked, or None for no option box
+        self.optionBox = optionBox
+        # list of MenuItems to display in a sub menu, or None if not a sub menu
+        self.subMenu = subMenu
+        # callable that returns a list of MenuItems to display in a sub menu,
+        # called each time the sub menu is opened, or None if not a lazy sub menu
+        self.lazySubMenu = lazySubMenu
+        self.enabled = enabled
+        self.divider = divider
+        self.enableCommandRepeat = enableCommandRepeat
+        self.annotation = annotation
+        self.italicized = italicized
+
+    def __repr__(self):
+        return '<MenuItem {0!r} {1}>'.format(self.label, self.radialPosition)
+
+    def getLayout(self):
+        """
+        Return a tuple of the properties that cannot be
+        edited in place once the item has been created
+        """
+        return (
+            self.radialPosition, self.divider, self.italicized, self.enableCommandRepeat,
+            self.checkBox is None, self.radioButton is None, self.optionBox is None,
+            getMenuItemsLayout(self.subMenu) if self.subMenu is not None else None,
+            self.lazySubMenu is None,
+        )
+
+    def getState(self):
+        """
+        Return a tuple of the properties that can be edited in place
+        """
+        return (self.label, self.checkBox, self.radioButton, self.enabled, self.annotation)
+
+    def getStateKwargs(self):
+        """
+        Return the kwargs for editing the properties
+        returned by `getState` using `menuItem -e`
+        """
+        kwargs = {
+            'l': self.label if self.label is not None else '',
+            'en': self.enabled,
+            'ann': self.annotation if self.annotation is not None else '',
+        }
+        if self.checkBox is not None:
+            kwargs['cb'] = self.checkBox
+        if self.radioButton is not None:
+            kwargs['rb'] = self.radioButton
+        return kwargs
+
+    def getEditKwargs(self, previous):
+        """
+        Return the kwargs for editing only the properties that differ
+        from a previously rendered item with the same layout
+
+        Args:
+            previous: A MenuItem with the same layout as this item
+        """
+        kwargs = self.getStateKwargs()
+        previousKwargs = previous.getStateKwargs()
+        return dict([(k, v) for k, v in kwargs.items() if previousKwargs.get(k) != v])
+
+    def getKwargs(self):
+        """
+        Return the kwargs for creating this item using `menuItem`
+        """
+        if self.divider:
+            return {'d': True}
+        kwargs = self.getStateKwargs()
+        kwargs['ecr'] = self.enableCommandRepeat
+        if self.radialPosition:
+            kwargs['rp'] = self.radialPosition
+        if self.italicized:
+            kwargs['itl'] = True
+        if self.subMenu is not None or self.lazySubMenu is not None:
+            kwargs['subMenu'] = True
+        return kwargs
+
+
+def getMenuItemsLayout(items):
+    """
+    Return a tuple representing the layout of a list of MenuItems.
+    Lists of items with the same layout can be edited in place.
+    """
+    return tuple([item.getLayout() for item in items])
+
+
+def layoutRadialMenuItems(items, layout=None, keys=None, overflowLabel='More', positions=None):
+    """
+    Assign radial positions to a list of MenuItems, and return the list of
+    items to display. When there are more than 8 items, the remaining items
+    are placed in nested radial sub menus so that they can all be reached
+    with a gesture. See `utils.getRadialMenuPaths`.
+
+    Args:
+        items: A list of MenuItems to position, any existing radial
+            positions are replaced
+        layout: An optional RadialLayout, used to keep items in the same
+            position when other items are added or removed
+        keys: A list of keys identifying each item in the layout,
+            defaults to the item labels
+        overflowLabel: A string label for the overflow sub menu items
+        positions: An optional list of the top level radial positions that are
+            available, when other items of the menu have fixed positions. If
+            empty, the items are placed in the overflow list without positions.
+    """
+    if positions is not None and not positions:
+        for item in items:
+            item.radialPosition = None
+        return list(items)
+    if layout is None:
+        paths = utils.getRadialMenuPaths(len(items), positions=positions)
+    else:
+        paths = layout.layout(keys if keys is not None else [item.label for item in items], positions)
+    result = []
+    # overflow sub menu item lists, indexed by radial path
+    subMenus = {}
+    for item, path in zip(items, paths):
+        siblings = result
+        for i in range(1, len(path)):
+            if path[:i] not in subMenus:
+                subMenus[path[:i]] = []
+                siblings.append(MenuItem(overflowLabel, path[i - 1], subMenu=subMenus[path[:i]], italicized=True))
+            siblings = subMenus[path[:i]]
+        item.radialPosition = path[-1]
+        siblings.append(item)
+    return result
+
+
+def iterMenuItems(items):
+    """
+    Iterate over a list of MenuItems and all items in
+    their sub menus, depth first
+    """
+    for item in items:
+        yield item
+        if item.subMenu:
+            for subItem in iterMenuItems(item.subMenu):
+                yield subItem
+
+
+
+
+class MenuItemRenderer(object):
+    """
+    Renders a list of MenuItems into a popup menu. Rendering the
+    same items again does nothing, and items with the same layout
+    are edited in place instead of being rebuilt.
+    """
+
+    def __init__(self, menu, isSubMenu=False, owner=None, radialPath=()):
+        # the popup menu to render items into
+        self.menu = menu
+        # whether the menu is a sub menu item instead of a popup menu
+        self.isSubMenu = isSubMenu
+        # the MarkingMenu or RMBMarkingMenu that items are rendered for, used to record picks
+        self.owner = owner
+        # the radial positions of the parent sub menu items, for lazy sub menus
+        self.radialPath = radialPath
+        # the list of currently rendered MenuItems
+        self.items = None
+        # flat list of rendered items, the lists of items they
+        # belong to, and their menu item paths
+        self.flatItems = []
+        self.flatSiblings = []
+        self.handles = []
+        # whether the menu contains any items that must be cleared
+        self.hasItems = False
+        # renderers for lazy sub menus that have been opened, indexed by flat item index
+        self.subRenderers = {}
+
+    def clear(self):
+        """
+        Delete all menu items from the menu
+        """
+        if self.hasItems:
+            if self.isSubMenu:
+                pm.menu(self.menu, e=True, deleteAllItems=True)
+            else:
+                pm.popupMenu(self.menu, e=True, deleteAllItems=True)
+        self.hasItems = False
+        self.items = None
+        self.flatItems = []
+        self.flatSiblings = []
+        self.handles = []
+        self.subRenderers = {}
+
+    def render(self, items):
+        """
+        Render a list of MenuItems into the menu
+
+        Args:
+            items: A list of MenuItem objects
+        """
+        if self.items is not None and getMenuItemsLayout(items) == getMenuItemsLayout(self.items):
+            self._editItems(items)
+        else:
+            self.clear()
+            pm.setParent(self.menu, m=True)
+            self._buildItems(items)
+            self.hasItems = True
+        self.items = items
+
+    def _editItems(self, items):
+        flatItems = []
+        flatSiblings = []
+        self._flattenItems(items, flatItems, flatSiblings)
+        for handle, oldItem, newItem in zip(self.handles, self.flatItems, flatItems):
+            if newItem.getState() != oldItem.getState():
+                pm.menuItem(handle, e=True, **newItem.getEditKwargs(oldItem))
+        self.flatItems = flatItems
+        self.flatSiblings = flatSiblings
+
+    def _flattenItems(self, items, flatItems, flatSiblings):
+        for item in items:
+            flatItems.append(item)
+            flatSiblings.append(items)
+            if item.subMenu is not None:
+                self._flattenItems(item.subMenu, flatItems, flatSiblings)
+
+    def _buildItems(self, items):
+        collection = None
+        for item in items:
+            index = len(self.flatItems)
+            kwargs = item.getKwargs()
+            if item.radioButton is not None:
+                if collection is None:
+                    collection = pm.radioMenuItemCollection()
+                kwargs['cl'] = collection
+            if item.command is not None and not item.divider:
+                kwargs['c'] = pm.CallbackWithArgs(self._runCommand, index)
+            if item.lazySubMenu is not None:
+                kwargs['pmc'] = pm.Callback(self._renderSubMenu, index)
+            handle = pm.menuItem(**kwargs)
+            self.flatItems.append(item)
+            self.flatSiblings.append(items)
+            self.handles.append(handle)
+            if item.optionBox is not None:
+                pm.menuItem(ob=True, c=pm.Callback(self._runOptionBox, index))
+            if item.subMenu is not None:
+                self._buildItems(item.subMenu)
+                pm.setParent('..', m=True)
+            elif item.lazySubMenu is not None:
+                pm.setParent('..', m=True)
+
+    def getRadialPath(self, index):
+        """
+        Return a tuple of the radial positions of a rendered item
+        and all its parent sub menu items, e.g. ('NW', 'E')
+
+        Args:
+            index: An int index of the item in `flatItems`
+        """
+        path = [self.flatItems[index].radialPosition]
+        siblings = self.flatSiblings[index]
+        # parent items are always flattened before their sub menu items
+        for i in range(index - 1, -1, -1):
+            if self.flatItems[i].subMenu is siblings:
+                path.insert(0, self.flatItems[i].radialPosition)
+                siblings = self.flatSiblings[i]
+        return tuple(self.radialPath) + tuple(path)
+
+    def _runCommand(self, index, *args):
+        # look up the item at run time, so that commands stay
+        # current when items are edited in place
+        item = self.flatItems[index]
+        if self.owner is not None and telemetry.isTelemetryEnabled():
+            self._recordPick(index)
+        # keep the rendered state in sync with the state maya has already
+        # changed, so that later edits are only made when actually needed
+        if item.checkBox is not None and args:
+            item.checkBox = bool(args[0])
+        if item.radioButton is not None:
+            for sibling in self.flatSiblings[index]:
+                if sibling.radioButton is not None:
+                    sibling.radioButton = sibling is item
+        if item.checkBox is not None:
+            item.command(*args)
+        else:
+            item.command()
+
+    def _recordPick(self, index):
+        showTime = self.owner.showTime
+        pickTime = time.time() - showTime if showTime is not None else None
+        telemetry.recordPick(self.owner.__class__, self.flatItems[index].label, self.getRadialPath(index), pickTime,
+                             self.owner.getTelemetryGroup())
+
+    def _runOptionBox(self, index):
+        self.flatItems[index].optionBox()
+
+    def _renderSubMenu(self, index):
+        # lazy sub menus are rendered each time they open, which
+        # only edits items in place if they have not changed
+        if index not in self.subRenderers:
+            self.subRenderers[index] = MenuItemRenderer(
+                self.handles[index], isSubMenu=True, owner=self.owner, radialPath=self.getRadialPath(index))
+        self.subRenderers[index].render(self.flatItems[index].lazySubMenu())
+
+
+
+
+class MenuMixin(object):
+    """
+    Functionality shared by MarkingMenu and RMBMarkingMenu for gathering
+    the scene data used to build menu items, which can be done ahead
+    of time during idle (see `enablePrewarm`), and for rendering
+    the menu items returned by `getMenuItems`.
+    """
+
+    # scriptJob events or events from `events.API_EVENTS` after which the menu
+    # data is out of date, menus without events are never prewarmed or cached
+    prewarmEvents = []
+
+    def setPanel(self, panel):
+        """
+        Set the panel that the menu will be built for
+        """
+        self.panel = panel
+        self.panelType = pm.getPanel(typeOf=self.panel)
+
+    def getMenuData(self, isPrewarm=False):
+        """
+        Override to gather any scene data needed to build menu items.
+        Must not create any UI, and the result must only depend on the
+        menu's panel and the state invalidated by `prewarmEvents`.
+        The result is available as `self.menuData` when building menu items.
+
+        Args:
+            isPrewarm: A bool, True when called during idle time, in which
+                case the scene should not be modified. Return None
+                to skip prewarming.
+        """
+        return None
+
+    def getMenuDataKey(self):
+        """
+        Return the key used to cache this menu's data. Must be a tuple
+        starting with the menu class. Override if the data does
+        not depend on the panel.
+        """
+        return (self.__class__, self.panel)
+
+    def getTelemetryGroup(self):
+        """
+        Return a string identifying the menu data that the items were built from,
+        used to group picks in usage telemetry, since items can only be rearranged
+        within the same data. Override if `getMenuDataKey` does not identify it.
+        """
+        return ' '.join([str(k) for k in self.getMenuDataKey()[1:]])
+
+    def getMenuItems(self):
+        """
+        Override to return a list of MenuItems to display, built from
+        `self.menuData`. Return None to build menu items directly
+        in `buildMenuItems` instead.
+        """
+        return None
+
+    def renderMenuItems(self):
+        """
+        Render the items returned by `getMenuItems` into the popup menu,
+        or call `buildMenuItems` if the menu does not use MenuItems.
+        """
+        items = self.getMenuItems()
+        if items is None:
+            self.itemRenderer.clear()
+            pm.setParent(self.menu, m=True)
+            self.buildMenuItems()
+            # items were built directly, and must be cleared before building again
+            self.itemRenderer.hasItems = True
+        else:
+            self.itemRenderer.render(items)
+
+
+
+
+class MarkingMenu(MenuMixin):
     """
     The base class for any quick marking menu that can
     be registered. Provides core functionality of building
@@ -303,18 +1110,17 @@ class MarkingMenu(object):
     """
 
     def __init__(self):
-        # use current modifiers to determine popup menu modifiers
-        isShiftPressed, isCtrlPressed, isAltPressed = utils.getModifiers()
         self.popupKeyKwargs = {
             'mm': True,
             'aob': True,
             'parent':'viewPanes',
-            'sh':isShiftPressed,
-            'ctl':isCtrlPressed,
-            'alt':isAltPressed,
         }
+        # use current modifiers to determine popup menu modifiers
+        self.setModifiers(*utils.getModifiers())
         # variable to keep track of if this menu ever showed
         self.wasInvoked = False
+        # the time the menu was last shown, used to record pick times
+        self.showTime = None
         # the panel that the popup menu will be attached to
         self.panel = pm.getPanel(up=True)
         # the panel type, can be used when building to determine the menu's contents
@@ -327,6 +1133,8 @@ class MarkingMenu(object):
         self.mouseButton = 1
         # when True, build menu items each time the menu is displayed
         self.buildItemsOnShow = False
+        # the data gathered by `getMenuData`, used to build menu items
+        self.menuData = None
 
     def shouldBuild(self):
         """
@@ -335,6 +1143,15 @@ class MarkingMenu(object):
         """
         return True
 
+    def setModifiers(self, isShiftPressed, isCtrlPressed, isAltPressed):
+        """
+        Set the modifier keys that must be held to display the popup menu.
+        Must be called before the menu is built.
+        """
+        self.popupKeyKwargs['sh'] = isShiftPressed
+        self.popupKeyKwargs['ctl'] = isCtrlPressed
+        self.popupKeyKwargs['alt'] = isAltPressed
+
     def build(self):
         """
         Build the popup menu that all menu items will be attached to
@@ -346,10 +1163,16 @@ class MarkingMenu(object):
         self.destroy()
         self.menu = pm.popupMenu(self.popupMenuId, b=self.mouseButton, **self.popupKeyKwargs)
         self.menu.postMenuCommand(self.onMenuWillShow)
+        self.itemRenderer = MenuItemRenderer(self.menu, owner=self)
         # if not set to build on show, build items now
         if not self.buildItemsOnShow:
-            pm.setParent(self.menu, m=True)
-            self.buildMenuItems()
+            self.menuData = getMenuData(self)
+            self.renderMenuItems()
+        elif self.getMenuDataKey() in MENU_DATA_CACHE:
+            # create items from prewarmed data now, so that showing the
+            # menu only has to edit items whose state has changed
+            self.menuData = MENU_DATA_CACHE[self.getMenuDataKey()]
+            self.renderMenuItems()
 
     def destroy(self):
         """
@@ -358,51 +1181,60 @@ class MarkingMenu(object):
         if pm.popupMenu(self.popupMenuId, q=True, ex=True):
             pm.deleteUI(self.popupMenuId)
 
+    def exists(self):
+        """
+        Return True if the popup menu for this menu currently exists
+        """
+        return bool(pm.popupMenu(self.popupMenuId, q=True, ex=True))
+
     def onMenuWillShow(self, menu, parent):
         self.wasInvoked = True
+        self.showTime = time.time()
         if self.buildItemsOnShow:
-            self.menu.deleteAllItems()
-            pm.setParent(self.menu, m=True)
-            self.buildMenuItems()
+            self.menuData = getMenuData(self)
+            self.renderMenuItems()
 
     def buildMenuItems(self):
         """
-        Build all menu items for the current popup menu.
-        Called each time the menu is about to be displayed.
+        Build all menu items for the current popup menu directly.
+        Not called if `getMenuItems` is implemented.
         """
         pass
 
 
 
-class RMBMarkingMenu(rmbmenuhook.Menu):
+class RMBMarkingMenu(MenuMixin, rmbmenuhook.Menu):
     """
     The base class for a marking menu that uses right mouse button in a model viewport.
     This is slightly different than the normal marking menu, because it is registered
     with rmbmenuhook and is instanced only when invoked.
     """
 
-    # currently using a class variable since the instance isn't
-    # available when the other menus are destroyed
-    wasInvoked = False
-
     def __init__(self, menu, obj=None):
         rmbmenuhook.Menu.__init__(self, menu, obj)
         # the panel that the popup menu will be attached to
         self.panel = pm.getPanel(up=True)
         # the panel type, can be used when building to determine the menu's contents
         self.panelType = pm.getPanel(typeOf=self.panel)
+        # the data gathered by `getMenuData`, used to build menu items
+        self.menuData = None
+        # the time the menu was shown, used to record pick times
+        self.showTime = None
 
     def build(self):
         """
         Build the popup menu that all menu items will be attached to
         """
-        RMBMarkingMenu.wasInvoked = True
-        pm.setParent(self.menu, m=True)
-        self.buildMenuItems()
+        self.showTime = time.time()
+        # the instance isn't available when the session ends, so record it in the session
+        _markSessionInvoked()
+        self.menuData = getMenuData(self)
+        self.itemRenderer = MenuItemRenderer(self.menu, owner=self)
+        self.renderMenuItems()
 
     def buildMenuItems(self):
         """
-        Build all menu items for the current popup menu.
-        Called each time the menu is about to be displayed.
+        Build all menu items for the current popup menu directly.
+        Not called if `getMenuItems` is implemented.
         """
-        pass
\ No newline at end of file
+        pass
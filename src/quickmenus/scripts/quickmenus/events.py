@@ -0,0 +1,217 @@
+
+import logging
+from functools import partial
+import maya.OpenMaya as om
+import pymel.core as pm
+
+
+__all__ = [
+    "addEventCallback",
+    "API_EVENTS",
+    "COALESCED_EVENTS",
+    "flushEvents",
+    "getEventCallbacks",
+    "hasEventCallbacks",
+    "removeEventCallback",
+    "removeEventCallbacks",
+]
+
+
+LOG = logging.getLogger("quickmenus")
+
+
+# events that are not available as scriptJob events, and the api messages
+# that trigger them. Node events can be filtered by node type by appending
+# the type to the event name, e.g. 'NodeRemoved:network'
+API_EVENTS = {
+    'ReferenceChanged': [
+        om.MSceneMessage.kAfterLoadReference, om.MSceneMessage.kAfterUnloadReference,
+        om.MSceneMessage.kAfterCreateReference, om.MSceneMessage.kAfterRemoveReference,
+    ],
+    'PluginLoaded': [om.MSceneMessage.kAfterPluginLoad],
+    'PluginUnloaded': [om.MSceneMessage.kAfterPluginUnload],
+    'NodeAdded': None,
+    'NodeRemoved': None,
+}
+
+# events that can fire in large bursts, e.g. thousands of NodeAdded events
+# when a reference is reloaded. These are dispatched once during idle time,
+# instead of every time they occur. All other events are dispatched immediately.
+COALESCED_EVENTS = set(['NodeAdded', 'NodeRemoved', 'NameChanged', 'DagObjectCreated', 'ReferenceChanged'])
+
+# registered callbacks, stored as a list of (callback, owner) indexed by event
+_EVENT_CALLBACKS = {}
+
+# the scriptJob id or list of api callback ids installed for each event, indexed by event
+_EVENT_JOBS = {}
+
+# coalesced events that occurred since the last flush, in order
+_PENDING_EVENTS = []
+
+# whether a flush is currently queued to run during idle time
+_IS_FLUSH_QUEUED = False
+
+
+def addEventCallback(event, callback, owner=None):
+    """
+    Call a function whenever an event occurs. The scriptJob or api callback
+    for an event is only installed while it has at least one callback.
+    Adding the same callback for the same event again has no effect.
+
+    Args:
+        event: A string scriptJob event name, or one of API_EVENTS
+        callback: A callable that takes no arguments
+        owner: An optional string name of the system registering the
+            callback, so that all its callbacks can be removed at once
+            using `removeEventCallbacks`
+    """
+    callbacks = _EVENT_CALLBACKS.setdefault(event, [])
+    if callback in [c for c, o in callbacks]:
+        return
+    callbacks.append((callback, owner))
+    if event not in _EVENT_JOBS:
+        _installEvent(event)
+
+
+def removeEventCallback(event, callback):
+    """
+    Stop calling a function when an event occurs
+
+    Args:
+        event: A string event name
+        callback: A callable previously added with `addEventCallback`
+    """
+    callbacks = _EVENT_CALLBACKS.get(event, [])
+    _EVENT_CALLBACKS[event] = [(c, o) for c, o in callbacks if c != callback]
+    _cleanupEvent(event)
+
+
+def removeEventCallbacks(owner=None):
+    """
+    Remove all callbacks registered by an owner, and
+    uninstall any events that no longer have callbacks
+
+    Args:
+        owner: A string owner name, if None, all callbacks are removed
+    """
+    for event in list(_EVENT_CALLBACKS):
+        if owner is None:
+            _EVENT_CALLBACKS[event] = []
+        else:
+            _EVENT_CALLBACKS[event] = [(c, o) for c, o in _EVENT_CALLBACKS[event] if o != owner]
+        _cleanupEvent(event)
+
+
+def getEventCallbacks(event=None, owner=None):
+    """
+    Return a list of registered callbacks
+
+    Args:
+        event: A string event name, if None, callbacks of all events are returned
+        owner: A string owner name, if None, callbacks of all owners are returned
+    """
+    events = [event] if event is not None else sorted(_EVENT_CALLBACKS)
+    result = []
+    for e in events:
+        for c, o in _EVENT_CALLBACKS.get(e, []):
+            if (owner is None or o == owner) and c not in result:
+                result.append(c)
+    return result
+
+
+def hasEventCallbacks(owner):
+    """
+    Return True if an owner has any registered callbacks
+    """
+    return bool(getEventCallbacks(owner=owner))
+
+
+def flushEvents():
+    """
+    Dispatch any coalesced events immediately, calling each callback
+    only once, even if several of its events occurred. Called before
+    menus are built so that they never use out of date data.
+    """
+    global _IS_FLUSH_QUEUED
+    _IS_FLUSH_QUEUED = False
+    if not _PENDING_EVENTS:
+        return
+    events = list(_PENDING_EVENTS)
+    del _PENDING_EVENTS[:]
+    LOG.debug('Dispatching coalesced events: {0}'.format(', '.join(events)))
+    _dispatch(events)
+
+
+def _onEvent(event, *args):
+    """
+    Called by the scriptJob or api callbacks of an event
+    """
+    global _IS_FLUSH_QUEUED
+    if _getBaseEvent(event) not in COALESCED_EVENTS:
+        _dispatch([event])
+        return
+    if event not in _PENDING_EVENTS:
+        _PENDING_EVENTS.append(event)
+    if not _IS_FLUSH_QUEUED:
+        _IS_FLUSH_QUEUED = True
+        pm.evalDeferred(flushEvents)
+
+
+def _dispatch(events):
+    called = []
+    for event in events:
+        # copy the list, since callbacks may add or remove callbacks
+        for callback, owner in list(_EVENT_CALLBACKS.get(event, [])):
+            if callback in called:
+                continue
+            called.append(callback)
+            try:
+                callback()
+            except Exception as e:
+                LOG.warning('Error in {0} callback {1}: {2}'.format(event, callback, e))
+
+
+def _getBaseEvent(event):
+    return event.split(':')[0]
+
+
+def _installEvent(event):
+    """
+    Create the scriptJob or api callbacks that trigger an event
+    """
+    baseEvent = _getBaseEvent(event)
+    callback = partial(_onEvent, event)
+    if baseEvent not in API_EVENTS:
+        _EVENT_JOBS[event] = pm.scriptJob(e=(event, callback))
+    elif baseEvent in ('NodeAdded', 'NodeRemoved'):
+        nodeType = event[len(baseEvent) + 1:] or 'dependNode'
+        if baseEvent == 'NodeAdded':
+            callbackId = om.MDGMessage.addNodeAddedCallback(callback, nodeType)
+        else:
+            callbackId = om.MDGMessage.addNodeRemovedCallback(callback, nodeType)
+        _EVENT_JOBS[event] = [callbackId]
+    elif baseEvent in ('PluginLoaded', 'PluginUnloaded'):
+        _EVENT_JOBS[event] = [om.MSceneMessage.addStringArrayCallback(m, callback) for m in API_EVENTS[baseEvent]]
+    else:
+        _EVENT_JOBS[event] = [om.MSceneMessage.addCallback(m, callback) for m in API_EVENTS[baseEvent]]
+    LOG.debug('Installed event: {0}'.format(event))
+
+
+def _cleanupEvent(event):
+    """
+    Remove the scriptJob or api callbacks of an event if it has no callbacks
+    """
+    if _EVENT_CALLBACKS.get(event):
+        return
+    _EVENT_CALLBACKS.pop(event, None)
+    if event in _PENDING_EVENTS:
+        _PENDING_EVENTS.remove(event)
+    job = _EVENT_JOBS.pop(event, None)
+    if job is None:
+        return
+    if isinstance(job, list):
+        for callbackId in job:
+            om.MMessage.removeCallback(callbackId)
+    elif pm.scriptJob(ex=job):
+        pm.scriptJob(kill=job, force=True)
+    LOG.debug('Uninstalled event: {0}'.format(event))
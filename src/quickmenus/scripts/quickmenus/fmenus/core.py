@@ -27,10 +27,15 @@ def enable():
     # TODO: would be nice to define mouse button and hotkey for each here
     core.registerMenu("FMenus", menus.QuickSelectMenu)
     core.registerMenu("FMenus", menus.QuickSelectCollectionsMenu)
+    menus.enableCollectionTracking()
+    core.enablePrewarm()
     print('Quick Menus: F-Menus enabled')
 
 
 def disable():
     core.unregisterMenu("FMenus", all=True)
+    menus.disableCollectionTracking()
+    # update prewarm events for the remaining menus
+    core.enablePrewarm()
     print('Quick Menus: F-Menus disabled')
 
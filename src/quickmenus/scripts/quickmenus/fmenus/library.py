@@ -0,0 +1,304 @@
+
+import os
+import re
+import json
+import logging
+import pymel.core as pm
+
+
+__all__ = [
+    "deleteLibraryData",
+    "getLibraryHeader",
+    "getLibraryIndex",
+    "getLibraryKeys",
+    "getLibraryPath",
+    "invalidateLibrary",
+    "loadLibraryData",
+    "sanitizeLibraryKey",
+    "saveLibraryData",
+    "setLibraryPath",
+]
+
+
+LOG = logging.getLogger("quickmenus")
+
+
+# environment variable that overrides the default library path
+LIBRARY_PATH_ENV = "QUICKMENUS_LIBRARY_PATH"
+# the name of the index file containing the headers of all collections
+INDEX_FILENAME = "index.json"
+# the extension of collection files, which are named by asset key
+COLLECTION_EXT = ".json"
+# characters that are replaced in library keys, since keys are used as filenames
+INVALID_KEY_CHARS_RE = re.compile(r'[^\w\-. ]')
+
+# the current library path, or None to use the default
+_LIBRARY_PATH = None
+# the library index, and the (library dir mtime, index file mtime) it was loaded at.
+# The index is only rebuilt when these change, even if it could not be saved.
+_INDEX_CACHE = None
+_INDEX_CACHE_MTIMES = None
+# (file mtime, data) of each loaded collection, indexed by key
+_DATA_CACHE = {}
+
+
+def getLibraryPath():
+    """
+    Return the directory of the collection library
+    """
+    if _LIBRARY_PATH:
+        return _LIBRARY_PATH
+    if os.environ.get(LIBRARY_PATH_ENV):
+        return os.environ[LIBRARY_PATH_ENV]
+    return os.path.join(pm.internalVar(userAppDir=True), 'quickmenus', 'library')
+
+
+def setLibraryPath(path):
+    """
+    Set the directory of the collection library
+
+    Args:
+        path: A string directory path, or None to use the default
+    """
+    global _LIBRARY_PATH
+    _LIBRARY_PATH = path
+    invalidateLibrary()
+
+
+def invalidateLibrary():
+    """
+    Clear the cached index and collections, so that
+    they are read again the next time they are needed
+    """
+    global _INDEX_CACHE, _INDEX_CACHE_MTIMES
+    _INDEX_CACHE = None
+    _INDEX_CACHE_MTIMES = None
+    _DATA_CACHE.clear()
+
+
+def _getMTime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+
+def sanitizeLibraryKey(key):
+    """
+    Return a library key that can be used as a filename, where path separators
+    and other characters that are not allowed in filenames are replaced.
+    Raises a ValueError if no valid key remains.
+
+    Args:
+        key: A string key of a collection, e.g. an asset name
+    """
+    result = INVALID_KEY_CHARS_RE.sub('_', key).strip('. ')
+    if not result or result + COLLECTION_EXT == INDEX_FILENAME:
+        raise ValueError("invalid library key: {0!r}".format(key))
+    return result
+
+
+def _isValidKey(key):
+    try:
+        return sanitizeLibraryKey(key) == key
+    except ValueError:
+        return False
+
+
+def _getCollectionPath(key):
+    if not _isValidKey(key):
+        raise ValueError("invalid library key: {0!r}".format(key))
+    return os.path.join(getLibraryPath(), key + COLLECTION_EXT)
+
+
+def _getHeader(data, mtime):
+    """
+    Return the index header for a collection's data
+    """
+    def countSets(group):
+        return len(group.get('sets', [])) + sum([countSets(g) for g in group.get('groups', [])])
+    return {
+        'isTemplate': data.get('isTemplate', False),
+        'setCount': countSets(data),
+        'mtime': mtime,
+    }
+
+
+def _writeJson(path, data):
+    dirname = os.path.dirname(path)
+    if not os.path.isdir(dirname):
+        os.makedirs(dirname)
+    # write to a temp file first so that other readers never see a partial file
+    tempPath = path + '.tmp'
+    try:
+        with open(tempPath, 'w') as fp:
+            json.dump(data, fp, separators=(',', ':'), sort_keys=True)
+        if os.path.isfile(path):
+            os.remove(path)
+        os.rename(tempPath, path)
+    except:
+        if os.path.isfile(tempPath):
+            os.remove(tempPath)
+        raise
+    # make sure the file is not older than the directory after the rename,
+    # since the index is only valid when it is newer than the directory
+    os.utime(path, None)
+
+
+def getLibraryIndex():
+    """
+    Return the headers of all collections in the library, indexed by key.
+    Only the index file is read, unless it is older than the library
+    directory, missing, or unreadable, in which case it is rebuilt.
+    """
+    global _INDEX_CACHE, _INDEX_CACHE_MTIMES
+    libraryPath = getLibraryPath()
+    indexPath = os.path.join(libraryPath, INDEX_FILENAME)
+    mtimes = (_getMTime(libraryPath), _getMTime(indexPath))
+    if _INDEX_CACHE is not None and mtimes == _INDEX_CACHE_MTIMES:
+        return _INDEX_CACHE
+    if mtimes[0] is None:
+        # no library
+        _INDEX_CACHE = {}
+    else:
+        index = None
+        if mtimes[1] is not None and mtimes[1] >= mtimes[0]:
+            index = _readIndex(indexPath)
+        if index is None:
+            index = _rebuildIndex(_INDEX_CACHE or {})
+            mtimes = (_getMTime(libraryPath), _getMTime(indexPath))
+        _INDEX_CACHE = index
+    _INDEX_CACHE_MTIMES = mtimes
+    return _INDEX_CACHE
+
+
+def _readIndex(indexPath):
+    """
+    Return the contents of the index file, or None if it can't be read
+    """
+    try:
+        with open(indexPath, 'r') as fp:
+            return json.load(fp)
+    except (IOError, OSError, ValueError) as e:
+        LOG.warning('Failed to read quick select library index {0}: {1}'.format(indexPath, e))
+
+
+def _rebuildIndex(previous):
+    """
+    Rebuild and save the library index, only reading
+    collection files that changed since the previous index.
+    The index is still returned if it can't be saved, e.g.
+    when the library is shared and read only.
+
+    Args:
+        previous: A dict of the previous index, indexed by key
+    """
+    libraryPath = getLibraryPath()
+    index = {}
+    for filename in os.listdir(libraryPath):
+        key, ext = os.path.splitext(filename)
+        if ext != COLLECTION_EXT or filename == INDEX_FILENAME or not _isValidKey(key):
+            continue
+        mtime = _getMTime(os.path.join(libraryPath, filename))
+        if mtime is None:
+            # removed since listing the directory
+            continue
+        header = previous.get(key)
+        if header and header.get('mtime') == mtime:
+            index[key] = header
+            continue
+        try:
+            index[key] = _getHeader(loadLibraryData(key), mtime)
+        except (IOError, OSError, ValueError) as e:
+            # invalid or unreadable files are left out of the index
+            LOG.warning('Failed to read quick select library collection {0}: {1}'.format(key, e))
+    LOG.debug('Rebuilt quick select library index: {0}'.format(libraryPath))
+    indexPath = os.path.join(libraryPath, INDEX_FILENAME)
+    try:
+        _writeJson(indexPath, index)
+    except (IOError, OSError) as e:
+        LOG.warning('Failed to save quick select library index {0}: {1}'.format(indexPath, e))
+    return index
+
+
+def getLibraryKeys():
+    """
+    Return a sorted list of the keys of all collections in the library
+    """
+    return sorted(getLibraryIndex().keys())
+
+
+def getLibraryHeader(key):
+    """
+    Return the index header of a collection in the library, or None
+
+    Args:
+        key: A string key of the collection, e.g. an asset name
+    """
+    return getLibraryIndex().get(key)
+
+
+def loadLibraryData(key):
+    """
+    Return the data of a collection in the library, reading
+    it from disk only if the file changed since it was last read
+
+    Args:
+        key: A string key of the collection, e.g. an asset name
+    """
+    path = _getCollectionPath(key)
+    mtime = _getMTime(path)
+    if mtime is None:
+        return None
+    cached = _DATA_CACHE.get(key)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    with open(path, 'r') as fp:
+        data = json.load(fp)
+    _DATA_CACHE[key] = (mtime, data)
+    return data
+
+
+def saveLibraryData(key, data):
+    """
+    Save the data of a collection to the library, and update the index
+
+    Args:
+        key: A string key of the collection, e.g. an asset name
+        data: A dict of collection data, see `QuickSelectCollection.getData`
+    """
+    # read the index before the directory changes, to avoid rebuilding it
+    index = dict(getLibraryIndex())
+    path = _getCollectionPath(key)
+    _writeJson(path, data)
+    index[key] = _getHeader(data, _getMTime(path))
+    _setIndex(index)
+    _DATA_CACHE.pop(key, None)
+
+
+def deleteLibraryData(key):
+    """
+    Delete a collection from the library, and update the index
+
+    Args:
+        key: A string key of the collection, e.g. an asset name
+    """
+    index = dict(getLibraryIndex())
+    path = _getCollectionPath(key)
+    if os.path.isfile(path):
+        os.remove(path)
+    index.pop(key, None)
+    _setIndex(index)
+    _DATA_CACHE.pop(key, None)
+
+
+def _setIndex(index):
+    """
+    Save the library index, and cache it as is
+    """
+    global _INDEX_CACHE, _INDEX_CACHE_MTIMES
+    libraryPath = getLibraryPath()
+    indexPath = os.path.join(libraryPath, INDEX_FILENAME)
+    _writeJson(indexPath, index)
+    _INDEX_CACHE = index
+    _INDEX_CACHE_MTIMES = (_getMTime(libraryPath), _getMTime(indexPath))
@@ -0,0 +1,287 @@
+
+import os
+import re
+import ast
+import logging
+
+
+__all__ = [
+    "decodeMelString",
+    "encodeMelString",
+    "iterCollections",
+    "readCollections",
+    "rewriteCollections",
+]
+
+
+LOG = logging.getLogger("quickmenus")
+
+
+# this module does not import maya or pymel, so that standalone pipeline tools can
+# read and rewrite collections without maya, e.g. by adding this directory to the
+# python path. These match the constants in `menus`, which requires maya.
+META_CLASSNAME = "QuickSelectCollection"
+COLLECTION_PREFIX = "quickSelectCollection_"
+METADATA_ATTR = "pyMetaData"
+SET_COUNT_ATTR = "quickSelectSetCount"
+TEMPLATE_ATTR = "quickSelectIsTemplate"
+
+# the maximum length of each line of a long string value when writing
+STRING_CHUNK_SIZE = 200
+
+CREATE_NODE_RE = re.compile(br'^createNode\s+(\S+)\s.*?-n\s+"([^"]+)"')
+METADATA_SETATTR_RE = re.compile(br'^\s*setAttr\b[^"]*"\.' + METADATA_ATTR.encode('ascii') + br'"')
+STRING_TYPE_RE = re.compile(r'-type\s+"string"\s*')
+SET_COUNT_RE = re.compile(br'^(\s*setAttr\s+"\.' + SET_COUNT_ATTR.encode('ascii') + br'"\s+)(-?\d+)')
+TEMPLATE_RE = re.compile(br'^(\s*setAttr\s+"\.' + TEMPLATE_ATTR.encode('ascii') + br'"\s+)(yes|no)')
+
+MEL_ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', '"': '"', '\\': '\\'}
+
+
+def decodeMelString(literal):
+    """
+    Return the value of a MEL string literal
+
+    Args:
+        literal: A string literal including quotes, e.g. '"a\\"b"'
+    """
+    result = []
+    i = 1
+    end = len(literal) - 1
+    while i < end:
+        c = literal[i]
+        if c == '\\' and i + 1 < end:
+            i += 1
+            result.append(MEL_ESCAPES.get(literal[i], literal[i]))
+        else:
+            result.append(c)
+        i += 1
+    return ''.join(result)
+
+
+def encodeMelString(value):
+    """
+    Return a MEL string literal for a string, including quotes
+    """
+    for c, escaped in (('\\', '\\\\'), ('"', '\\"'), ('\n', '\\n'), ('\t', '\\t'), ('\r', '\\r')):
+        value = value.replace(c, escaped)
+    return '"{0}"'.format(value)
+
+
+def _findStringLiterals(text):
+    """
+    Return (literals, isComplete) for a MEL statement, where literals is a list of
+    all string literals in the statement, and isComplete is True if the statement
+    is terminated by a semicolon outside of a string
+    """
+    literals = []
+    start = None
+    i = 0
+    while i < len(text):
+        c = text[i]
+        if start is not None:
+            if c == '\\':
+                i += 1
+            elif c == '"':
+                literals.append(text[start:i + 1])
+                start = None
+        elif c == '"':
+            start = i
+        elif c == ';':
+            return literals, True
+        i += 1
+    return literals, False
+
+
+def _isCollectionNode(nodeType, nodeName):
+    return nodeType == b'network' and nodeName.split(b':')[-1].startswith(COLLECTION_PREFIX.encode('ascii'))
+
+
+def _countSets(data):
+    return len(data.get('sets', [])) + sum([_countSets(g) for g in data.get('groups', [])])
+
+
+def _splitLineEnding(line):
+    stripped = line.rstrip(b'\r\n')
+    return stripped, line[len(stripped):]
+
+
+def _iterStatements(fp):
+    """
+    Iterate over the lines of a Maya ASCII file, yielding (nodeName, metaDataStatement, lines)
+    for each line, where metaDataStatement is the decoded text of a complete pyMetaData setAttr
+    statement of a collection node spanning `lines`, or None for all other lines.
+    """
+    nodeName = None
+    pending = None
+    for line in fp:
+        if pending is not None:
+            pending.append(line)
+        elif line.startswith(b'\t'):
+            if nodeName and METADATA_SETATTR_RE.match(line):
+                pending = [line]
+            else:
+                yield nodeName, None, [line]
+                continue
+        else:
+            match = CREATE_NODE_RE.match(line)
+            nodeName = None
+            if match and _isCollectionNode(match.group(1), match.group(2)):
+                nodeName = match.group(2)
+            yield nodeName, None, [line]
+            continue
+        statement = b''.join(pending).decode('utf-8')
+        literals, isComplete = _findStringLiterals(statement)
+        if isComplete:
+            yield nodeName, statement, pending
+            pending = None
+    if pending is not None:
+        LOG.warning('Unterminated metadata of {0}'.format(nodeName))
+        yield nodeName, None, pending
+
+
+def _decodeMetaData(statement):
+    """
+    Return the quick select collection data from a pyMetaData setAttr statement
+    """
+    literals, isComplete = _findStringLiterals(statement)
+    # the first literal is the attribute name, followed by the type
+    value = ''.join([decodeMelString(l) for l in literals[2:]])
+    data = ast.literal_eval(value) if value else {}
+    return data.get(META_CLASSNAME)
+
+
+def _encodeMetaDataStatement(statement, data, lineEnding):
+    """
+    Return the text of a pyMetaData setAttr statement with new collection data
+    """
+    prefix = statement[:STRING_TYPE_RE.search(statement).end()]
+    value = repr({META_CLASSNAME: data})
+    chunks = [value[i:i + STRING_CHUNK_SIZE] for i in range(0, len(value), STRING_CHUNK_SIZE)] or ['']
+    if len(chunks) == 1:
+        result = prefix + encodeMelString(chunks[0]) + ';'
+    else:
+        # split long strings across lines the same way maya does
+        newline = lineEnding.decode('utf-8')
+        lines = ['\t\t' + encodeMelString(chunks[0])] + ['\t\t+ ' + encodeMelString(c) for c in chunks[1:]]
+        result = prefix + '(' + newline + newline.join(lines) + ');'
+    return result.encode('utf-8') + lineEnding
+
+
+def iterCollections(path):
+    """
+    Iterate over all quick select collections in a Maya ASCII file,
+    yielding (nodeName, data) for each collection, where data is the
+    same as the data returned by `QuickSelectCollection.getData`.
+
+    The file is streamed one line at a time, so memory use only depends on
+    the size of the largest collection. Only collection nodes created in the
+    file itself are found, edits to collections from referenced files are
+    not supported. Sets of collections that use objectSets have no nodes.
+
+    Args:
+        path: A string path to a .ma file
+    """
+    with open(path, 'rb') as fp:
+        for nodeName, statement, lines in _iterStatements(fp):
+            if statement is None:
+                continue
+            try:
+                data = _decodeMetaData(statement)
+            except (ValueError, SyntaxError) as e:
+                LOG.warning('Failed to read collection {0} in {1}: {2}'.format(nodeName, path, e))
+                continue
+            if data is not None:
+                yield nodeName.decode('utf-8'), data
+
+
+def readCollections(path):
+    """
+    Return a dict of the data of all quick select collections
+    in a Maya ASCII file, indexed by node name
+
+    Args:
+        path: A string path to a .ma file
+    """
+    return dict(iterCollections(path))
+
+
+def rewriteCollections(path, transform, outPath=None):
+    """
+    Rewrite the quick select collections in a Maya ASCII file. All other
+    lines are copied unchanged, and the set count and template attributes
+    used by `getCollectionHeaders` are updated to match the new data.
+    Returns a list of the names of the collection nodes that changed.
+
+    Args:
+        path: A string path to a .ma file
+        transform: A callable that takes (nodeName, data) for each collection
+            and returns new data for the collection, or None to leave it unchanged
+        outPath: A string path to write the result to, if None, the file is
+            replaced, and is not modified at all if no collections changed
+    """
+    tempPath = (outPath or path) + '.tmp'
+    changed = []
+    # the new data of the current node, used to update its header attributes
+    nodeName = None
+    newData = None
+    try:
+        with open(path, 'rb') as fp:
+            with open(tempPath, 'wb') as out:
+                for lineNodeName, statement, lines in _iterStatements(fp):
+                    if lineNodeName != nodeName:
+                        nodeName = lineNodeName
+                        newData = None
+                    if statement is not None:
+                        newData = _rewriteStatement(path, nodeName, statement, lines, transform, out)
+                        if newData is not None:
+                            changed.append(nodeName.decode('utf-8'))
+                        continue
+                    for line in lines:
+                        if newData is not None:
+                            line = _rewriteHeaderLine(line, newData)
+                        out.write(line)
+    except:
+        # don't leave partial files behind, e.g. when the transform fails
+        if os.path.isfile(tempPath):
+            os.remove(tempPath)
+        raise
+    if not changed and not outPath:
+        os.remove(tempPath)
+        return changed
+    target = outPath or path
+    if os.path.isfile(target):
+        os.remove(target)
+    os.rename(tempPath, target)
+    return changed
+
+
+def _rewriteStatement(path, nodeName, statement, lines, transform, out):
+    """
+    Write a pyMetaData statement, transformed if possible, and return the new data or None
+    """
+    newData = None
+    try:
+        data = _decodeMetaData(statement)
+    except (ValueError, SyntaxError) as e:
+        LOG.warning('Failed to read collection {0} in {1}: {2}'.format(nodeName, path, e))
+        data = None
+    if data is not None:
+        newData = transform(nodeName.decode('utf-8'), data)
+    if newData is None:
+        out.write(b''.join(lines))
+    else:
+        lineEnding = _splitLineEnding(lines[-1])[1]
+        out.write(_encodeMetaDataStatement(statement, newData, lineEnding))
+    return newData
+
+
+def _rewriteHeaderLine(line, data):
+    match = SET_COUNT_RE.match(line)
+    if match:
+        return match.group(1) + str(_countSets(data)).encode('ascii') + line[match.end():]
+    match = TEMPLATE_RE.match(line)
+    if match:
+        value = b'yes' if data.get('isTemplate', False) else b'no'
+        return match.group(1) + value + line[match.end():]
+    return line
@@ -1,22 +1,48 @@
 
 import os
+import ast
+import uuid
 import logging
+from array import array
+from functools import partial
+from multiprocessing.pool import ThreadPool
+import maya.utils
 import pymel.core as pm
 
 import pymetanode as meta
 
 import quickmenus
+from quickmenus import MenuItem
+
+import library
 
 
 __all__ = [
     "createCollection",
     "getActiveCollection",
     "getAllCollections",
+    "getActiveNamespace",
     "getCollection",
+    "getCollectionFromHeader",
+    "getCollectionHeaders",
+    "getCollectionIndex",
     "getCollectionNameFromNode",
+    "getCollectionNamespaces",
     "getDefaultCollection",
+    "getParsedCollection",
+    "getLibraryCollection",
+    "invalidateCollectionIndex",
+    "LibraryCollection",
+    "makeNameAbsolute",
+    "makeNameRelative",
+    "parseCollectionsAsync",
+    "PendingCollection",
+    "resolveCollectionNamespace",
+    "setActiveCollectionName",
+    "StringTable",
     "QuickSelectCollection",
     "QuickSelectCollectionsMenu",
+    "QuickSelectGroup",
     "QuickSelectMenu",
     "QuickSelectSet",
 ]
@@ -27,74 +53,386 @@ LOG = logging.getLogger("quickmenus")
 
 # the meta class name for quick select collection data
 META_CLASSNAME = "QuickSelectCollection"
+# the attribute in which pymetanode stores encoded metadata
+METADATA_ATTR = "pyMetaData"
 # prefix for quick select collection nodes
 COLLECTION_PREFIX = "quickSelectCollection_"
+# attributes that summarize each collection node, so that collections
+# can be listed without decoding all of their metadata
+SET_COUNT_ATTR = "quickSelectSetCount"
+TEMPLATE_ATTR = "quickSelectIsTemplate"
+# multi message attribute linking a collection node to the
+# objectSets that back its sets, see `QuickSelectCollection.useObjectSets`
+OBJECT_SETS_ATTR = "quickSelectObjectSets"
+# string attribute containing the id of the set that an objectSet backs
+SET_ID_ATTR = "quickSelectSetId"
 # the name of the default auto-created collection
 DEFAULT_COLLECTION_NAME = "Default"
-# the name of the active quick select collection
-ACTIVE_COLLECTION = DEFAULT_COLLECTION_NAME
-
-RADIAL_POSITIONS = ['N', 'NE', 'E', 'SE', 'S', 'SW', 'W', 'NW']
+# prefix for the names of library collections in ACTIVE_COLLECTIONS
+LIBRARY_PREFIX = "library:"
+# the name of the active quick select collection in each namespace, indexed by namespace
+ACTIVE_COLLECTIONS = {}
+# when True, the active collection is resolved from the namespace of the selection
+AUTO_NAMESPACE = True
 
 # whether to display item counts or not
 # TODO: save preference
 SHOW_COUNTS = False
+# when True, template sets select their nodes in all instances
+# of the template instead of only the selected instance
+SELECT_ALL_INSTANCES = False
+
+# operations for combining the members of multiple sets, see `QuickSelectCollection.combineSets`
+UNION = 'union'
+INTERSECTION = 'intersection'
+DIFFERENCE = 'difference'
+
+# collection nodes indexed by namespace, then by collection name,
+# built once from all collection nodes and cleared when the scene changes
+_COLLECTION_INDEX = None
+# the nearest namespace with collections for any namespace, indexed by namespace
+_NAMESPACE_RESOLUTION_CACHE = {}
+# namespace-relative node names resolved to absolute names, indexed by (name, namespace)
+_ABSOLUTE_NAME_CACHE = {}
+# the owner of the event callbacks used to keep the collection index up to date
+TRACKING_EVENT_OWNER = 'quickmenus.fmenus'
+
+# the number of worker threads used to parse collection metadata
+PARSE_THREADS = 2
+# the thread pool used to parse collection metadata, created when first needed
+_PARSE_POOL = None
+# collection metadata parsed from the raw metadata, stored as (rawMetaData, data)
+# indexed by (namespace, name). The data is None if parsing failed. Only the data is
+# cached, since collections also depend on scene state that is not in the metadata,
+# e.g. the members of objectSets, or the namespaces of template instances.
+_PARSED_COLLECTIONS = {}
+# the raw metadata of collections that are being parsed, indexed by (namespace, name)
+_PENDING_PARSES = {}
 
 
 # Quick Select Core
 # -----------------
 
-def getAllCollections():
+def enableCollectionTracking():
+    """
+    Clear the collection index whenever collection
+    nodes may have been added, removed, or renamed
+    """
+    disableCollectionTracking()
+    for event in ('SceneOpened', 'NewSceneOpened', 'SceneImported', 'NameChanged', 'Undo', 'Redo',
+                  'ReferenceChanged', 'NodeRemoved:network'):
+        quickmenus.addEventCallback(event, invalidateCollectionIndex, TRACKING_EVENT_OWNER)
+    # start parsing collections before the menu is first shown
+    for event in ('SceneOpened', 'ReferenceChanged'):
+        quickmenus.addEventCallback(event, parseCollectionsAsync, TRACKING_EVENT_OWNER)
+
+def disableCollectionTracking():
+    global _PARSE_POOL
+    quickmenus.removeEventCallbacks(TRACKING_EVENT_OWNER)
+    invalidateCollectionIndex()
+    if _PARSE_POOL:
+        _PARSE_POOL.close()
+        _PARSE_POOL = None
+    # results of running parses are ignored once they are no longer pending
+    _PENDING_PARSES.clear()
+    _PARSED_COLLECTIONS.clear()
+
+def invalidateCollectionIndex():
+    """
+    Clear the index of collection nodes, so that it is
+    rebuilt the next time collections are retrieved
+    """
+    global _COLLECTION_INDEX
+    _COLLECTION_INDEX = None
+    _NAMESPACE_RESOLUTION_CACHE.clear()
+    quickmenus.invalidateMenuData(QuickSelectMenu)
+
+def getCollectionIndex():
+    """
+    Return a dict of all collection nodes, indexed by
+    namespace, then by collection name
+    """
+    global _COLLECTION_INDEX
+    if _COLLECTION_INDEX is None:
+        _COLLECTION_INDEX = {}
+        for node in meta.findMetaNodes(META_CLASSNAME):
+            namespace, name = splitCollectionNodeName(node.nodeName())
+            _COLLECTION_INDEX.setdefault(namespace, {})[name] = node
+    return _COLLECTION_INDEX
+
+def getCollectionNamespaces():
+    """
+    Return a sorted list of all namespaces that contain collections
+    """
+    return sorted(getCollectionIndex().keys())
+
+def getAllCollections(namespace=None):
     """
     Return a list of all quick select collections
+
+    Args:
+        namespace: A string namespace to list collections from,
+            if None, list collections from all namespaces
     """
-    nodes = meta.findMetaNodes(META_CLASSNAME)
+    index = getCollectionIndex()
+    if namespace is None:
+        nodes = [n for ns in sorted(index) for name, n in sorted(index[ns].items())]
+    else:
+        nodes = [n for name, n in sorted(index.get(namespace, {}).items())]
     if nodes:
-        return [QuickSelectCollection.fromNode(n) for n in nodes]
+        return [getParsedCollection(n) for n in nodes]
     # no sets, create the default one and return it in a list
-    return [getDefaultCollection()]
+    if not namespace:
+        return [getDefaultCollection()]
+    return []
+
+def getCollectionHeaders(namespace=None, includeLibrary=True):
+    """
+    Return a list of headers describing collections, without loading
+    any of their sets. Scene collections are sorted by (namespace, name),
+    followed by library collections sorted by key. Each header is a dict
+    containing 'name', 'namespace', 'title', 'activeName', 'setCount' (None
+    if unknown), 'isTemplate', 'isReadOnly', 'isLibrary', and 'isActive'.
+    Use `getCollectionFromHeader` to load the full collection.
+
+    Args:
+        namespace: A string namespace to list scene collections from,
+            if None, list collections from all namespaces
+        includeLibrary: A bool, when True, include library collections
+    """
+    cmds = pm.cmds
+    index = getCollectionIndex()
+    namespaces = sorted(index) if namespace is None else [namespace]
+    headers = []
+    for ns in namespaces:
+        for name, node in sorted(index.get(ns, {}).items()):
+            nodeName = str(node)
+            setCount = None
+            isTemplate = False
+            if cmds.attributeQuery(SET_COUNT_ATTR, node=nodeName, exists=True):
+                setCount = cmds.getAttr(nodeName + '.' + SET_COUNT_ATTR)
+                isTemplate = cmds.getAttr(nodeName + '.' + TEMPLATE_ATTR)
+            headers.append({
+                'name': name,
+                'namespace': ns,
+                'title': '{0}:{1}'.format(ns, name) if ns else name,
+                'activeName': name,
+                'setCount': setCount,
+                'isTemplate': isTemplate,
+                'isReadOnly': cmds.referenceQuery(nodeName, isNodeReferenced=True),
+                'isLibrary': False,
+                'isActive': name == ACTIVE_COLLECTIONS.get(ns, DEFAULT_COLLECTION_NAME),
+            })
+    if includeLibrary:
+        for key in library.getLibraryKeys():
+            libraryHeader = library.getLibraryHeader(key)
+            headers.append({
+                'name': key,
+                'namespace': '',
+                'title': key,
+                'activeName': LIBRARY_PREFIX + key,
+                'setCount': libraryHeader.get('setCount'),
+                'isTemplate': libraryHeader.get('isTemplate', False),
+                'isReadOnly': True,
+                'isLibrary': True,
+                'isActive': LIBRARY_PREFIX + key == ACTIVE_COLLECTIONS.get(''),
+            })
+    return headers
+
+def getCollectionFromHeader(header):
+    """
+    Return the fully loaded collection described by a header
+
+    Args:
+        header: A dict collection header from `getCollectionHeaders`
+    """
+    return getCollection(header['activeName'], header['namespace'])
 
-def getCollection(name):
+def getCollection(name, namespace='', wait=True):
     """
     Return a QuickSelectCollection from the scene by name
+
+    Args:
+        name: A string name of the collection, or a library collection
+            key prefixed with LIBRARY_PREFIX
+        namespace: A string namespace containing the collection
+        wait: A bool, when False, return a PendingCollection instead
+            of parsing the collection if it has not been parsed yet,
+            see `getParsedCollection`
     """
-    nodes = meta.findMetaNodes(META_CLASSNAME)
-    for n in nodes:
-        if getCollectionNameFromNode(n) == name:
-            return QuickSelectCollection.fromNode(n)
+    if name.startswith(LIBRARY_PREFIX):
+        return getLibraryCollection(name[len(LIBRARY_PREFIX):], namespace)
+    node = getCollectionIndex().get(namespace, {}).get(name)
+    if node:
+        return getParsedCollection(node, wait)
 
-def getDefaultCollection():
+def getLibraryCollection(key, namespace=''):
+    """
+    Return a LibraryCollection from the collection library by key
+
+    Args:
+        key: A string key of the collection, e.g. an asset name
+        namespace: A string namespace that the collection is used in
+    """
+    if library.getLibraryHeader(key) is not None:
+        coll = LibraryCollection(key, namespace)
+        coll.load()
+        return coll
+
+def setActiveCollectionName(name, namespace=''):
+    """
+    Set the name of the active collection of a namespace
+
+    Args:
+        name: A string name of the collection, or a library collection
+            key prefixed with LIBRARY_PREFIX
+        namespace: A string namespace
+    """
+    ACTIVE_COLLECTIONS[namespace] = name
+    quickmenus.invalidateMenuData(QuickSelectMenu)
+
+def getDefaultCollection(create=True, namespace='', wait=True):
     """
     Return the default QuickSelectCollection from the scene.
     If it does not exist, create it.
+
+    Args:
+        create: A bool, when False, return None instead
+            of creating the default collection
+        namespace: A string namespace containing the collection,
+            default collections are only created in the root namespace
+        wait: A bool, when False, don't wait for the collection
+            to be parsed, see `getCollection`
     """
-    coll = getCollection(DEFAULT_COLLECTION_NAME)
-    if not coll:
+    coll = getCollection(DEFAULT_COLLECTION_NAME, namespace, wait)
+    if not coll and create and not namespace:
         coll = createCollection(DEFAULT_COLLECTION_NAME)
     return coll
 
-def getActiveCollection():
+def getActiveCollection(create=True, namespace=None, wait=True):
     """
     Return the currently active QuickSelectCollection from the scene.
     If no collection is active, or the active collection is gone,
-    returns the default collection.
+    returns the default collection, or the first collection
+    in the namespace if there is no default collection.
+
+    Args:
+        create: A bool, when False, return None instead
+            of creating the default collection
+        namespace: A string namespace to get the active collection of,
+            if None, use `getActiveNamespace`
+        wait: A bool, when False, don't wait for the collection
+            to be parsed, see `getCollection`
     """
-    global ACTIVE_COLLECTION
-    if ACTIVE_COLLECTION is None:
-        ACTIVE_COLLECTION = DEFAULT_COLLECTION_NAME
-    coll = getCollection(ACTIVE_COLLECTION)
+    if namespace is None:
+        namespace = getActiveNamespace()
+    coll = getCollection(ACTIVE_COLLECTIONS.get(namespace, DEFAULT_COLLECTION_NAME), namespace, wait)
     if not coll:
-        coll = getDefaultCollection()
-        ACTIVE_COLLECTION = coll.name
+        coll = getDefaultCollection(create, namespace, wait)
+        if not coll:
+            names = sorted(getCollectionIndex().get(namespace, {}).keys())
+            if not names:
+                return
+            coll = getCollection(names[0], namespace, wait)
+        ACTIVE_COLLECTIONS[namespace] = coll.name
     return coll
 
-def createCollection(name):
+def getActiveNamespace():
+    """
+    Return the namespace whose active collection should be used.
+    When AUTO_NAMESPACE is enabled, this is the nearest namespace with
+    collections of the most recently selected node, otherwise it
+    is the root namespace.
+    """
+    if not AUTO_NAMESPACE:
+        return ''
+    selected = pm.cmds.ls(sl=True, tail=1)
+    if not selected:
+        return ''
+    return resolveCollectionNamespace(getNamespaceFromName(selected[0]))
+
+def resolveCollectionNamespace(namespace):
+    """
+    Return the nearest namespace that contains collections for a
+    namespace, searching parent namespaces, or the root namespace
+    if none contain collections. Results are cached until
+    the collection index is cleared.
+
+    Args:
+        namespace: A string namespace, e.g. 'char1:face'
+    """
+    result = _NAMESPACE_RESOLUTION_CACHE.get(namespace)
+    if result is None:
+        index = getCollectionIndex()
+        result = namespace
+        while result and result not in index:
+            result = result.rpartition(':')[0]
+        _NAMESPACE_RESOLUTION_CACHE[namespace] = result
+    return result
+
+def getNamespaceFromName(name):
+    """
+    Return the namespace of a node or component name
+
+    Args:
+        name: A string node name, dag path, or component, e.g. 'char1:body.vtx[0]'
+    """
+    return splitCollectionNodeName(name.split('.')[0].split('|')[-1])[0]
+
+def splitCollectionNodeName(nodeName):
+    """
+    Return a tuple of (namespace, name) for a collection node name
+
+    Args:
+        nodeName: A string node name, e.g. 'char1:quickSelectCollection_Default'
+    """
+    namespace, sep, name = nodeName.rpartition(':')
+    if name.startswith(COLLECTION_PREFIX):
+        name = name[len(COLLECTION_PREFIX):]
+    return namespace, name
+
+def makeNameRelative(name, namespace):
+    """
+    Return a node name or dag path with a namespace removed from each
+    path component, for storing in a template collection
+
+    Args:
+        name: A string node name or dag path, e.g. '|char1:grp|char1:body_ctl'
+        namespace: A string namespace to remove, e.g. 'char1'
+    """
+    if not namespace:
+        return name
+    prefix = namespace + ':'
+    return '|'.join([c[len(prefix):] if c.startswith(prefix) else c for c in name.split('|')])
+
+def makeNameAbsolute(name, namespace):
+    """
+    Return a namespace-relative node name or dag path with a namespace
+    added to each path component. Results are cached, since the same
+    template names are resolved for each instance every time they are selected.
+
+    Args:
+        name: A string namespace-relative node name or dag path, e.g. '|grp|body_ctl'
+        namespace: A string namespace to add, e.g. 'char1'
+    """
+    if not namespace:
+        return name
+    key = (name, namespace)
+    result = _ABSOLUTE_NAME_CACHE.get(key)
+    if result is None:
+        prefix = namespace + ':'
+        result = '|'.join([prefix + c if c else c for c in name.split('|')])
+        _ABSOLUTE_NAME_CACHE[key] = result
+    return result
+
+def createCollection(name, isTemplate=False):
     coll = QuickSelectCollection(name)
+    coll.isTemplate = isTemplate
     coll.save()
     return coll
 
 def getCollectionNameFromNode(node):
-    return node.nodeName()[len(COLLECTION_PREFIX):]
+    return splitCollectionNodeName(node.nodeName())[1]
 
 def promptBox(title, msg, okButton, cancelButton, tx=None):
     prompt = pm.cmds.promptDialog(t=title, m=msg, tx=tx, b=[okButton, cancelButton])
@@ -107,33 +445,305 @@ def setShowCounts(newShow):
     global SHOW_COUNTS
     SHOW_COUNTS = bool(newShow)
 
+def setSelectAllInstances(newSelectAll):
+    global SELECT_ALL_INSTANCES
+    SELECT_ALL_INSTANCES = bool(newSelectAll)
+
+def setAutoNamespace(newAuto):
+    global AUTO_NAMESPACE
+    AUTO_NAMESPACE = bool(newAuto)
+    quickmenus.invalidateMenuData(QuickSelectMenu)
+
+
+
+
+# Background Parsing
+# ------------------
+
+def getParsedCollection(node, wait=True):
+    """
+    Return a new QuickSelectCollection for a collection node, reusing
+    the metadata parsed by `parseCollectionsAsync` if the node's
+    metadata has not changed since. The state of the collection
+    that is not stored in the metadata is always read from the scene.
+
+    Args:
+        node: A collection node
+        wait: A bool, when False, never parse on this thread, and return a
+            PendingCollection placeholder if the collection is not parsed yet
+    """
+    nodeName = str(node)
+    key = splitCollectionNodeName(node.nodeName())
+    raw = _getRawMetaData(nodeName)
+    parsed = _PARSED_COLLECTIONS.get(key)
+    isParsed = parsed is not None and parsed[0] == raw
+    if not isParsed and not wait:
+        _queueParse(key, raw)
+        return PendingCollection(key[1], key[0])
+    data = parsed[1] if isParsed else None
+    if data is None:
+        # parse now, also when parsing on a worker thread failed
+        data = meta.getMetaData(node, META_CLASSNAME)
+        _PARSED_COLLECTIONS[key] = (raw, data)
+    coll = QuickSelectCollection(key[1], key[0])
+    coll.loadData(data)
+    coll.loadNodeState(node)
+    return coll
+
+def parseCollectionsAsync(namespace=None):
+    """
+    Start parsing the metadata of all collections on worker threads, so that
+    menus don't have to wait for them. Only the raw metadata is read on this
+    thread, and parsed collections are published back to it when idle.
+
+    Args:
+        namespace: A string namespace to parse collections from,
+            if None, parse collections from all namespaces
+    """
+    index = getCollectionIndex()
+    keys = set()
+    for ns in (sorted(index) if namespace is None else [namespace]):
+        for name, node in sorted(index.get(ns, {}).items()):
+            keys.add((ns, name))
+            _queueParse((ns, name), _getRawMetaData(str(node)))
+    if namespace is None:
+        # forget collections that no longer exist
+        for key in [k for k in _PARSED_COLLECTIONS if k not in keys]:
+            del _PARSED_COLLECTIONS[key]
+
+def _getRawMetaData(nodeName):
+    try:
+        return pm.cmds.getAttr(nodeName + '.' + METADATA_ATTR)
+    except (RuntimeError, ValueError):
+        return None
+
+def _queueParse(key, raw):
+    """
+    Parse the raw metadata of a collection on a worker thread,
+    unless it is already parsed or being parsed
+    """
+    global _PARSE_POOL
+    parsed = _PARSED_COLLECTIONS.get(key)
+    if (parsed and parsed[0] == raw) or (key in _PENDING_PARSES and _PENDING_PARSES[key] == raw):
+        return
+    if not _PARSE_POOL:
+        _PARSE_POOL = ThreadPool(PARSE_THREADS)
+    _PENDING_PARSES[key] = raw
+    _PARSE_POOL.apply_async(_parseCollection, (key, raw), callback=_onCollectionParsed)
+
+def _parseCollection(key, raw):
+    """
+    Return (key, raw, data) for the raw metadata of a collection node.
+    Runs on a worker thread, so must not access the scene.
+    The data is None if the metadata could not be parsed here.
+    """
+    data = None
+    try:
+        data = ast.literal_eval(raw) if raw else {}
+        data = data.get(META_CLASSNAME, {})
+        # make sure the data can be loaded, so that loading it on the main thread doesn't fail
+        QuickSelectCollection(key[1], key[0]).loadData(data)
+    except Exception as e:
+        # e.g. metadata containing encoded nodes, which are decoded by pymetanode
+        LOG.debug('Failed to parse collection {0}: {1}'.format(key, e))
+        data = None
+    return (key, raw, data)
+
+def _onCollectionParsed(result):
+    # called on the pool's result thread
+    maya.utils.executeDeferred(_publishCollection, *result)
+
+def _publishCollection(key, raw, data):
+    """
+    Publish collection metadata parsed on a worker thread,
+    unless its node changed or was removed in the meantime
+    """
+    if _PENDING_PARSES.get(key) != raw:
+        return
+    del _PENDING_PARSES[key]
+    if not getCollectionIndex().get(key[0], {}).get(key[1]):
+        return
+    # failed metadata is stored as None, and is parsed on the main thread when needed
+    _PARSED_COLLECTIONS[key] = (raw, data)
+    quickmenus.invalidateMenuData(QuickSelectMenu)
+
+
+
+
+class QuickSelectGroup(object):
+    """
+    A group of quick select sets and nested groups, which is
+    displayed as a radial sub menu in the quick select menu.
+    Sets and groups are indexed by their radial position.
+    """
+    __slots__ = ('title', 'position', 'id', 'sets', 'groups', 'positions')
+
+    @classmethod
+    def fromDict(cls, data, table=None):
+        inst = cls()
+        inst.loadDict(data, table)
+        return inst
+
+    def __init__(self, title=None, position=None, id=None):
+        # title of this groups menu item
+        self.title = title
+        # the radial position of this group
+        self.position = position
+        # the unique id of this group
+        self.id = id or uuid.uuid4().hex
+        # the sets and groups in this group
+        self.sets = []
+        self.groups = []
+        # the set or group at each radial position, indexed by position
+        self.positions = {}
+
+    def getTitle(self):
+        return self.title or 'Group'
+
+    def loadDict(self, data, table=None):
+        """
+        Load the sets and groups of this group from a simple python object
+
+        Args:
+            data: A dict of group data, see `asDict`
+            table: A StringTable in which to store the nodes of all sets
+        """
+        self.title = data.get('title')
+        self.position = data.get('position')
+        self.id = data.get('id') or self.id
+        self.sets = []
+        self.groups = []
+        self.positions = {}
+        # use the group methods directly, since collections save when adding
+        for kwargs in data.get('sets', []):
+            QuickSelectGroup.addSet(self, QuickSelectSet(table=table, **kwargs))
+        for groupData in data.get('groups', []):
+            QuickSelectGroup.addGroup(self, QuickSelectGroup.fromDict(groupData, table))
+
+    def asDict(self, embedNodes=False):
+        """
+        Return this QuickSelectGroup as a simple python object
+
+        Args:
+            embedNodes: A bool, when True, include the nodes of
+                sets that are backed by objectSets
+        """
+        result = {
+            'title': self.title,
+            'position': self.position,
+            'id': self.id,
+            'sets': [s.asDict(embedNodes) for s in self.sets],
+            'groups': [g.asDict(embedNodes) for g in self.groups],
+        }
+        return result
+
+    def _addPosition(self, item):
+        if item.position:
+            if item.position in self.positions:
+                raise ValueError("cannot add a quick set, position already occupied: {0}".format(item.position))
+            self.positions[item.position] = item
+
+    def _removePosition(self, item):
+        if item.position and self.positions.get(item.position) is item:
+            del self.positions[item.position]
+
+    def addSet(self, quickSet):
+        if not isinstance(quickSet, QuickSelectSet):
+            raise TypeError("set must be a QuickSelectSet")
+        self._addPosition(quickSet)
+        self.sets.append(quickSet)
+
+    def addGroup(self, group):
+        if not isinstance(group, QuickSelectGroup):
+            raise TypeError("group must be a QuickSelectGroup")
+        self._addPosition(group)
+        self.groups.append(group)
+
+    def removeSet(self, quickSet):
+        self._removePosition(quickSet)
+        self.sets.remove(quickSet)
+
+    def removeGroup(self, group):
+        self._removePosition(group)
+        self.groups.remove(group)
+
+    def getAtPosition(self, position):
+        """
+        Return the set or group at a radial position, or None
+        """
+        return self.positions.get(position)
+
+    def getRadialVacancies(self):
+        return quickmenus.getRadialVacancies(self.positions)
+
+    def iterSets(self):
+        """
+        Iterate over all sets in this group and its nested groups
+        """
+        for s in self.sets:
+            yield s
+        for g in self.groups:
+            for s in g.iterSets():
+                yield s
+
+    def iterGroups(self):
+        """
+        Iterate over all nested groups, depth first
+        """
+        for g in self.groups:
+            yield g
+            for subGroup in g.iterGroups():
+                yield subGroup
 
 
 
-class QuickSelectCollection(object):
+class QuickSelectCollection(QuickSelectGroup):
     """
     Acts as the data model for all quick select menus.
     Can load and save quick select sets and collections.
+    The collection is the root group of all its sets and groups.
     """
+    __slots__ = ('name', 'namespace', 'isReferenced', 'isTemplate', 'useObjectSets',
+                 '_instanceNamespaces', 'itemsById', 'stringTable')
+
     @classmethod
     def fromNode(cls, node):
         inst = QuickSelectCollection()
         inst.load(node)
         return inst
 
-    def __init__(self, name=None):
+    def __init__(self, name=None, namespace=''):
+        super(QuickSelectCollection, self).__init__()
         self.name = name
-        self.sets = []
+        # the namespace of the collection node, e.g. the namespace of a referenced rig
+        self.namespace = namespace
+        # whether the collection node is from a referenced file
+        self.isReferenced = False
+        # when True, set nodes are stored relative to a namespace,
+        # and are resolved for each instance of the template when selected
+        self.isTemplate = False
+        # when True, the nodes of each set are stored in an objectSet linked to
+        # the collection node instead of in the metadata, which is rename-safe
+        # and faster to select. Not supported for templates.
+        self.useObjectSets = False
+        # cached namespaces of all instances of the template
+        self._instanceNamespaces = None
+        # (item, parentGroup) for all nested sets and groups, indexed by id
+        self.itemsById = {}
+        # the node names shared by all sets in the collection
+        self.stringTable = StringTable()
+
+    def getTitle(self):
+        if self.namespace:
+            return '{0}:{1}'.format(self.namespace, self.name)
+        return self.name
 
     def getNode(self):
         """
         Return the collection node from the scene with the
-        same name, if one exists
+        same name and namespace, if one exists
         """
-        nodes = meta.findMetaNodes(META_CLASSNAME)
-        for n in nodes:
-            if getCollectionNameFromNode(n) == self.name:
-                return n
+        return getCollectionIndex().get(self.namespace, {}).get(self.name)
 
     def getOrCreateNode(self):
         """
@@ -145,8 +755,12 @@ class QuickSelectCollection(object):
             return node
         else:
             sel = pm.selected()
-            node = pm.createNode('network', name=COLLECTION_PREFIX + self.name)
+            nodeName = COLLECTION_PREFIX + self.name
+            if self.namespace:
+                nodeName = '{0}:{1}'.format(self.namespace, nodeName)
+            node = pm.createNode('network', name=nodeName)
             pm.select(sel)
+            invalidateCollectionIndex()
             return node
 
     def load(self, node=None):
@@ -154,33 +768,207 @@ class QuickSelectCollection(object):
             node = self.getNode()
         if node:
             data = meta.getMetaData(node, META_CLASSNAME)
-            self.name = getCollectionNameFromNode(node)
-            self.sets = [QuickSelectSet(**kwargs) for kwargs in data.get('sets', [])]
+            self.namespace, self.name = splitCollectionNodeName(node.nodeName())
+            self.loadData(data)
+            self.loadNodeState(node)
 
-    def save(self):
-        # TODO: handle locked nodes
+    def loadData(self, data):
+        """
+        Load this collection from decoded metadata. Does not
+        access the scene, so can be called from any thread.
+        """
+        self.isTemplate = data.get('isTemplate', False)
+        self.useObjectSets = data.get('useObjectSets', False)
+        self.loadDict(data)
+        self.updateIndex()
+
+    def loadNodeState(self, node):
+        """
+        Load the state of this collection that is stored
+        in the scene instead of in the metadata
+        """
+        self.isReferenced = node.isReferenced()
+        if self.useObjectSets:
+            objectSets = self._getObjectSets(node)
+            for s in self.iterSets():
+                s.objectSet = objectSets.get(s.id)
+
+    def loadDict(self, data, table=None):
+        # start a new table, so that names of removed sets are released
+        self.stringTable = table if table is not None else StringTable()
+        super(QuickSelectCollection, self).loadDict(data, self.stringTable)
+
+    def getData(self, embedNodes=False):
+        """
+        Return the data of this collection as a simple python object
+
+        Args:
+            embedNodes: A bool, when True, include the nodes of
+                sets that are backed by objectSets
+        """
         data = {
-            'sets': [s.asDict() for s in self.sets]
+            'sets': [s.asDict(embedNodes) for s in self.sets],
+            'groups': [g.asDict(embedNodes) for g in self.groups],
         }
+        if self.isTemplate:
+            data['isTemplate'] = True
+        if self.useObjectSets and not embedNodes:
+            data['useObjectSets'] = True
+        return data
+
+    def save(self):
+        # TODO: handle locked nodes
+        data = self.getData()
         node = self.getOrCreateNode()
         # update name to resolve node creation differences
-        self.name = getCollectionNameFromNode(node)
+        self.namespace, self.name = splitCollectionNodeName(node.nodeName())
         meta.setMetaData(node, META_CLASSNAME, data)
+        self._saveHeader(node)
+        self._saveObjectSets(node)
+        # the saved data is already up to date with the new metadata
+        _PARSED_COLLECTIONS[(self.namespace, self.name)] = (_getRawMetaData(str(node)), data)
+        quickmenus.invalidateMenuData(QuickSelectMenu)
+
+    def setUseObjectSets(self, useObjectSets):
+        """
+        Set whether the nodes of each set are stored in objectSets
+        instead of the metadata, and save the collection
+
+        Args:
+            useObjectSets: A bool
+        """
+        if self.isTemplate and useObjectSets:
+            raise ValueError("template collections cannot use objectSets")
+        if not useObjectSets:
+            # read members before the objectSets are deleted
+            for s in self.iterSets():
+                s.setNodes(s.nodes)
+                s.objectSet = None
+        self.useObjectSets = useObjectSets
+        self.save()
+
+    def _getObjectSets(self, node):
+        """
+        Return the names of the objectSets linked to the
+        collection node, indexed by set id
+        """
+        cmds = pm.cmds
+        nodeName = str(node)
+        if not cmds.attributeQuery(OBJECT_SETS_ATTR, node=nodeName, exists=True):
+            return {}
+        result = {}
+        for objectSet in cmds.listConnections(nodeName + '.' + OBJECT_SETS_ATTR, s=True, d=False) or []:
+            if cmds.attributeQuery(SET_ID_ATTR, node=objectSet, exists=True):
+                result[cmds.getAttr(objectSet + '.' + SET_ID_ATTR)] = objectSet
+        return result
+
+    def _saveObjectSets(self, node):
+        """
+        Create or update the objectSets for all sets whose nodes
+        changed, and delete objectSets of sets that no longer exist
+        """
+        cmds = pm.cmds
+        nodeName = str(node)
+        objectSets = self._getObjectSets(node)
+        if not self.useObjectSets and not objectSets:
+            return
+        used = set()
+        if self.useObjectSets:
+            if not cmds.attributeQuery(OBJECT_SETS_ATTR, node=nodeName, exists=True):
+                cmds.addAttr(nodeName, ln=OBJECT_SETS_ATTR, at='message', multi=True)
+            for s in self.iterSets():
+                if not s.objectSet or not cmds.objExists(s.objectSet):
+                    s.objectSet = objectSets.get(s.id)
+                    if not s.objectSet:
+                        s.objectSet = cmds.sets(name=nodeName.split(':')[-1] + '_set', empty=True)
+                        cmds.addAttr(s.objectSet, ln=SET_ID_ATTR, dt='string')
+                        cmds.setAttr(s.objectSet + '.' + SET_ID_ATTR, s.id, type='string')
+                        cmds.connectAttr(s.objectSet + '.message', nodeName + '.' + OBJECT_SETS_ATTR, nextAvailable=True)
+                if s.isModified:
+                    cmds.sets(clear=s.objectSet)
+                    if s.nodes:
+                        cmds.sets(s.nodes, add=s.objectSet)
+                    s.isModified = False
+                used.add(s.objectSet)
+        unused = [o for o in objectSets.values() if o not in used]
+        if unused:
+            cmds.delete(unused)
+
+    def _saveHeader(self, node):
+        """
+        Save the attributes used by `getCollectionHeaders`
+        """
+        if not node.hasAttr(SET_COUNT_ATTR):
+            node.addAttr(SET_COUNT_ATTR, at='long')
+            node.addAttr(TEMPLATE_ATTR, at='bool')
+        node.attr(SET_COUNT_ATTR).set(self.getSetCount())
+        node.attr(TEMPLATE_ATTR).set(self.isTemplate)
+
+    def publish(self, key=None):
+        """
+        Save a copy of this collection to the collection library,
+        and return the key it was saved with
+
+        Args:
+            key: A string key for the library collection, e.g. an asset name,
+                defaults to the name of this collection. Characters that are
+                not allowed in filenames are replaced, see `sanitizeLibraryKey`.
+        """
+        key = library.sanitizeLibraryKey(key or self.name)
+        library.saveLibraryData(key, self.getData(embedNodes=True))
+        return key
+
+    def updateIndex(self):
+        """
+        Rebuild the index of all nested sets and groups by id
+        """
+        self.itemsById = {}
+        self._indexGroup(self)
+
+    def _indexGroup(self, group):
+        for s in group.sets:
+            self.itemsById[s.id] = (s, group)
+        for g in group.groups:
+            self.itemsById[g.id] = (g, group)
+            self._indexGroup(g)
+
+    def getById(self, id):
+        """
+        Return a nested set or group by id, or None
+        """
+        if id in self.itemsById:
+            return self.itemsById[id][0]
 
     def isReadOnly(self):
+        # referenced collections belong to the referenced asset
+        return self.isReferenced
+
+    def isPending(self):
+        """
+        Return True if this is a placeholder for a collection that is being parsed
+        """
         return False
 
+    def getActiveName(self):
+        """
+        Return the name that identifies this collection in ACTIVE_COLLECTIONS
+        """
+        return self.name
+
     def isActive(self):
-        return self.name == ACTIVE_COLLECTION
+        return self.getActiveName() == ACTIVE_COLLECTIONS.get(self.namespace, DEFAULT_COLLECTION_NAME)
 
     def makeActive(self):
-        global ACTIVE_COLLECTION
-        ACTIVE_COLLECTION = self.name
+        setActiveCollectionName(self.getActiveName(), self.namespace)
 
     def delete(self):
         node = self.getNode()
         if node:
+            objectSets = self._getObjectSets(node).values()
             pm.delete(node)
+            if objectSets:
+                pm.cmds.delete(objectSets)
+            invalidateCollectionIndex()
 
     def setName(self, newName):
         # TODO: sanitize name
@@ -189,42 +977,313 @@ class QuickSelectCollection(object):
         if node:
             node.rename(COLLECTION_PREFIX + newName)
             self.name = getCollectionNameFromNode(node)
+            invalidateCollectionIndex()
         else:
             self.name = newName
         self.save()
 
-    def addSet(self, quickSet):
-        if not isinstance(quickSet, QuickSelectSet):
-            raise TypeError("set must be a QuickSelectSet")
-        if quickSet.position:
-            for s in self.sets:
-                if s.position == quickSet.position:
-                    raise ValueError("cannot add a quick set, position already occupied: {0}".format(s.position))
-        self.sets.append(quickSet)
+    def addSet(self, quickSet, group=None):
+        """
+        Add a set to the collection, or to one of its nested groups
+
+        Args:
+            quickSet: A QuickSelectSet to add
+            group: A QuickSelectGroup in this collection to add the set to
+        """
+        if group is None or group is self:
+            super(QuickSelectCollection, self).addSet(quickSet)
+            group = self
+        else:
+            group.addSet(quickSet)
+        quickSet.setTable(self.stringTable)
+        self.itemsById[quickSet.id] = (quickSet, group)
         self.save()
 
+    def addGroup(self, newGroup, group=None):
+        """
+        Add a group to the collection, or to one of its nested groups
+
+        Args:
+            newGroup: A QuickSelectGroup to add
+            group: A QuickSelectGroup in this collection to add the new group to
+        """
+        if group is None or group is self:
+            super(QuickSelectCollection, self).addGroup(newGroup)
+        else:
+            group.addGroup(newGroup)
+        for s in newGroup.iterSets():
+            s.setTable(self.stringTable)
+        self.updateIndex()
+        self.save()
+
+    def removeById(self, id):
+        """
+        Remove a nested set or group by id
+        """
+        if id in self.itemsById:
+            item, group = self.itemsById[id]
+            if isinstance(item, QuickSelectGroup):
+                QuickSelectGroup.removeGroup(group, item)
+            else:
+                QuickSelectGroup.removeSet(group, item)
+            self.updateIndex()
+            self.save()
+
+    def removeSet(self, quickSet):
+        self.removeById(quickSet.id)
+
+    def removeGroup(self, group):
+        self.removeById(group.id)
+
     def removeSetAtPosition(self, position):
-        for s in self.sets:
-            if s.position == position:
-                self.sets.remove(s)
-                self.save()
-                break
+        item = self.getAtPosition(position)
+        if isinstance(item, QuickSelectSet):
+            self.removeSet(item)
 
     def removeSetAtIndex(self, index):
         if index >= 0 and index < len(self.sets):
-            self.sets.pop(index)
-            self.save()
+            self.removeSet(self.sets[index])
 
     def clearSets(self):
         self.sets = []
+        self.groups = []
+        self.positions = {}
+        self.itemsById = {}
+        self.stringTable = StringTable()
         self.save()
 
-    def getRadialVacancies(self):
-        result = RADIAL_POSITIONS[:]
-        for s in self.sets:
-            if s.position in result:
-                result.remove(s.position)
-        return result
+    def getNodeNames(self, nodes):
+        """
+        Return the names to store in a set for a list of nodes, which
+        are relative to the namespace of the last node for templates
+
+        Args:
+            nodes: A list of PyNodes, e.g. the selection
+        """
+        names = [n.longName() for n in nodes]
+        if self.isTemplate and names:
+            namespace = getNamespaceFromName(names[-1])
+            names = [makeNameRelative(n, namespace) for n in names]
+        return names
+
+    def getInstanceNamespaces(self):
+        """
+        Return a sorted list of the namespaces of all instances of a template,
+        found by searching all namespaces for the first node of each set
+        """
+        if self._instanceNamespaces is None:
+            leaves = set([s.nodes[0].split('|')[-1] for s in self.iterSets() if s.nodes])
+            namespaces = set()
+            if leaves:
+                for name in pm.cmds.ls(list(leaves), recursive=True) or []:
+                    name = name.split('|')[-1]
+                    # exclude any relative namespace that is part of the leaf itself
+                    for leaf in leaves:
+                        if name.endswith(':' + leaf):
+                            namespaces.add(name[:-len(leaf) - 1])
+                            break
+            self._instanceNamespaces = sorted(namespaces)
+        return self._instanceNamespaces
+
+    def getSelectionNamespaces(self, allInstances=False):
+        """
+        Return the namespaces that template sets should be resolved in.
+        For templates, this is the instance containing the most recently
+        selected node, or all instances. Returns [''] for non-templates,
+        or an empty list if no instance could be determined.
+
+        Args:
+            allInstances: A bool, when True, return all instance namespaces
+        """
+        if not self.isTemplate:
+            return ['']
+        instances = self.getInstanceNamespaces()
+        if allInstances:
+            return instances
+        selected = pm.cmds.ls(sl=True, tail=1)
+        if selected:
+            namespace = getNamespaceFromName(selected[0])
+            while namespace:
+                if namespace in instances:
+                    return [namespace]
+                namespace = namespace.rpartition(':')[0]
+        if len(instances) == 1:
+            return instances
+        LOG.warning('Select a node in one of the template instances: {0}'.format(', '.join(instances)))
+        return []
+
+    def combineSets(self, sets, operation=UNION, namespace=''):
+        """
+        Return the ordered list of node names that results from combining
+        the members of sets, using each set's cached members
+
+        Args:
+            sets: A list of QuickSelectSets in this collection
+            operation: A string, UNION for nodes in any set, INTERSECTION
+                for nodes in all sets, or DIFFERENCE for nodes in the
+                first set that are not in any other set
+            namespace: A string namespace of a template instance
+        """
+        if not sets:
+            return []
+        if operation == UNION:
+            result = []
+            seen = set()
+            for s in sets:
+                for n in s.getNodes(namespace):
+                    if n not in seen:
+                        seen.add(n)
+                        result.append(n)
+            return result
+        elif operation == INTERSECTION:
+            others = [s.getMembers(namespace) for s in sets[1:]]
+            return [n for n in sets[0].getNodes(namespace) if all([n in m for m in others])]
+        elif operation == DIFFERENCE:
+            others = set().union(*[s.getMembers(namespace) for s in sets[1:]])
+            return [n for n in sets[0].getNodes(namespace) if n not in others]
+        raise ValueError("invalid set operation: {0}".format(operation))
+
+    def selectSets(self, sets, allInstances=False, operation=UNION, mode='add'):
+        """
+        Combine the members of one or more sets and select them with
+        a single select call, resolving template sets for the
+        selected instance, or all instances
+
+        Args:
+            sets: A list of QuickSelectSets in this collection
+            allInstances: A bool, when True, select template sets in all instances
+            operation: A string set operation, see `combineSets`
+            mode: A string, 'add' to add to the selection, 'replace' to
+                replace the selection, or 'deselect' to remove from it
+        """
+        nodes = []
+        if operation == UNION and not self.isTemplate:
+            # objectSets select their members natively
+            for s in sets:
+                if s.objectSet and not s.isModified:
+                    nodes.append(s.objectSet)
+                else:
+                    nodes.extend(s.nodes)
+        else:
+            for namespace in self.getSelectionNamespaces(allInstances):
+                nodes.extend(self.combineSets(sets, operation, namespace))
+        if mode == 'replace':
+            pm.select(nodes, replace=True)
+        elif nodes:
+            if mode == 'deselect':
+                pm.select(nodes, deselect=True)
+            else:
+                pm.select(nodes, add=True)
+
+    def getSetCount(self):
+        """
+        Return the number of sets in the collection, including nested sets
+        """
+        return len([s for s in self.iterSets()])
+
+
+
+class LibraryCollection(QuickSelectCollection):
+    """
+    A read-only collection from the collection library on disk, which can
+    be shared across scenes. Only the library index is read when listing
+    library collections, the full collection is read when it is loaded.
+    """
+    __slots__ = ()
+
+    def getTitle(self):
+        return self.name
+
+    def getActiveName(self):
+        return LIBRARY_PREFIX + self.name
+
+    def getNode(self):
+        return None
+
+    def load(self, node=None):
+        data = library.loadLibraryData(self.name) or {}
+        self.isTemplate = data.get('isTemplate', False)
+        self.loadDict(data)
+        self.updateIndex()
+
+    def save(self):
+        raise RuntimeError("library collections are read only: {0}".format(self.name))
+
+    def isReadOnly(self):
+        return True
+
+    def delete(self):
+        library.deleteLibraryData(self.name)
+        quickmenus.invalidateMenuData(QuickSelectMenu)
+
+
+
+class PendingCollection(QuickSelectCollection):
+    """
+    A read-only placeholder with no sets for a collection whose metadata
+    is still being parsed, so that menus never have to wait for parsing.
+    """
+    __slots__ = ()
+
+    def getTitle(self):
+        return '{0} (Loading...)'.format(super(PendingCollection, self).getTitle())
+
+    def load(self, node=None):
+        pass
+
+    def save(self):
+        raise RuntimeError("collection is still being parsed: {0}".format(self.getTitle()))
+
+    def isReadOnly(self):
+        return True
+
+    def isPending(self):
+        return True
+
+
+
+class StringTable(object):
+    """
+    Stores each unique node name once, so that sets can store
+    their nodes as compact arrays of indexes into the table.
+    Collections share one table between all of their sets,
+    since sets often contain many of the same nodes.
+    """
+    __slots__ = ('strings', 'indexes')
+
+    def __init__(self):
+        # all names in the table
+        self.strings = []
+        # the index of each name in `strings`, indexed by name
+        self.indexes = {}
+
+    def __len__(self):
+        return len(self.strings)
+
+    def add(self, string):
+        """
+        Add a name to the table if it doesn't exist, and return its index
+        """
+        index = self.indexes.get(string)
+        if index is None:
+            index = len(self.strings)
+            self.strings.append(string)
+            self.indexes[string] = index
+        return index
+
+    def encode(self, strings):
+        """
+        Return an array of the indexes of a list of names,
+        adding any names that are not yet in the table
+        """
+        return array('i', [self.add(s) for s in strings])
+
+    def decode(self, indexes):
+        """
+        Return the list of names for an array of indexes
+        """
+        strings = self.strings
+        return [strings[i] for i in indexes]
 
 
 
@@ -233,13 +1292,33 @@ class QuickSelectSet(object):
     Represents one or more objects in the scene that
     can then be easily selected
     """
-    def __init__(self, nodes, title=None, position=None):
-        # the nodes in this set
-        self.setNodes(nodes)
+    __slots__ = ('title', 'position', 'id', 'objectSet', 'isModified',
+                 '_table', '_memberIndexes', '_resolvedNodes', '_members')
+
+    def __init__(self, nodes=None, title=None, position=None, id=None, table=None):
+        # the objectSet containing the nodes in this set, if the
+        # set belongs to a collection that uses objectSets
+        self.objectSet = None
+        # the table containing the names of the nodes in this set,
+        # usually shared by all sets in a collection, see `setTable`
+        self._table = table if table is not None else StringTable()
+        # array of the indexes of the nodes in the table, or None
+        # if the nodes have not been read from the objectSet yet
+        self._memberIndexes = None
+        # whether the nodes have been changed since the objectSet was updated
+        self.isModified = False
+        # nodes resolved for each namespace, and sets of those
+        # nodes for fast membership tests, indexed by namespace
+        self._resolvedNodes = {}
+        self._members = {}
+        if nodes is not None:
+            self.setNodes(nodes)
         # title of this sets menu item
         self.title = title
         # the radial position of this set
         self.position = position
+        # the unique id of this set
+        self.id = id or uuid.uuid4().hex
 
     def getTitle(self):
         if self.title:
@@ -248,30 +1327,102 @@ class QuickSelectSet(object):
             return self.abbreviate(self.nodes)
 
     def __len__(self):
-        return self.nodes.__len__()
+        if self._memberIndexes is None:
+            return len(self.nodes)
+        return len(self._memberIndexes)
 
-    def asDict(self):
+    def asDict(self, embedNodes=False):
         """
         Return this QuickSelectSet as a simple python object
+
+        Args:
+            embedNodes: A bool, when True, include the nodes
+                even if the set is backed by an objectSet
         """
         result = {
-            'nodes': self.nodes,
             'title': self.title,
             'position': self.position,
+            'id': self.id,
         }
+        if embedNodes or not self.objectSet:
+            result['nodes'] = self.nodes
         return result
 
+    @property
+    def nodes(self):
+        """
+        The long names of the nodes in this set, which are read
+        from the objectSet the first time they are needed
+        """
+        if self._memberIndexes is None:
+            nodes = []
+            if self.objectSet:
+                members = pm.cmds.sets(self.objectSet, q=True)
+                if members:
+                    nodes = pm.cmds.ls(members, long=True)
+            self._memberIndexes = self._table.encode(nodes)
+            return nodes
+        return self._table.decode(self._memberIndexes)
+
     def setNodes(self, newNodes):
-        self.nodes = []
+        nodes = []
         for n in newNodes:
             if isinstance(n, pm.nt.DependNode):
-                self.nodes.append(n.longName())
+                nodes.append(n.longName())
             else:
-                self.nodes.append(str(n))
+                nodes.append(str(n))
+        self._memberIndexes = self._table.encode(nodes)
+        self.isModified = True
+        self._resolvedNodes = {}
+        self._members = {}
+
+    def setTable(self, table):
+        """
+        Move the nodes of this set into another table,
+        e.g. the table of the collection containing this set
+
+        Args:
+            table: A StringTable
+        """
+        if table is self._table:
+            return
+        if self._memberIndexes is not None:
+            self._memberIndexes = table.encode(self._table.decode(self._memberIndexes))
+        self._table = table
 
     def addNodes(self, newNodes):
-        pyNodes = [pm.PyNode(n) for n in self.nodes]
-        self.setNodes(set(pyNodes + newNodes))
+        """
+        Add nodes to this set
+
+        Args:
+            newNodes: A list of PyNodes or node names, names must be
+                relative for sets in template collections
+        """
+        names = [n.longName() if isinstance(n, pm.nt.DependNode) else str(n) for n in newNodes]
+        existing = set(self.nodes)
+        self.setNodes(self.nodes + [n for n in names if n not in existing])
+
+    def getNodes(self, namespace=''):
+        """
+        Return the names of the nodes in this set, resolved for
+        a namespace if the set belongs to a template collection
+
+        Args:
+            namespace: A string namespace of a template instance
+        """
+        if not namespace:
+            return self.nodes
+        if namespace not in self._resolvedNodes:
+            self._resolvedNodes[namespace] = [makeNameAbsolute(n, namespace) for n in self.nodes]
+        return self._resolvedNodes[namespace]
+
+    def getMembers(self, namespace=''):
+        """
+        Return a frozenset of the node names returned by `getNodes`
+        """
+        if namespace not in self._members:
+            self._members[namespace] = frozenset(self.getNodes(namespace))
+        return self._members[namespace]
 
     def abbreviate(self, nodes, maxLen=15):
         str = ', '.join([n.split('|')[-1] for n in nodes])
@@ -289,6 +1440,14 @@ class QuickSelectSet(object):
 
 class QuickSelectMenu(quickmenus.MarkingMenu):
 
+    # collections are also invalidated whenever they are saved
+    prewarmEvents = ['SceneOpened', 'NewSceneOpened', 'NameChanged', 'Undo', 'Redo',
+                     'NodeRemoved', 'ReferenceChanged']
+
+    # ids of sets that were shift-clicked, which are combined with
+    # the next set that is picked without shift
+    pendingSetIds = []
+
     def __init__(self):
         super(self.__class__, self).__init__()
         self.popupMenuId = 'QuickMenus_QuickSelectMenu'
@@ -298,43 +1457,125 @@ class QuickSelectMenu(quickmenus.MarkingMenu):
     def shouldBuild(self):
         return self.panelType == 'modelPanel'
 
-    def buildMenuItems(self):
-        self.collection = getActiveCollection()
+    def getMenuDataKey(self):
+        # the active collection is not panel specific, but depends
+        # on the namespace resolved from the selection
+        return (self.__class__, getActiveNamespace())
+
+    def getTelemetryGroup(self):
+        # sets are arranged per collection, and may be resolved for different namespaces
+        namespace = self.getMenuDataKey()[1]
+        title = self.collection.getTitle()
+        return '{0} {1}'.format(title, namespace) if namespace else title
+
+    def getMenuData(self, isPrewarm=False):
+        # don't create the default collection during idle, and never wait for parsing
+        collection = getActiveCollection(create=not isPrewarm, namespace=self.getMenuDataKey()[1], wait=False)
+        if collection:
+            return {
+                'collection': collection,
+                'vacancies': collection.getRadialVacancies(),
+            }
+
+    def getMenuItems(self):
+        self.collection = self.menuData['collection']
         self.isReadOnly = self.collection.isReadOnly()
+        if self.collection.isPending():
+            return [MenuItem(self.collection.getTitle(), enabled=False, italicized=True)]
+        items = self.getGroupItems(self.collection, self.menuData['vacancies'])
+
+        if not self.isReadOnly:
+            items.append(MenuItem('New Group...', command=pm.Callback(self.newGroupPrompt), italicized=True))
+
+        # collection title
+        items.append(MenuItem(divider=True))
+        items.append(MenuItem(self.collection.getTitle(), command=pm.Callback(self.selectAll),
+                              optionBox=pm.Callback(QuickSelectCollectionsMenu.editCollection, self.collection)))
+        return items
+
+    def getGroupItems(self, group, vacancies=None):
+        """
+        Return MenuItems for the sets in a group, and lazy sub menus
+        for each of its nested groups, which are only built when opened.
+        Sets and groups keep their stored radial positions, and the rest
+        are laid out in the vacant positions, using nested radial sub menus
+        when there are more of them, so that they can all be reached with
+        a gesture. Only when no position is vacant are they listed below.
+
+        Args:
+            group: A QuickSelectGroup, or the collection itself
+            vacancies: A list of the group's vacant radial positions,
+                if known, otherwise they are retrieved from the group
+        """
+        items = []
 
         # build menu items for each set
-        for i, s in enumerate(self.collection.sets):
-            itemKwargs = {
-                'l':s.getTitle(),
-            }
+        for s in group.sets:
+            label = s.getTitle()
             if SHOW_COUNTS:
-                itemKwargs['l'] += ' ({0})'.format(len(s))
-            if s.position:
-                itemKwargs['rp'] = s.position
-            pm.menuItem(c=pm.Callback(pm.select, s.nodes, add=True), **itemKwargs)
+                label += ' ({0})'.format(len(s))
+            optionBox = None
             if not self.isReadOnly:
-                pm.menuItem(ob=True, c=pm.Callback(self.editSet, s, i))
+                optionBox = pm.Callback(self.editSet, s)
+            items.append(MenuItem(label, s.position, pm.Callback(self.pickSet, s), optionBox=optionBox,
+                                  checkBox=True if s.id in self.pendingSetIds else None,
+                                  annotation='Shift+click to pick multiple sets, Ctrl+click to deselect, '
+                                             'Ctrl+Shift+click to select only nodes in every picked set'))
+
+        # build sub menus for each group
+        for g in group.groups:
+            items.append(MenuItem(g.getTitle(), g.position, lazySubMenu=partial(self.getGroupItems, g)))
+
+        if vacancies is None:
+            vacancies = group.getRadialVacancies()
+        unpositioned = [item for item in items if item.radialPosition is None]
+        items = [item for item in items if item.radialPosition is not None]
+        items.extend(quickmenus.layoutRadialMenuItems(unpositioned, positions=vacancies))
+        vacancies = vacancies[len(unpositioned):]
 
         # put in slots for vacancies
         if not self.isReadOnly:
-            vacantPositions = self.collection.getRadialVacancies()
-            for rp in vacantPositions:
-                pm.menuItem(l='...', rp=rp, c=pm.Callback(self.addSetFromSelection, position=rp))
+            for rp in vacancies:
+                items.append(MenuItem('...', rp, pm.Callback(self.addSetFromSelection, position=rp, group=group)))
             # always include slot at end of extras list
-            pm.menuItem(l='...', c=pm.Callback(self.addSetFromSelection))
-
-        # collection title
-        pm.menuItem(d=True)
-        pm.menuItem(l=self.collection.name, c=pm.Callback(self.selectAll))
-        pm.menuItem(ob=True, c=pm.CallbackWithArgs(QuickSelectCollectionsMenu.editCollection, self.collection))
+            items.append(MenuItem('...', command=pm.Callback(self.addSetFromSelection, group=group)))
+            if group is not self.collection:
+                items.append(MenuItem(divider=True))
+                items.append(MenuItem('Edit Group...', command=pm.Callback(self.editGroup, group), italicized=True))
+        return items
+
+    def addSetFromSelection(self, position=None, group=None):
+        s = QuickSelectSet(self.collection.getNodeNames(pm.selected()), position=position)
+        if len(s):
+            self.collection.addSet(s, group)
 
+    def newGroupPrompt(self):
+        title = promptBox('New Quick Select Group', 'Enter a name:', 'Create', 'Cancel')
+        if title:
+            # place new groups radially when possible
+            vacancies = self.collection.getRadialVacancies()
+            position = vacancies[0] if vacancies else None
+            self.collection.addGroup(QuickSelectGroup(title, position))
 
-    def addSetFromSelection(self, position=None):
-        s = QuickSelectSet(pm.selected(), position=position)
-        if len(s):
-            self.collection.addSet(s)
+    def editGroup(self, group):
+        kw = dict(
+            t='Edit Quick Select Group:',
+            m=group.getTitle(),
+            db='Cancel',
+            cb='Cancel',
+            ds='dismiss',
+            b=['Rename', 'Delete', 'Cancel'],
+        )
+        action = pm.confirmDialog(**kw)
+        if action == 'Rename':
+            title = promptBox('Rename Group', 'Enter a name:', 'Rename', 'Cancel', tx=group.title)
+            if title:
+                group.title = title
+                self.collection.save()
+        elif action == 'Delete':
+            self.collection.removeGroup(group)
 
-    def editSet(self, quickSet, quickSetIndex):
+    def editSet(self, quickSet):
         kw = dict(
             t='Edit Quick Select Set:',
             m=quickSet.getTitle(),
@@ -351,14 +1592,14 @@ class QuickSelectMenu(quickmenus.MarkingMenu):
         elif action == 'Rename':
             self.renamePrompt(quickSet)
         elif action == 'Delete':
-            self.deleteSet(quickSetIndex)
+            self.deleteSet(quickSet)
 
     def addSelection(self, quickSet):
-        quickSet.addNodes(pm.selected())
+        quickSet.addNodes(self.collection.getNodeNames(pm.selected()))
         self.collection.save()
 
     def replaceWithSelection(self, quickSet):
-        quickSet.setNodes(pm.selected())
+        quickSet.setNodes(self.collection.getNodeNames(pm.selected()))
         self.collection.save()
 
     def renamePrompt(self, quickSet):
@@ -367,60 +1608,113 @@ class QuickSelectMenu(quickmenus.MarkingMenu):
             quickSet.title = name
             self.collection.save()
 
-    def deleteSet(self, quickSetIndex):
-        self.collection.removeSetAtIndex(quickSetIndex)
+    def deleteSet(self, quickSet):
+        self.collection.removeSet(quickSet)
+
+    def selectSet(self, quickSet):
+        self.collection.selectSets([quickSet], SELECT_ALL_INSTANCES)
+
+    def pickSet(self, quickSet):
+        """
+        Select a set, or combine it with previously picked sets
+        depending on the modifier keys that are held:
+            Shift: add or remove the set from the pending picks
+            None: add the union of all picked sets to the selection
+            Ctrl: remove the union of all picked sets from the selection
+            Ctrl+Shift: replace the selection with the intersection of all picked sets
+        """
+        cls = self.__class__
+        isShiftPressed, isCtrlPressed, isAltPressed = quickmenus.getModifiers()
+        if isShiftPressed and not isCtrlPressed:
+            if quickSet.id in cls.pendingSetIds:
+                cls.pendingSetIds.remove(quickSet.id)
+            else:
+                cls.pendingSetIds.append(quickSet.id)
+            return
+        sets = [self.collection.getById(i) for i in cls.pendingSetIds if i != quickSet.id]
+        sets = [s for s in sets if isinstance(s, QuickSelectSet)] + [quickSet]
+        cls.pendingSetIds = []
+        if isCtrlPressed and isShiftPressed:
+            self.collection.selectSets(sets, SELECT_ALL_INSTANCES, INTERSECTION, mode='replace')
+        elif isCtrlPressed:
+            self.collection.selectSets(sets, SELECT_ALL_INSTANCES, UNION, mode='deselect')
+        else:
+            self.collection.selectSets(sets, SELECT_ALL_INSTANCES, UNION)
 
     def selectAll(self):
-        for s in self.collection.sets:
-            s.select(add=True)
+        self.collection.selectSets(list(self.collection.iterSets()), SELECT_ALL_INSTANCES)
 
 
 
 
 class QuickSelectCollectionsMenu(quickmenus.RMBMarkingMenu):
 
-    def buildMenuItems(self):
-        # header
-        pm.menuItem(l='Quick Select Collections', en=False)
-        pm.menuItem(d=True)
-
-        # list all collections
-        collections = getAllCollections()
-        collections.sort(lambda a, b: cmp(a.name, b.name))
-        for coll in collections:
-            itemKwargs = {
-                'l': coll.name,
-                'cb': coll.isActive(),
-            }
-            pm.menuItem(c=pm.Callback(coll.makeActive), **itemKwargs)
-            pm.menuItem(ob=True, c=pm.CallbackWithArgs(QuickSelectCollectionsMenu.editCollection, coll))
-
-        # new collection item
-        pm.menuItem(l='New...', itl=True, c=pm.Callback(QuickSelectCollectionsMenu.newCollectionPrompt))
+    def getMenuItems(self):
+        items = [
+            # header
+            MenuItem('Quick Select Collections', enabled=False),
+            MenuItem(divider=True),
+        ]
+
+        # list all collections, grouped by namespace, followed by the library.
+        # collections are only loaded when they are edited
+        groupKey = None
+        for header in getCollectionHeaders():
+            if groupKey is not None and (header['isLibrary'], header['namespace']) != groupKey:
+                items.append(MenuItem(divider=True))
+            if header['isLibrary'] and (groupKey is None or not groupKey[0]):
+                items.append(MenuItem('Library', enabled=False))
+            groupKey = (header['isLibrary'], header['namespace'])
+            label = header['title']
+            if SHOW_COUNTS and header['setCount'] is not None:
+                label += ' ({0})'.format(header['setCount'])
+            items.append(MenuItem(label, command=pm.Callback(setActiveCollectionName, header['activeName'], header['namespace']),
+                                  checkBox=header['isActive'],
+                                  optionBox=pm.Callback(QuickSelectCollectionsMenu.editCollectionFromHeader, header),
+                                  annotation='Template' if header['isTemplate'] else None))
+        items.append(MenuItem(divider=True))
+
+        # new collection items
+        items.append(MenuItem('New...', command=pm.Callback(QuickSelectCollectionsMenu.newCollectionPrompt), italicized=True))
+        items.append(MenuItem('New Template...', command=pm.Callback(QuickSelectCollectionsMenu.newCollectionPrompt, isTemplate=True),
+            italicized=True, annotation="Create a collection of namespace-relative sets that can be used with any instance of an asset"
+        ))
 
         # additional options
-        pm.menuItem(d=True)
-        pm.menuItem(l='Show Node Counts', cb=SHOW_COUNTS, c=pm.CallbackWithArgs(setShowCounts),
-            ann="Display node counts on menu items in the quick select menu"
-        )
+        items.append(MenuItem(divider=True))
+        items.append(MenuItem('Show Node Counts', command=pm.CallbackWithArgs(setShowCounts), checkBox=SHOW_COUNTS,
+            annotation="Display node counts on menu items in the quick select menu"
+        ))
+        items.append(MenuItem('Use Selection Namespace', command=pm.CallbackWithArgs(setAutoNamespace), checkBox=AUTO_NAMESPACE,
+            annotation="Use the active collection from the namespace of the selected node, e.g. the selected character"
+        ))
+        items.append(MenuItem('Select All Instances', command=pm.CallbackWithArgs(setSelectAllInstances), checkBox=SELECT_ALL_INSTANCES,
+            annotation="Select template sets in every instance of the template, instead of only the selected instance"
+        ))
+        return items
 
     @staticmethod
-    def newCollectionPrompt():
+    def newCollectionPrompt(isTemplate=False):
         name = promptBox('New Quick Select Collection', 'Enter a name (camelCase):', 'Create', 'Cancel')
         if name:
-            createCollection(name)
+            createCollection(name, isTemplate)
 
     @staticmethod
     def editCollection(coll, *args, **kwargs):
         print(args, kwargs)
         kw = dict(
-            t='Edit Collection: {0}'.format(coll.name),
-            m='{0} set(s)'.format(len(coll.sets)),
+            t='Edit Collection: {0}'.format(coll.getTitle()),
+            m='{0} set(s)'.format(coll.getSetCount()),
             db='Cancel',
             cb='Cancel',
             ds='dismiss',
-            b=['Delete', 'Clear', 'Rename', 'Cancel'],
+            b=['Delete', 'Clear', 'Rename', 'Publish', 'Cancel'],
         )
+        if coll.isReadOnly():
+            kw['m'] += ' (read only)'
+            kw['b'] = ['Publish', 'Cancel']
+        elif not coll.isTemplate:
+            kw['b'].insert(-1, 'Use Metadata' if coll.useObjectSets else 'Use Object Sets')
         action = pm.confirmDialog(**kw)
         if action == 'Clear':
             coll.clearSets()
@@ -428,6 +1722,45 @@ class QuickSelectCollectionsMenu(quickmenus.RMBMarkingMenu):
             coll.delete()
         elif action == 'Rename':
             QuickSelectCollectionsMenu.renameCollectionPrompt(coll)
+        elif action == 'Publish':
+            QuickSelectCollectionsMenu.publishCollectionPrompt(coll)
+        elif action == 'Use Object Sets':
+            coll.setUseObjectSets(True)
+        elif action == 'Use Metadata':
+            coll.setUseObjectSets(False)
+
+    @staticmethod
+    def editCollectionFromHeader(header):
+        if header['isLibrary']:
+            QuickSelectCollectionsMenu.editLibraryCollection(header['name'])
+        else:
+            coll = getCollectionFromHeader(header)
+            if coll:
+                QuickSelectCollectionsMenu.editCollection(coll)
+
+    @staticmethod
+    def publishCollectionPrompt(coll):
+        key = promptBox('Publish to Library', 'Enter a library name, e.g. the asset name:', 'Publish', 'Cancel', tx=coll.name)
+        if key:
+            try:
+                coll.publish(key)
+            except ValueError as e:
+                LOG.warning(e)
+
+    @staticmethod
+    def editLibraryCollection(key):
+        kw = dict(
+            t='Edit Library Collection: {0}'.format(key),
+            m=library.getLibraryPath(),
+            db='Cancel',
+            cb='Cancel',
+            ds='dismiss',
+            b=['Delete', 'Cancel'],
+        )
+        action = pm.confirmDialog(**kw)
+        if action == 'Delete':
+            library.deleteLibraryData(key)
+            quickmenus.invalidateMenuData(QuickSelectMenu)
 
     @staticmethod
     def renameCollectionPrompt(coll):
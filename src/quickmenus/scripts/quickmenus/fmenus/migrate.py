@@ -0,0 +1,265 @@
+
+import os
+import sys
+import json
+import time
+import difflib
+import logging
+import argparse
+import importlib
+import multiprocessing
+
+import mafile
+
+
+__all__ = [
+    "findSceneFiles",
+    "formatReport",
+    "getTransformName",
+    "loadProgress",
+    "migrateFile",
+    "migrateFiles",
+    "resolveTransform",
+]
+
+
+LOG = logging.getLogger("quickmenus")
+
+
+# Batch migration of quick select collections in Maya ASCII files. Does not
+# require maya, so that it can run on farm nodes, e.g.:
+#   python migrate.py --transform mymodule:fixControls --dry-run --jobs 8 /path/to/shots
+# Transforms take (nodeName, data) for each collection, where data is the same as
+# the data returned by `QuickSelectCollection.getData`, and return new data, or None
+# to leave the collection unchanged. Transforms must be importable by the worker
+# processes, so they are given as 'module:function' strings, or as top level functions.
+
+
+def findSceneFiles(paths):
+    """
+    Return a sorted list of all .ma files in a list of files and directories
+
+    Args:
+        paths: A list of string file or directory paths, directories are searched recursively
+    """
+    result = set()
+    for path in paths:
+        if os.path.isdir(path):
+            for dirpath, dirnames, filenames in os.walk(path):
+                result.update([os.path.join(dirpath, f) for f in filenames if f.endswith('.ma')])
+        else:
+            result.add(path)
+    return sorted(result)
+
+
+def resolveTransform(transform):
+    """
+    Return a transform function
+
+    Args:
+        transform: A callable, or a string 'module:function' to import
+    """
+    if callable(transform):
+        return transform
+    moduleName, attrName = transform.split(':')
+    return getattr(importlib.import_module(moduleName), attrName)
+
+
+def getTransformName(transform):
+    """
+    Return the 'module:function' name of a transform, which identifies
+    the migration that produced a result in a progress file
+
+    Args:
+        transform: A callable, or a string 'module:function'
+    """
+    if callable(transform):
+        return '{0}:{1}'.format(transform.__module__, transform.__name__)
+    return transform
+
+
+def _dumpData(data):
+    return json.dumps(data, indent=1, sort_keys=True, separators=(',', ': '))
+
+
+def migrateFile(path, transform, dryRun=False):
+    """
+    Apply a transform to all collections in a Maya ASCII file, and return a dict
+    result containing 'path', 'transform' (see `getTransformName`), 'changed' (list
+    of changed collection node names), 'diff' (unified diff text of the changed
+    collections), 'time' (seconds), 'mtime' (of the file after migrating),
+    and 'error' (string or None)
+
+    Args:
+        path: A string path to a .ma file
+        transform: A transform callable or 'module:function' string
+        dryRun: A bool, when True, don't modify the file
+    """
+    startTime = time.time()
+    diffs = []
+
+    def recordTransform(nodeName, data):
+        before = _dumpData(data)
+        newData = transformFunc(nodeName, data)
+        if newData is None:
+            return
+        after = _dumpData(newData)
+        # transforms may return the same data, or modify it in place
+        if after == before:
+            return
+        diffs.append('\n'.join(difflib.unified_diff(
+            before.splitlines(), after.splitlines(),
+            '{0}:{1}'.format(path, nodeName), '{0}:{1}'.format(path, nodeName), lineterm='')))
+        return newData
+
+    result = {'path': path, 'transform': getTransformName(transform), 'changed': [], 'diff': '', 'error': None}
+    try:
+        transformFunc = resolveTransform(transform)
+        if not path.endswith('.ma'):
+            raise ValueError("only Maya ASCII files are supported")
+        if dryRun:
+            for nodeName, data in mafile.iterCollections(path):
+                if recordTransform(nodeName, data) is not None:
+                    result['changed'].append(nodeName)
+        else:
+            result['changed'] = mafile.rewriteCollections(path, recordTransform)
+    except Exception as e:
+        result['error'] = '{0}: {1}'.format(type(e).__name__, e)
+    result['diff'] = '\n'.join(diffs)
+    result['time'] = time.time() - startTime
+    result['mtime'] = os.path.getmtime(path) if os.path.isfile(path) else None
+    return result
+
+
+def _migrateFileArgs(args):
+    # pool workers take a single argument
+    return migrateFile(*args)
+
+
+def loadProgress(progressPath):
+    """
+    Return the results recorded in a progress file, indexed by path
+
+    Args:
+        progressPath: A string path to a progress file written by `migrateFiles`
+    """
+    results = {}
+    if progressPath and os.path.isfile(progressPath):
+        with open(progressPath, 'r') as fp:
+            for line in fp:
+                try:
+                    result = json.loads(line)
+                except ValueError:
+                    # the last line may be partial if the migration was interrupted
+                    continue
+                results[result['path']] = result
+    return results
+
+
+def migrateFiles(paths, transform, dryRun=False, processes=None, progressPath=None):
+    """
+    Apply a transform to all collections in many Maya ASCII files using a process pool,
+    and return a list of results, see `migrateFile`. Each result is appended to a progress
+    file as soon as it is finished, so that an interrupted migration can be resumed by
+    running it again, skipping files that were migrated by the same transform and have
+    not changed since.
+
+    Args:
+        paths: A list of string file or directory paths, see `findSceneFiles`
+        transform: A 'module:function' string, or a top level function
+        dryRun: A bool, when True, don't modify any files
+        processes: An int number of worker processes, defaults to the number of cpus
+        progressPath: A string path to a progress file to resume from
+            and append to, not used for dry runs
+    """
+    files = findSceneFiles(paths)
+    results = []
+    if progressPath and not dryRun:
+        progress = loadProgress(progressPath)
+        transformName = getTransformName(transform)
+        remaining = []
+        for path in files:
+            previous = progress.get(path)
+            if (previous and not previous['error'] and previous.get('transform') == transformName and
+                    previous['mtime'] == os.path.getmtime(path)):
+                results.append(previous)
+            else:
+                remaining.append(path)
+        if len(remaining) < len(files):
+            LOG.info('Skipping {0} files that were already migrated'.format(len(files) - len(remaining)))
+        files = remaining
+    progressFile = open(progressPath, 'a') if progressPath and not dryRun else None
+    pool = multiprocessing.Pool(processes)
+    try:
+        args = [(path, transform, dryRun) for path in files]
+        for result in pool.imap_unordered(_migrateFileArgs, args):
+            results.append(result)
+            if result['error']:
+                LOG.error('{0}: {1}'.format(result['path'], result['error']))
+            else:
+                LOG.info('{0}: {1} changed ({2:.2f}s)'.format(result['path'], len(result['changed']), result['time']))
+            if progressFile:
+                progressFile.write(json.dumps(result) + '\n')
+                progressFile.flush()
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+        if progressFile:
+            progressFile.close()
+    return sorted(results, key=lambda r: r['path'])
+
+
+def formatReport(results, showDiffs=True):
+    """
+    Return a text report of migration results, including
+    diffs, errors, and the slowest files
+
+    Args:
+        results: A list of results from `migrateFiles`
+        showDiffs: A bool, when True, include the diff of each changed collection
+    """
+    lines = []
+    changed = [r for r in results if r['changed']]
+    errors = [r for r in results if r['error']]
+    if showDiffs:
+        for r in changed:
+            if r['diff']:
+                lines.append(r['diff'])
+    for r in errors:
+        lines.append('ERROR {0}: {1}'.format(r['path'], r['error']))
+    totalTime = sum([r['time'] for r in results])
+    lines.append('{0} files, {1} changed, {2} errors, {3:.2f}s total'.format(
+        len(results), len(changed), len(errors), totalTime))
+    slowest = sorted(results, key=lambda r: r['time'], reverse=True)[:5]
+    if slowest:
+        lines.append('slowest files:')
+        lines.extend(['  {0:.2f}s {1}'.format(r['time'], r['path']) for r in slowest])
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Migrate quick select collections in Maya ASCII files")
+    parser.add_argument('paths', nargs='+', help="scene files or directories to search for .ma files")
+    parser.add_argument('-t', '--transform', required=True, help="transform function as 'module:function'")
+    parser.add_argument('-n', '--dry-run', action='store_true', help="report changes without modifying files")
+    parser.add_argument('-j', '--jobs', type=int, default=None, help="number of worker processes")
+    parser.add_argument('-p', '--progress', help="progress file for resuming interrupted migrations")
+    parser.add_argument('-r', '--report', help="write the report to a file instead of stdout")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    results = migrateFiles(args.paths, args.transform, args.dry_run, args.jobs, args.progress)
+    report = formatReport(results)
+    if args.report:
+        with open(args.report, 'w') as fp:
+            fp.write(report + '\n')
+    else:
+        print(report)
+    return 1 if [r for r in results if r['error']] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,3 +1,5 @@
 
 from core import *
+from display import *
 from menus import *
+from selection import *
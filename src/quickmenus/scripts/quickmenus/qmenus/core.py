@@ -1,6 +1,9 @@
 
 from .. import core
+from .. import events
+import display
 import menus
+import selection
 
 
 __all__ = [
@@ -10,6 +13,11 @@ __all__ = [
     "removeHotkeys",
 ]
 
+
+# the owner of the event callbacks registered by q-menus
+EVENT_OWNER = 'quickmenus.qmenus'
+
+
 def registerHotkeys():
     importCmd = "import maya.mel as mel"
     preBuildCmd = "mel.eval('global string $gSelect; setToolTo $gSelect;')"
@@ -35,10 +43,21 @@ def enable():
     core.registerMenu("QMenus", menus.CameraQuickSwitchMenu)
     core.registerMenu("AltQMenus", menus.ComponentSelectionMaskingMenu)
     core.registerMenu("AltQMenus", menus.ResetterMenu)
+    # build both menus at once so that pressing alt while q is held doesn't rebuild them
+    core.registerMenuVariants({"": "QMenus", "Alt": "AltQMenus"})
+    display.enableDisplayTracking()
+    events.addEventCallback('PluginLoaded', selection.invalidateInheritedTypes, EVENT_OWNER)
+    core.enablePrewarm()
     print('Quick Menus: Q-Menus enabled')
 
 
 def disable():
+    core.unregisterMenuVariants("QMenus")
     core.unregisterMenu("QMenus", all=True)
+    core.unregisterMenu("AltQMenus", all=True)
+    display.disableDisplayTracking()
+    events.removeEventCallbacks(EVENT_OWNER)
+    # update prewarm events for the remaining menus
+    core.enablePrewarm()
     print('Quick Menus: Q-Menus disabled')
 
@@ -0,0 +1,458 @@
+
+import re
+import json
+import logging
+import time
+
+import pymel.core as pm
+
+import quickmenus
+
+
+__all__ = [
+    'captureDisplayPreset',
+    'deleteDisplayPreset',
+    'disableDisplayTracking',
+    'DISPLAY_FLAGS',
+    'enableDisplayTracking',
+    'getDisplayFlags',
+    'getDisplayPreset',
+    'getDisplayPresetNames',
+    'getIsolateNodes',
+    'getModelPanels',
+    'invalidateDisplayFlags',
+    'isIsolateToggled',
+    'PRESET_TIMINGS',
+    'restoreDisplayPreset',
+    'setDisplayFlags',
+    'toggleIsolate',
+]
+
+
+LOG = logging.getLogger('quickmenus')
+
+
+# all object display flags of a modelEditor that are tracked per panel
+DISPLAY_FLAGS = [
+    'nurbsCurves', 'nurbsSurfaces', 'cv', 'hulls', 'polymeshes',
+    'subdivSurfaces', 'planes', 'lights', 'cameras', 'imagePlane',
+    'joints', 'ikHandles', 'deformers', 'dynamics', 'particleInstancers',
+    'fluids', 'hairSystems', 'follicles', 'nCloths', 'nParticles',
+    'nRigids', 'dynamicConstraints', 'locators', 'dimensions', 'pivots',
+    'handles', 'textures', 'strokes', 'motionTrails', 'pluginShapes',
+    'clipGhosts', 'greasePencils', 'manipulators', 'grid', 'hud',
+]
+
+# matches the boolean flags in the state string of a modelEditor, e.g. '-nurbsCurves 1'
+STATE_FLAG_RE = re.compile(r'-(\w+)\s+(0|1|true|false)\b')
+
+# the long names used in state strings of display flags that are tracked by short name
+STATE_FLAG_NAMES = {'controlVertices': 'cv', 'headsUpDisplay': 'hud'}
+
+# flags that change other flags when edited, and
+# invalidate a panel's cached flags when they are set
+GROUP_FLAGS = ['allObjects']
+
+# the display flags of each model panel, indexed by panel name
+_DISPLAY_FLAGS_CACHE = {}
+
+# the subset of DISPLAY_FLAGS supported by this version of maya
+_SUPPORTED_FLAGS = None
+
+# the owner of the event callbacks used to invalidate cached display flags
+TRACKING_EVENT_OWNER = 'quickmenus.display'
+
+# the optionVar and fileInfo key used to store user and scene presets
+PRESETS_KEY = 'quickMenus_displayPresets'
+
+# cached display presets, stored as a dict of {name: flags} indexed by scope
+_PRESETS_CACHE = {}
+
+# the isolate select state of each panel before it was isolated by
+# `toggleIsolate`, stored as (wasIsolated, members) indexed by panel name
+_PREVIOUS_ISOLATION = {}
+
+# the duration in seconds of the last capture and restore
+# of each display preset, indexed by preset name
+PRESET_TIMINGS = {}
+
+
+def enableDisplayTracking():
+    """
+    Start invalidating cached display flags when any model editor
+    changes, so that the cache stays accurate.
+    """
+    disableDisplayTracking()
+    for event in ('modelEditorChanged', 'SceneOpened', 'NewSceneOpened'):
+        quickmenus.addEventCallback(event, invalidateDisplayFlags, TRACKING_EVENT_OWNER)
+    # scene presets are stored in the scene
+    for event in ('SceneOpened', 'NewSceneOpened'):
+        quickmenus.addEventCallback(event, _invalidatePresets, TRACKING_EVENT_OWNER)
+
+
+def disableDisplayTracking():
+    """
+    Stop tracking model editor changes, and clear all cached display flags
+    """
+    quickmenus.removeEventCallbacks(TRACKING_EVENT_OWNER)
+    invalidateDisplayFlags()
+    _invalidatePresets()
+
+
+def invalidateDisplayFlags(panel=None):
+    """
+    Clear cached display flags
+
+    Args:
+        panel: A string name of a model panel, if None, clears all panels
+    """
+    if panel is None:
+        _DISPLAY_FLAGS_CACHE.clear()
+    else:
+        _DISPLAY_FLAGS_CACHE.pop(panel, None)
+
+
+def getModelPanels(scope='current', panel=None):
+    """
+    Return a list of model panels
+
+    Args:
+        scope: A string, one of 'current' for only the given panel, 'visible'
+            for all visible model panels, or 'all' for all model panels,
+            including torn off and hidden panels
+        panel: A string name of the current panel, defaults to the panel under the pointer
+    """
+    if scope == 'current':
+        return [panel if panel else pm.getPanel(up=True)]
+    modelPanels = pm.cmds.getPanel(type='modelPanel') or []
+    if scope == 'visible':
+        visible = set(pm.cmds.getPanel(vis=True) or [])
+        return [p for p in modelPanels if p in visible]
+    elif scope == 'all':
+        return modelPanels
+    raise ValueError("Invalid scope: {0}".format(scope))
+
+
+def getDisplayFlags(panel):
+    """
+    Return a dict of all display flags of a model panel.
+    All flags are read from the panel's state string in one query,
+    and cached until the panel is changed or the cache is invalidated.
+    The result should not be modified.
+
+    Args:
+        panel: A string name of a model panel
+    """
+    flags = _DISPLAY_FLAGS_CACHE.get(panel)
+    if flags is None:
+        stateFlags = _getStateFlags(panel)
+        flags = {}
+        for flag in _getSupportedFlags(panel, stateFlags):
+            if flag in stateFlags:
+                flags[flag] = stateFlags[flag]
+            else:
+                # not included in the state string, query it directly
+                flags[flag] = pm.cmds.modelEditor(panel, q=True, **{flag: True})
+        _DISPLAY_FLAGS_CACHE[panel] = flags
+    return flags
+
+
+def setDisplayFlags(panels, flags):
+    """
+    Set display flags on one or more model panels, using a single
+    modelEditor edit per panel that only includes flags that
+    differ from the panel's current state.
+
+    Args:
+        panels: A list of string names of model panels
+        flags: A dict of {flag: bool} display flags to set
+    """
+    for panel in panels:
+        current = getDisplayFlags(panel)
+        changes = dict([(k, v) for k, v in flags.items() if current.get(k) != v])
+        if not changes:
+            continue
+        LOG.debug('Setting display flags on {0}: {1}'.format(panel, changes))
+        pm.cmds.modelEditor(panel, e=True, **changes)
+        if any([k in GROUP_FLAGS for k in changes]):
+            invalidateDisplayFlags(panel)
+        else:
+            current.update(changes)
+
+
+# Display Presets
+# ---------------
+
+def captureDisplayPreset(name, panel, scope='user'):
+    """
+    Save the full set of display flags of a model panel as a named preset.
+    Overwrites any existing preset with the same name and scope.
+
+    Args:
+        name: A string name of the preset
+        panel: A string name of the model panel to capture
+        scope: A string, 'user' to store the preset in the user's
+            preferences, or 'scene' to store it in the current scene
+    """
+    startTime = time.time()
+    invalidateDisplayFlags(panel)
+    flags = dict(getDisplayFlags(panel))
+    presets = dict(_getPresets(scope))
+    presets[name] = flags
+    _setPresets(scope, presets)
+    _recordTiming(name, 'capture', startTime)
+
+
+def deleteDisplayPreset(name, scope=None):
+    """
+    Delete a named display preset
+
+    Args:
+        name: A string name of the preset
+        scope: A string, 'user' or 'scene', if None, deletes the preset from both
+    """
+    for s in ([scope] if scope else ['user', 'scene']):
+        presets = _getPresets(s)
+        if name in presets:
+            presets = dict(presets)
+            del presets[name]
+            _setPresets(s, presets)
+
+
+def getDisplayPresetNames():
+    """
+    Return a sorted list of the names of all
+    user and scene display presets
+    """
+    return sorted(set(_getPresets('user')) | set(_getPresets('scene')))
+
+
+def getDisplayPreset(name):
+    """
+    Return the display flags of a preset, or None if it doesn't exist.
+    Scene presets take precedence over user presets of the same name.
+
+    Args:
+        name: A string name of the preset
+    """
+    for scope in ('scene', 'user'):
+        presets = _getPresets(scope)
+        if name in presets:
+            return presets[name]
+
+
+def restoreDisplayPreset(name, panels):
+    """
+    Restore a display preset on one or more model panels, using a single
+    modelEditor edit per panel that only includes the flags that differ.
+
+    Args:
+        name: A string name of the preset
+        panels: A list of string names of model panels
+    """
+    flags = getDisplayPreset(name)
+    if flags is None:
+        LOG.warning('Display preset not found: {0}'.format(name))
+        return
+    if not panels:
+        return
+    startTime = time.time()
+    # ignore flags captured in other versions of maya
+    supported = _getSupportedFlags(panels[0])
+    flags = dict([(k, v) for k, v in flags.items() if k in supported])
+    setDisplayFlags(panels, flags)
+    _recordTiming(name, 'restore', startTime)
+
+
+def _getPresets(scope):
+    """
+    Return a dict of {name: flags} for all presets of a scope.
+    The result should not be modified.
+    """
+    if scope not in _PRESETS_CACHE:
+        if scope == 'user':
+            data = pm.optionVar.get(PRESETS_KEY)
+        elif scope == 'scene':
+            data = pm.fileInfo.get(PRESETS_KEY)
+        else:
+            raise ValueError("Invalid scope: {0}".format(scope))
+        presets = {}
+        if data:
+            try:
+                presets = json.loads(data)
+            except ValueError as e:
+                LOG.warning('Failed to load {0} display presets: {1}'.format(scope, e))
+        _PRESETS_CACHE[scope] = presets
+    return _PRESETS_CACHE[scope]
+
+
+def _setPresets(scope, presets):
+    data = json.dumps(presets, sort_keys=True)
+    if scope == 'user':
+        pm.optionVar[PRESETS_KEY] = data
+    elif scope == 'scene':
+        pm.fileInfo[PRESETS_KEY] = data
+    else:
+        raise ValueError("Invalid scope: {0}".format(scope))
+    _PRESETS_CACHE[scope] = presets
+
+
+def _invalidatePresets():
+    _PRESETS_CACHE.clear()
+
+
+def _recordTiming(name, action, startTime):
+    duration = time.time() - startTime
+    PRESET_TIMINGS.setdefault(name, {})[action] = duration
+    LOG.debug('Display preset {0} {1} took {2:.2f}ms'.format(name, action, duration * 1000))
+
+
+# Isolate Select
+# --------------
+
+def getIsolateNodes(mode='selection'):
+    """
+    Return a list of the long names of the dag nodes to isolate
+
+    Args:
+        mode: A string, one of 'selection' for the selected objects,
+            'inverse' for the shapes of all objects that are not selected,
+            or 'type' for all objects with the same shape types as the selection
+    """
+    cmds = pm.cmds
+    sel = cmds.ls(sl=True, long=True, objectsOnly=True) or []
+    if mode == 'selection':
+        return sel
+    if not sel:
+        return []
+    if mode == 'inverse':
+        shapes = cmds.ls(type='shape', noIntermediate=True, long=True) or []
+        selSet = set(sel)
+        result = set()
+        for shape in shapes:
+            # exclude the selected nodes, and any of their descendants
+            parts = shape.split('|')
+            if not any(['|'.join(parts[:i]) in selSet for i in range(2, len(parts) + 1)]):
+                # isolate the shape instead of its transform, since isolating
+                # a transform would also show any selected descendants, e.g.
+                # child controls in a chain of controls with curve shapes
+                result.add(shape)
+        return sorted(result)
+    elif mode == 'type':
+        selShapes = cmds.ls(sel, dag=True, type='shape', noIntermediate=True) or []
+        types = list(set([cmds.nodeType(s) for s in selShapes]))
+        if not types:
+            return []
+        shapes = cmds.ls(type=types, noIntermediate=True, long=True) or []
+        return sorted(set(['|'.join(s.split('|')[:-1]) for s in shapes]))
+    raise ValueError("Invalid mode: {0}".format(mode))
+
+
+def isIsolateToggled(panel):
+    """
+    Return True if a panel is currently isolated by `toggleIsolate`
+    """
+    if panel not in _PREVIOUS_ISOLATION:
+        return False
+    if not pm.cmds.isolateSelect(panel, q=True, state=True):
+        # isolation was turned off some other way
+        del _PREVIOUS_ISOLATION[panel]
+        return False
+    return True
+
+
+def toggleIsolate(panel, mode='selection'):
+    """
+    Isolate objects in a model panel, or restore the panel's previous
+    isolation state if it is currently isolated by this function.
+    The isolated set's members are replaced in a single edit,
+    and the whole operation is undoable as one chunk.
+
+    Args:
+        panel: A string name of a model panel
+        mode: A string, the objects to isolate, see `getIsolateNodes`
+
+    Returns:
+        True if the panel was isolated, False if the
+        previous state was restored or nothing was isolated
+    """
+    cmds = pm.cmds
+    pm.undoInfo(openChunk=True)
+    try:
+        if isIsolateToggled(panel):
+            wasIsolated, members = _PREVIOUS_ISOLATION.pop(panel)
+            if wasIsolated:
+                _setIsolateMembers(panel, members)
+            else:
+                cmds.isolateSelect(panel, state=False)
+            return False
+
+        nodes = getIsolateNodes(mode)
+        if not nodes:
+            return False
+        wasIsolated = bool(cmds.isolateSelect(panel, q=True, state=True))
+        members = []
+        if wasIsolated:
+            viewSet = cmds.isolateSelect(panel, q=True, viewObjects=True)
+            if viewSet:
+                members = cmds.sets(viewSet, q=True) or []
+        _PREVIOUS_ISOLATION[panel] = (wasIsolated, members)
+        if not wasIsolated:
+            cmds.isolateSelect(panel, state=True)
+        _setIsolateMembers(panel, nodes)
+        LOG.debug('Isolated {0} node(s) in {1}'.format(len(nodes), panel))
+        return True
+    finally:
+        pm.undoInfo(closeChunk=True)
+
+
+def _setIsolateMembers(panel, nodes):
+    """
+    Replace the members of a panel's isolate select set in one edit
+    """
+    cmds = pm.cmds
+    viewSet = cmds.isolateSelect(panel, q=True, viewObjects=True)
+    if not viewSet:
+        return
+    cmds.sets(clear=viewSet)
+    if nodes:
+        cmds.sets(nodes, e=True, addElement=viewSet)
+    cmds.isolateSelect(panel, update=True)
+
+
+def _getStateFlags(panel):
+    """
+    Return a dict of the boolean flags in the state string of a model panel,
+    which contains the full state of the panel's modelEditor as a MEL command
+    """
+    stateString = pm.cmds.modelEditor(panel, q=True, stateString=True) or ''
+    flags = {}
+    for name, value in STATE_FLAG_RE.findall(stateString):
+        flags[STATE_FLAG_NAMES.get(name, name)] = value in ('1', 'true')
+    return flags
+
+
+def _getSupportedFlags(panel, stateFlags=None):
+    """
+    Return the display flags that can be queried in this version of maya.
+    Flags in the state string of a panel are supported, and any others
+    are probed once per session.
+
+    Args:
+        panel: A string name of a model panel
+        stateFlags: An optional dict of the panel's state flags, see `_getStateFlags`
+    """
+    global _SUPPORTED_FLAGS
+    if _SUPPORTED_FLAGS is None:
+        if stateFlags is None:
+            stateFlags = _getStateFlags(panel)
+        supported = []
+        for flag in DISPLAY_FLAGS:
+            if flag not in stateFlags:
+                try:
+                    pm.cmds.modelEditor(panel, q=True, **{flag: True})
+                except TypeError:
+                    continue
+            supported.append(flag)
+        _SUPPORTED_FLAGS = supported
+    return _SUPPORTED_FLAGS
@@ -10,6 +10,9 @@ except:
 
 
 import quickmenus
+from quickmenus import MenuItem
+import display
+import selection
 
 
 __all__ = [
@@ -31,6 +34,8 @@ class SelectionMaskingMenu(quickmenus.MarkingMenu):
     Only displays on model viewport panels.
     """
 
+    prewarmEvents = ['SelectTypeChanged', 'SelectModeChanged', 'SceneOpened', 'NewSceneOpened']
+
     allkeys = [
         'handle', 'ikHandle', 'joint', 'nurbsCurve',
         'cos', 'stroke', 'nurbsSurface', 'polymesh',
@@ -48,30 +53,44 @@ class SelectionMaskingMenu(quickmenus.MarkingMenu):
         self.mouseButton = 1
         self.buildItemsOnShow = True
 
+    # the selectType keys that are displayed as checkboxes
+    querykeys = [
+        'p', 'nurbsCurve', 'joint', 'nurbsSurface',
+        'light', 'lattice', 'particleShape', 'ikEndEffector',
+    ]
+
     def shouldBuild(self):
         return self.panelType == 'modelPanel'
 
-    def buildMenuItems(self):
-        pm.menuItem(rp='NW', l='Reset', ecr=False, ann='Reset all selection masks', c=pm.Callback(self.resetSelectionMasking))
-        pm.menuItem(rp='NE', l='All Off', ecr=False, c=pm.Callback(self.setObjectSelectType, enabled=False, keys=self.allkeys))
-        pm.menuItem(rp='SE', l='Clear Selection', ecr=True, c=pm.Callback(pm.select, cl=True))
-        pm.menuItem(rp='S', l='Use Selected', c=pm.Callback(self.setMaskingToSelection))
-
-        selType = lambda x : pm.selectType(q=True, **{x:True})
-
-        # common masking
-        pm.menuItem(rp='N', l='Polys', ecr=False, cb=selType('p'), c=pm.CallbackWithArgs(self.setObjectSelectType, keys=['polymesh']))
-        pm.menuItem(rp='E', l='Curves', ecr=False, cb=selType('nurbsCurve'), c=pm.CallbackWithArgs(self.setObjectSelectType, keys=['nurbsCurve', 'cos', 'stroke']))
-        pm.menuItem(rp='SW', l='Joints', ecr=False, cb=selType('joint'), c=pm.CallbackWithArgs(self.setObjectSelectType, keys=['joint']))
-        pm.menuItem(rp='W', l='Surfaces', ecr=False, cb=selType('nurbsSurface'), c=pm.CallbackWithArgs(self.setObjectSelectType, keys=['nurbsSurface', 'subdiv', 'plane']))
-        
-        # extended menu
-        pm.menuItem(l='Selection Masking', en=False)
-        pm.menuItem(d=True)
-        pm.menuItem(l='Render', ecr=False, cb=selType('light'), c=pm.CallbackWithArgs(self.setObjectSelectType, keys=['light', 'camera', 'texture']))
-        pm.menuItem(l='Deformers', ecr=False, cb=selType('lattice'), c=pm.CallbackWithArgs(self.setObjectSelectType, keys=['lattice', 'cluster', 'sculpt', 'nonlinear']))
-        pm.menuItem(l='Dynamics', ecr=False, cb=selType('particleShape'), c=pm.CallbackWithArgs(self.setObjectSelectType, keys=['particleShape', 'emitter', 'field', 'spring', 'rigidBody', 'fluid', 'hairSystem', 'follicle', 'rigidConstraint']))
-        pm.menuItem(l='Misc', ecr=False, cb=selType('ikEndEffector'), c=pm.CallbackWithArgs(self.setObjectSelectType, keys=['ikEndEffector', 'locator', 'dimension']))
+    def getMenuDataKey(self):
+        # selection masking is not panel specific
+        return (self.__class__,)
+
+    def getMenuData(self, isPrewarm=False):
+        return dict([(k, pm.selectType(q=True, **{k:True})) for k in self.querykeys])
+
+    def getMenuItems(self):
+        selType = self.menuData.get
+        return [
+            MenuItem('Reset', 'NW', pm.Callback(self.resetSelectionMasking), enableCommandRepeat=False, annotation='Reset all selection masks'),
+            MenuItem('All Off', 'NE', pm.Callback(self.setObjectSelectType, enabled=False, keys=self.allkeys), enableCommandRepeat=False),
+            MenuItem('Clear Selection', 'SE', pm.Callback(pm.select, cl=True)),
+            MenuItem('Use Selected', 'S', pm.Callback(self.setMaskingToSelection)),
+
+            # common masking
+            MenuItem('Polys', 'N', pm.CallbackWithArgs(self.setObjectSelectType, keys=['polymesh']), checkBox=selType('p'), enableCommandRepeat=False),
+            MenuItem('Curves', 'E', pm.CallbackWithArgs(self.setObjectSelectType, keys=['nurbsCurve', 'cos', 'stroke']), checkBox=selType('nurbsCurve'), enableCommandRepeat=False),
+            MenuItem('Joints', 'SW', pm.CallbackWithArgs(self.setObjectSelectType, keys=['joint']), checkBox=selType('joint'), enableCommandRepeat=False),
+            MenuItem('Surfaces', 'W', pm.CallbackWithArgs(self.setObjectSelectType, keys=['nurbsSurface', 'subdiv', 'plane']), checkBox=selType('nurbsSurface'), enableCommandRepeat=False),
+
+            # extended menu
+            MenuItem('Selection Masking', enabled=False),
+            MenuItem(divider=True),
+            MenuItem('Render', command=pm.CallbackWithArgs(self.setObjectSelectType, keys=['light', 'camera', 'texture']), checkBox=selType('light'), enableCommandRepeat=False),
+            MenuItem('Deformers', command=pm.CallbackWithArgs(self.setObjectSelectType, keys=['lattice', 'cluster', 'sculpt', 'nonlinear']), checkBox=selType('lattice'), enableCommandRepeat=False),
+            MenuItem('Dynamics', command=pm.CallbackWithArgs(self.setObjectSelectType, keys=['particleShape', 'emitter', 'field', 'spring', 'rigidBody', 'fluid', 'hairSystem', 'follicle', 'rigidConstraint']), checkBox=selType('particleShape'), enableCommandRepeat=False),
+            MenuItem('Misc', command=pm.CallbackWithArgs(self.setObjectSelectType, keys=['ikEndEffector', 'locator', 'dimension']), checkBox=selType('ikEndEffector'), enableCommandRepeat=False),
+        ]
 
 
     def setObjectSelectType(self, enabled, keys):
@@ -87,26 +106,15 @@ class SelectionMaskingMenu(quickmenus.MarkingMenu):
         pm.mel.selectionMaskResetAll()
 
     def setMaskingToSelection(self):
-        self.setObjectSelectType(enabled=False, keys=self.allkeys)
-        sel = pm.selected()
-        keys = set()
-        for obj in sel:
-            if obj.nodeType() == 'transform':
-                shapes = obj.getShapes()
-                if len(shapes):
-                    selType = shapes[0].nodeType()
-                    if selType in ['nurbsSurface', 'subdiv', 'joint', 'camera', 'locator']:
-                        keys.add(str(selType))
-                    elif selType == 'mesh':
-                        keys.add('polymesh')
-                    elif 'light' in selType.lower():
-                        keys.add('light')
-                    elif selType == 'nurbsCurve':
-                        keys.add('curve')
+        keys = selection.getSelectTypeKeys(pm.cmds.ls(sl=True))
         if not len(keys):
             return
-        LOG.info('Set selection masking to {0}'.format(', '.join(keys)))
-        self.setObjectSelectType(enabled=True, keys=keys)
+        LOG.info('Set selection masking to {0}'.format(', '.join(sorted(keys))))
+        # enable only the selected types in a single selectType call
+        kwargs = dict([(k, False) for k in self.allkeys])
+        kwargs.update(dict([(k, True) for k in keys]))
+        pm.selectMode(object=True)
+        pm.selectType(**kwargs)
 
 
 
@@ -116,6 +124,8 @@ class DisplayMaskingMenu(quickmenus.MarkingMenu):
     Only displays on model viewport panels.
     """
 
+    prewarmEvents = ['modelEditorChanged', 'SceneOpened', 'NewSceneOpened']
+
     def __init__(self):
         super(self.__class__, self).__init__()
         self.popupMenuId = 'QuickMenus_DisplayMaskingMenu'
@@ -125,35 +135,131 @@ class DisplayMaskingMenu(quickmenus.MarkingMenu):
     def shouldBuild(self):
         return self.panelType == 'modelPanel'
 
-    def buildMenuItems(self):
-        pm.menuItem(rp='NW', l='Show All', ecr=False, c=pm.Callback(self.setDisplay, enabled=True, keys=['allObjects']))
-        pm.menuItem(rp='NE', l='Hide All', ecr=False, c=pm.Callback(self.setDisplay, enabled=False, keys=['allObjects']))
-        pm.menuItem(rp='S', l='Hide Selected', ecr=True, c=pm.Callback(self.hideSelected))
+    def getMenuData(self, isPrewarm=False):
+        return {
+            'flags': dict(display.getDisplayFlags(self.panel)),
+            'presets': display.getDisplayPresetNames(),
+            'isIsolated': display.isIsolateToggled(self.panel),
+        }
 
-        query = lambda x : pm.modelEditor(self.panel, q=True, **{x:True})
+    def getMenuItems(self):
+        allAnn = 'Option box applies to all viewports'
+        return [
+            MenuItem('Show All', 'NW', pm.Callback(self.setDisplay, enabled=True, keys=['allObjects']), enableCommandRepeat=False,
+                     optionBox=pm.Callback(self.setDisplay, enabled=True, keys=['allObjects'], scope='all'), annotation=allAnn),
+            MenuItem('Hide All', 'NE', pm.Callback(self.setDisplay, enabled=False, keys=['allObjects']), enableCommandRepeat=False,
+                     optionBox=pm.Callback(self.setDisplay, enabled=False, keys=['allObjects'], scope='all'), annotation=allAnn),
+            MenuItem('Hide Selected', 'S', pm.Callback(self.hideSelected),
+                     optionBox=pm.Callback(self.toggleIsolate, mode='selection'),
+                     annotation='Option box isolates the selection, or restores the previous isolation'),
+
+            # common masking
+            self.getMaskItem('Polys', 'N', ['polymeshes']),
+            self.getMaskItem('Curves', 'E', ['nurbsCurves']),
+            self.getMaskItem('Surfaces', 'W', ['nurbsSurfaces', 'subdivSurfaces']),
+            self.getMaskItem('Joints', 'SW', ['joints']),
+            self.getMaskItem('Lights', 'SE', ['lights']),
+
+            # extended menu
+            MenuItem('Display Masking', enabled=False),
+            MenuItem(divider=True),
+            self.getMaskItem('Cameras', None, ['cameras']),
+            self.getMaskItem('Locators', None, ['locators']),
+            self.getMaskItem('Deformers', None, ['deformers']),
+            self.getMaskItem('Dynamics', None, ['dynamics']),
+            self.getMaskItem('Misc', None, ['planes', 'ikHandles', 'fluids', 'hairSystems', 'follicles', 'dynamicConstraints', 'pivots', 'handles', 'textures', 'strokes']),
+            MenuItem(divider=True),
+            MenuItem('Presets', subMenu=self.getPresetItems()),
+        ] + self.getIsolateItems()
+
+    def getIsolateItems(self):
+        """
+        Return MenuItems for isolating objects in the current panel,
+        or restoring the previous isolation if already isolated
+        """
+        if self.menuData['isIsolated']:
+            return [MenuItem('Restore Isolation', command=pm.Callback(self.toggleIsolate))]
+        return [
+            MenuItem('Isolate Selected', command=pm.Callback(self.toggleIsolate, mode='selection')),
+            MenuItem('Isolate Unselected', command=pm.Callback(self.toggleIsolate, mode='inverse')),
+            MenuItem('Isolate Selected Types', command=pm.Callback(self.toggleIsolate, mode='type')),
+        ]
+
+    def getPresetItems(self):
+        """
+        Return MenuItems for restoring, saving, and deleting display presets.
+        Presets are displayed radially when possible.
+        """
+        names = self.menuData['presets']
+        items = []
+        rps = quickmenus.getRadialMenuPositions(len(names))
+        for name, rp in zip(names, rps):
+            items.append(MenuItem(name, rp, pm.Callback(self.restorePreset, name), enableCommandRepeat=False,
+                                  optionBox=pm.Callback(self.restorePreset, name, scope='all'),
+                                  annotation='Option box applies to all viewports'))
+        items.append(MenuItem('Save Preset...', command=pm.Callback(self.savePresetPrompt), italicized=True))
+        if names:
+            items.append(MenuItem('Delete Preset', subMenu=[
+                MenuItem(name, command=pm.Callback(self.deletePreset, name)) for name in names]))
+        return items
+
+    def getMaskItem(self, label, radialPosition, keys):
+        """
+        Return a checkbox MenuItem for toggling one or more display flags,
+        with an option box for toggling them in all viewports.
+        The first key determines the checkbox state.
+        """
+        return MenuItem(label, radialPosition, pm.CallbackWithArgs(self.setDisplay, keys=keys),
+                        checkBox=self.menuData['flags'].get(keys[0]), enableCommandRepeat=False,
+                        optionBox=pm.Callback(self.toggleDisplay, keys=keys, scope='all'),
+                        annotation='Option box applies to all viewports')
 
-        # common masking
-        pm.menuItem(rp='N', l='Polys', ecr=False, cb=query('polymeshes'), c=pm.CallbackWithArgs(self.setDisplay, keys=['polymeshes']))
-        pm.menuItem(rp='E', l='Curves', ecr=False, cb=query('nurbsCurves'), c=pm.CallbackWithArgs(self.setDisplay, keys=['nurbsCurves']))
-        pm.menuItem(rp='W', l='Surfaces', ecr=False, cb=query('nurbsSurfaces'), c=pm.CallbackWithArgs(self.setDisplay, keys=['nurbsSurfaces', 'subdivSurfaces']))
-        pm.menuItem(rp='SW', l='Joints', ecr=False, cb=query('joints'), c=pm.CallbackWithArgs(self.setDisplay, keys=['joints']))
-        pm.menuItem(rp='SE', l='Lights', ecr=False, cb=query('lights'), c=pm.CallbackWithArgs(self.setDisplay, keys=['lights']))
-        
-        # extended menu
-        pm.menuItem(l='Display Masking', en=False)
-        pm.menuItem(d=True)
-        pm.menuItem(l='Cameras', ecr=False, cb=query('cameras'), c=pm.CallbackWithArgs(self.setDisplay, keys=['cameras']))
-        pm.menuItem(l='Locators', ecr=False, cb=query('locators'), c=pm.CallbackWithArgs(self.setDisplay, keys=['locators']))
-        pm.menuItem(l='Deformers', ecr=False, cb=query('deformers'), c=pm.CallbackWithArgs(self.setDisplay, keys=['deformers']))
-        pm.menuItem(l='Dynamics', ecr=False, cb=query('dynamics'), c=pm.CallbackWithArgs(self.setDisplay, keys=['dynamics']))
-        pm.menuItem(l='Misc', ecr=False, cb=query('planes'), c=pm.CallbackWithArgs(self.setDisplay, keys=['planes', 'ikHandles', 'fluids', 'hairSystems', 'follicles', 'dynamicConstraints', 'pivots', 'handles', 'textures', 'strokes']))
-        # pm.menuItem(l='GUI', ecr=False, cb=query('planes'), c=pm.CallbackWithArgs(self.setObjectSelectType, keys=['ikEndEffector', 'locator', 'dimension']))
-
-    def setDisplay(self, enabled, keys):
-        kwargs = {}
-        for k in keys:
-            kwargs[k] = enabled
-        pm.modelEditor(self.panel, e=True, **kwargs)
+    def setDisplay(self, enabled, keys, scope='current'):
+        """
+        Set display flags on the current panel, or on other model panels
+
+        Args:
+            enabled: A bool, the value to set for each flag
+            keys: A list of modelEditor display flags
+            scope: A string, 'current', 'visible', or 'all', see `display.getModelPanels`
+        """
+        flags = dict([(k, enabled) for k in keys])
+        display.setDisplayFlags(display.getModelPanels(scope, self.panel), flags)
+
+    def restorePreset(self, name, scope='current'):
+        display.restoreDisplayPreset(name, display.getModelPanels(scope, self.panel))
+
+    def savePresetPrompt(self):
+        kw = dict(
+            t='Save Display Preset',
+            m='Enter a name:',
+            b=['Save', 'Save In Scene', 'Cancel'],
+            db='Save',
+            cb='Cancel',
+            ds='Cancel',
+        )
+        action = pm.promptDialog(**kw)
+        name = pm.promptDialog(q=True, text=True)
+        if action == 'Cancel' or not name:
+            return
+        scope = 'scene' if action == 'Save In Scene' else 'user'
+        display.captureDisplayPreset(name, self.panel, scope)
+        quickmenus.invalidateMenuData(DisplayMaskingMenu)
+
+    def deletePreset(self, name):
+        display.deleteDisplayPreset(name)
+        quickmenus.invalidateMenuData(DisplayMaskingMenu)
+
+    def toggleIsolate(self, mode='selection'):
+        display.toggleIsolate(self.panel, mode)
+        quickmenus.invalidateMenuData(DisplayMaskingMenu)
+
+    def toggleDisplay(self, keys, scope='current'):
+        """
+        Toggle display flags based on their state in the current panel
+        """
+        enabled = not display.getDisplayFlags(self.panel).get(keys[0])
+        self.setDisplay(enabled, keys, scope)
 
     def hideSelected(self):
         sel = pm.selected()
@@ -247,7 +353,21 @@ class CameraQuickSwitchMenu(quickmenus.RMBMarkingMenu):
     A radial menu that displays all cameras in the scene for easy switching.
     """
 
-    def buildMenuItems(self):
+    prewarmEvents = ['DagObjectCreated', 'NodeRemoved:camera', 'NameChanged', 'ReferenceChanged',
+                     'Undo', 'Redo', 'SceneOpened', 'NewSceneOpened']
+
+    def getMenuDataKey(self):
+        # the camera list is not panel specific
+        return (self.__class__,)
+
+    # keeps cameras in the same position when cameras are added
+    cameraLayout = quickmenus.RadialLayout()
+
+    def getMenuData(self, isPrewarm=False):
+        # list of (camera, isOrtho) for all cameras
+        return [(c, c.isOrtho()) for c in sorted(pm.ls(typ='camera'))]
+
+    def getMenuItems(self):
         # find camera
         try:
             camUnderPointer = pm.PyNode(pm.modelPanel(self.panel, q=True, cam=True))
@@ -257,27 +377,23 @@ class CameraQuickSwitchMenu(quickmenus.RMBMarkingMenu):
                 camera = camUnderPointer.getShape()
         except:
             LOG.warning('could not find camera for panel: {0}'.format(self.panel))
-            return
+            return []
 
-        menuItemCol = pm.radioMenuItemCollection()
+        items = []
         isOrtho = camera.isOrtho()
+        # cameras may have been deleted since the menu data was gathered
+        cameras = [(c, o) for c, o in self.menuData if c.exists()]
         # list same type camera in radial positions
-        similar = sorted([c for c in pm.ls(typ='camera') if c.isOrtho() == isOrtho])
-        rps = quickmenus.getRadialMenuPositions(len(similar))
-        for cam, rp in zip(similar, rps):
-            kw = {}
-            if rp is not None:
-                kw['rp'] = rp
-            if cam == camera:
-                kw['rb'] = True
-                kw['cl'] = menuItemCol
-            pm.menuItem(l=cam.getParent(), c=pm.Callback(pm.mel.lookThroughModelPanel, str(cam), str(self.panel)), **kw)
-        if len(rps) > 8:
-            pm.menuItem(d=True)
+        similar = [c for c, o in cameras if o == isOrtho]
+        similarItems = [MenuItem(
+            str(cam.getParent()), command=pm.Callback(pm.mel.lookThroughModelPanel, str(cam), str(self.panel)),
+            radioButton=True if cam == camera else None) for cam in similar]
+        items.extend(quickmenus.layoutRadialMenuItems(similarItems, self.cameraLayout, [str(c) for c in similar]))
         # list other cameras
-        dissimilar = sorted([c for c in pm.ls(typ='camera') if c.isOrtho() != isOrtho])
+        dissimilar = [c for c, o in cameras if o != isOrtho]
         for cam in dissimilar:
-            pm.menuItem(l=cam.getParent(), c=pm.Callback(pm.mel.lookThroughModelPanel, str(cam), str(self.panel)))
+            items.append(MenuItem(str(cam.getParent()), command=pm.Callback(pm.mel.lookThroughModelPanel, str(cam), str(self.panel))))
+        return items
 
 
 
@@ -285,16 +401,9 @@ class CameraQuickSwitchMenu(quickmenus.RMBMarkingMenu):
 
 
 class ComponentSelectionMaskingMenu(quickmenus.MarkingMenu):
-    allkeys = [
-        'cv', 'vertex', 'subdivMeshPoint', 'latticePoint',
-        'particle', 'editPoint', 'curveParameterPoint',
-        'surfaceParameterPoint', 'puv', 'polymeshEdge',
-        'subdivMeshEdge', 'isoparm', 'surfaceEdge', 'surfaceFace',
-        'springComponent', 'facet', 'subdivMeshFace', 'hull',
-        'rotatePivot', 'scalePivot', 'jointPivot', 'selectHandle',
-        'localRotationAxis', 'imagePlane', 'surfaceUV'
-    ]
+    allkeys = selection.COMPONENT_SELECT_TYPE_KEYS
 
+    prewarmEvents = ['SelectTypeChanged', 'SelectModeChanged', 'SceneOpened', 'NewSceneOpened']
 
     def __init__(self):
         super(self.__class__, self).__init__()
@@ -305,25 +414,47 @@ class ComponentSelectionMaskingMenu(quickmenus.MarkingMenu):
     def shouldBuild(self):
         return self.panelType == 'modelPanel'
 
-    def buildMenuItems(self):
-        pm.menuItem(rp='N', l='Points', ecr=False, c=pm.Callback(self.setComponentSelectType, keys=['cv', 'vertex', 'subdivMeshPoint', 'latticePoint', 'particle']))
-        pm.menuItem(rp='NE', l='Handles', ecr=False, c=pm.Callback(self.setComponentSelectType, keys=['selectHandle']))
-        pm.menuItem(rp='E', l='Lines', ecr=False, c=pm.Callback(self.setComponentSelectType, keys=['polymeshEdge', 'subdivMeshEdge', 'isoparm', 'surfaceEdge', 'springComponent']))
-        pm.menuItem(rp='SE', l='Hulls', ecr=False, c=pm.Callback(self.setComponentSelectType, keys=['hull']))
-        pm.menuItem(rp='S', l='Faces', ecr=False, c=pm.Callback(self.setComponentSelectType, keys=['surfaceFace', 'facet', 'subdivMeshFace']))
-        pm.menuItem(rp='SW', l='Pivots', ecr=False, c=pm.Callback(self.setComponentSelectType, keys=['rotatePivot', 'scalePivot', 'jointPivot']))
-        pm.menuItem(rp='W', l='Param', ecr=False, c=pm.Callback(self.setComponentSelectType, keys=['editPoint', 'curveParameterPoint', 'surfaceParameterPoint', 'surfaceUV', 'puv']))
-        pm.menuItem(rp='NW', l='Misc', ecr=False, c=pm.Callback(self.setComponentSelectType, keys=['localRotationAxis', 'imagePlane']))
-
-    def setComponentSelectType(self, enabled=True, keys={}):
-        pm.selectMode(component=True)
-        kwargs = {}
-        for k in keys:
-            kwargs[k] = enabled
-        for k in self.allkeys:
-            if not kwargs.has_key(k):
-                kwargs[k] = not enabled
-        pm.selectType(**kwargs)
+    def getMenuDataKey(self):
+        # component masking is not panel specific
+        return (self.__class__,)
+
+    def getMenuData(self, isPrewarm=False):
+        return {
+            'mask': selection.getComponentMask(),
+            'hasPrevious': selection.getPreviousComponentMask() is not None,
+        }
+
+    def getMenuItems(self):
+        return [
+            self.getMaskItem('Points', 'N', ['cv', 'vertex', 'subdivMeshPoint', 'latticePoint', 'particle']),
+            self.getMaskItem('Handles', 'NE', ['selectHandle']),
+            self.getMaskItem('Lines', 'E', ['polymeshEdge', 'subdivMeshEdge', 'isoparm', 'surfaceEdge', 'springComponent']),
+            self.getMaskItem('Hulls', 'SE', ['hull']),
+            self.getMaskItem('Faces', 'S', ['surfaceFace', 'facet', 'subdivMeshFace']),
+            self.getMaskItem('Pivots', 'SW', ['rotatePivot', 'scalePivot', 'jointPivot']),
+            self.getMaskItem('Param', 'W', ['editPoint', 'curveParameterPoint', 'surfaceParameterPoint', 'surfaceUV', 'puv']),
+            self.getMaskItem('Misc', 'NW', ['localRotationAxis', 'imagePlane']),
+            MenuItem('Previous Mask', command=pm.Callback(self.restorePreviousMask), enabled=self.menuData['hasPrevious'],
+                     enableCommandRepeat=False, annotation='Restore the component mask from before the last change'),
+        ]
+
+    def getMaskItem(self, label, radialPosition, keys):
+        """
+        Return a checkbox MenuItem for toggling the given component
+        types, which is checked if any of the types are enabled
+        """
+        mask = self.menuData['mask']
+        return MenuItem(label, radialPosition, pm.CallbackWithArgs(self.setComponentSelectType, keys=keys),
+                        checkBox=any([mask.get(k) for k in keys]), enableCommandRepeat=False)
+
+    def setComponentSelectType(self, enabled, keys):
+        # only the toggled types change, matching the new checkbox state
+        mask = dict([(k, bool(enabled)) for k in keys])
+        # the mask snapshot is current, since it was taken when the menu was shown
+        selection.setComponentMask(mask, current=self.menuData['mask'])
+
+    def restorePreviousMask(self):
+        selection.restorePreviousComponentMask()
 
 
 
@@ -337,28 +468,32 @@ class ResetterMenu(quickmenus.MarkingMenu):
     def shouldBuild(self):
         return self.panelType == 'modelPanel'
 
-    def buildMenuItems(self):
-        self.buildSimpleItems()
-        self.buildResetterItems()
+    def getMenuItems(self):
+        return self.getSimpleItems() + self.getResetterItems()
 
-    def buildSimpleItems(self):
-        pm.menuItem(rp='W', l='Rotate', ecr=True, c=pm.Callback(self.simpleReset, rot=True), ann='Reset the rotation of the selected objects')
-        pm.menuItem(rp='S', l='Translate', ecr=True, c=pm.Callback(self.simpleReset, trans=True), ann='Reset the position of the selected objects')
-        pm.menuItem(rp='E', l='Scale', ecr=True, c=pm.Callback(self.simpleReset, scale=True), ann='Reset the scale of the selected objects')
+    def getSimpleItems(self):
+        items = [
+            MenuItem('Rotate', 'W', pm.Callback(self.simpleReset, rot=True), annotation='Reset the rotation of the selected objects'),
+            MenuItem('Translate', 'S', pm.Callback(self.simpleReset, trans=True), annotation='Reset the position of the selected objects'),
+            MenuItem('Scale', 'E', pm.Callback(self.simpleReset, scale=True), annotation='Reset the scale of the selected objects'),
+        ]
         if not resetter:
             # add fallback menu item if resetter is not available
-            pm.menuItem(rp='N', l='TRS', ecr=True, c=pm.Callback(self.simpleReset, trans=True, rot=True, scale=True), ann='Reset the selected objects\' transformations to identity, even if defaults are set')
+            items.append(MenuItem('TRS', 'N', pm.Callback(self.simpleReset, trans=True, rot=True, scale=True), annotation='Reset the selected objects\' transformations to identity, even if defaults are set'))
+        return items
 
-    def buildResetterItems(self):
+    def getResetterItems(self):
         if not resetter:
-            return
-        pm.menuItem(rp='N', l='Smart', ecr=True, c=pm.Callback(resetter.reset), ann='Reset the selected objects\' attributes to the defaults, or identity if defaults are not set')
-        pm.menuItem(rp='NE', l='Defaults', ecr=True, c=pm.CallbackWithArgs(resetter.reset, useBasicDefaults=False), ann='Reset the selected objects\' attributes to their defaults, does nothing if no defaults are set')
-        pm.menuItem(rp='SE', l='All Defaults', ecr=True, c=pm.Callback(resetter.resetAll), ann='Reset all objects\' attributes with defaults set to their default values')
-
-        pm.menuItem(l='Resetter', ecr=False, c=pm.Callback(resetter.GUI), ann='Open the Resetter GUI')
-        pm.menuItem(d=True)
-        pm.menuItem(l='Select Objects', ecr=True, c=pm.Callback(self.selectObjectsWithDefaults), ann='Select all objects in the scene that have attribute defaults')
+            return []
+        return [
+            MenuItem('Smart', 'N', pm.Callback(resetter.reset), annotation='Reset the selected objects\' attributes to the defaults, or identity if defaults are not set'),
+            MenuItem('Defaults', 'NE', pm.Callback(resetter.reset, useBasicDefaults=False), annotation='Reset the selected objects\' attributes to their defaults, does nothing if no defaults are set'),
+            MenuItem('All Defaults', 'SE', pm.Callback(resetter.resetAll), annotation='Reset all objects\' attributes with defaults set to their default values'),
+
+            MenuItem('Resetter', command=pm.Callback(resetter.GUI), enableCommandRepeat=False, annotation='Open the Resetter GUI'),
+            MenuItem(divider=True),
+            MenuItem('Select Objects', command=pm.Callback(self.selectObjectsWithDefaults), annotation='Select all objects in the scene that have attribute defaults'),
+        ]
 
 
     def selectObjectsWithDefaults(self):
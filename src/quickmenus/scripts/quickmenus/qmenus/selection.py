@@ -0,0 +1,217 @@
+
+import logging
+
+import pymel.core as pm
+
+
+__all__ = [
+    'COMPONENT_SELECT_TYPE_KEYS',
+    'getComponentMask',
+    'getInheritedTypes',
+    'getNodeTypes',
+    'getPreviousComponentMask',
+    'getSelectTypeKey',
+    'getSelectTypeKeys',
+    'invalidateInheritedTypes',
+    'restorePreviousComponentMask',
+    'SELECT_TYPE_KEYS',
+    'setComponentMask',
+]
+
+
+LOG = logging.getLogger('quickmenus')
+
+
+# conversion of node type -> selectType object mask key,
+# node types are matched against the full inheritance of each type
+SELECT_TYPE_KEYS = {
+    'mesh': 'polymesh',
+    'nurbsCurve': 'nurbsCurve',
+    'nurbsSurface': 'nurbsSurface',
+    'subdiv': 'subdiv',
+    'plane': 'plane',
+    'joint': 'joint',
+    'ikHandle': 'ikHandle',
+    'ikEffector': 'ikEndEffector',
+    'lattice': 'lattice',
+    'baseLattice': 'lattice',
+    'clusterHandle': 'cluster',
+    'softModHandle': 'cluster',
+    'deformFunc': 'nonlinear',
+    'implicitSphere': 'sculpt',
+    'particle': 'particleShape',
+    'pointEmitter': 'emitter',
+    'field': 'field',
+    'spring': 'spring',
+    'rigidBody': 'rigidBody',
+    'fluidShape': 'fluid',
+    'hairSystem': 'hairSystem',
+    'follicle': 'follicle',
+    'rigidConstraint': 'rigidConstraint',
+    'nCloth': 'nCloth',
+    'nRigid': 'nRigid',
+    'dynamicConstraint': 'dynamicConstraint',
+    'light': 'light',
+    'camera': 'camera',
+    'place3dTexture': 'texture',
+    'locator': 'locator',
+    'dimensionShape': 'dimension',
+    'pfxGeometry': 'stroke',
+}
+
+# the inherited types of each node type, indexed by node type
+_INHERITED_TYPES_CACHE = {}
+
+# all selectType component mask keys
+COMPONENT_SELECT_TYPE_KEYS = [
+    'cv', 'vertex', 'subdivMeshPoint', 'latticePoint',
+    'particle', 'editPoint', 'curveParameterPoint',
+    'surfaceParameterPoint', 'puv', 'polymeshEdge',
+    'subdivMeshEdge', 'isoparm', 'surfaceEdge', 'surfaceFace',
+    'springComponent', 'facet', 'subdivMeshFace', 'hull',
+    'rotatePivot', 'scalePivot', 'jointPivot', 'selectHandle',
+    'localRotationAxis', 'imagePlane', 'surfaceUV'
+]
+
+# the component mask from before the last change made by `setComponentMask`
+_PREVIOUS_COMPONENT_MASK = None
+
+
+def getInheritedTypes(nodeType):
+    """
+    Return the inheritance of a node type, from most to least derived.
+    Results are cached, since the inheritance of a type never changes.
+
+    Args:
+        nodeType: A string node type name
+    """
+    result = _INHERITED_TYPES_CACHE.get(nodeType)
+    if result is None:
+        try:
+            inherited = pm.cmds.nodeType(nodeType, inherited=True, isTypeName=True) or []
+        except RuntimeError:
+            inherited = []
+        result = tuple(reversed(inherited)) if inherited else (nodeType,)
+        _INHERITED_TYPES_CACHE[nodeType] = result
+    return result
+
+
+def invalidateInheritedTypes():
+    """
+    Clear the cached inheritance of all node types, since types
+    that were unknown may be added when a plugin is loaded
+    """
+    _INHERITED_TYPES_CACHE.clear()
+
+
+def getNodeTypes(nodes):
+    """
+    Return the set of all node types represented by a list of nodes.
+    Components resolve to their shape, and plain transforms resolve to
+    their shapes. Uses a fixed number of batched queries regardless
+    of the number of nodes.
+
+    Args:
+        nodes: A list of node or component names
+    """
+    cmds = pm.cmds
+    if not nodes:
+        return set()
+    objects = cmds.ls(nodes, objectsOnly=True, long=True) or []
+    if not objects:
+        return set()
+    # ls -showType returns a flat list of alternating names and types
+    objectTypes = cmds.ls(objects, showType=True) or []
+    types = set()
+    transforms = []
+    for name, nodeType in zip(objectTypes[0::2], objectTypes[1::2]):
+        if nodeType == 'transform':
+            transforms.append(name)
+        else:
+            types.add(nodeType)
+    if transforms:
+        shapes = cmds.listRelatives(transforms, shapes=True, noIntermediate=True, fullPath=True) or []
+        if shapes:
+            shapeTypes = cmds.ls(shapes, showType=True) or []
+            types.update(shapeTypes[1::2])
+    return types
+
+
+def getSelectTypeKey(nodeType):
+    """
+    Return the selectType object mask key for a node type,
+    or None if the type cannot be masked
+
+    Args:
+        nodeType: A string node type name
+    """
+    for t in getInheritedTypes(nodeType):
+        if t in SELECT_TYPE_KEYS:
+            return SELECT_TYPE_KEYS[t]
+
+
+def getSelectTypeKeys(nodes):
+    """
+    Return the set of selectType object mask keys needed
+    to select all of the given nodes
+
+    Args:
+        nodes: A list of node or component names
+    """
+    keys = set()
+    for nodeType in getNodeTypes(nodes):
+        key = getSelectTypeKey(nodeType)
+        if key:
+            keys.add(key)
+    return keys
+
+
+# Component Masking
+# -----------------
+
+def getComponentMask():
+    """
+    Return a snapshot of the component selection mask, as a
+    dict of {key: bool} for all COMPONENT_SELECT_TYPE_KEYS
+    """
+    return dict([(k, pm.cmds.selectType(q=True, **{k: True})) for k in COMPONENT_SELECT_TYPE_KEYS])
+
+
+def setComponentMask(mask, current=None):
+    """
+    Switch to component selection mode and apply a component mask,
+    using a single selectType call that only includes the keys that
+    differ from the current mask. The current mask is remembered
+    so that it can be restored using `restorePreviousComponentMask`.
+
+    Args:
+        mask: A dict of {key: bool} component mask keys to set
+        current: A dict snapshot of the current mask, from `getComponentMask`,
+            if None, the current mask is queried
+    """
+    global _PREVIOUS_COMPONENT_MASK
+    if current is None:
+        current = getComponentMask()
+    changes = dict([(k, v) for k, v in mask.items() if current.get(k) != v])
+    pm.selectMode(component=True)
+    if changes:
+        LOG.debug('Setting component mask: {0}'.format(changes))
+        _PREVIOUS_COMPONENT_MASK = dict(current)
+        pm.cmds.selectType(**changes)
+
+
+def getPreviousComponentMask():
+    """
+    Return the component mask from before the last change made
+    by `setComponentMask`, or None if there is none
+    """
+    return _PREVIOUS_COMPONENT_MASK
+
+
+def restorePreviousComponentMask():
+    """
+    Restore the component mask from before the last change made by
+    `setComponentMask`. Restoring again toggles back to the later mask.
+    """
+    if _PREVIOUS_COMPONENT_MASK is not None:
+        setComponentMask(_PREVIOUS_COMPONENT_MASK)
@@ -0,0 +1,443 @@
+
+import time
+import random
+import logging
+
+import rmbmenuhook
+import core
+import utils
+from core import MenuItem
+
+
+__all__ = [
+    "formatResults",
+    "generateSequence",
+    "parseSequence",
+    "runRegressionTests",
+    "runSequence",
+    "runStressTest",
+    "SimulatedAltVariantMenu",
+    "SimulatedMarkingMenu",
+    "SimulatedRMBMenu",
+    "SimulatedVariantMenu",
+    "StubUI",
+]
+
+
+LOG = logging.getLogger("quickmenus")
+
+
+# Press / Release Simulation
+# --------------------------
+# Replays sequences of menu key events against a stub UI layer, to check
+# the state kept by `buildMenus` and `destroyMenus` under fast repeated presses,
+# key repeat, changing modifiers, and dropped releases. Each event is a tuple of
+# (action, menuName, modifiers), where action is one of:
+#   press: the menu key was pressed, calls `buildMenus`
+#   release: the menu key was released, calls `destroyMenus`
+#   drop: the menu key was released, but maya never called `destroyMenus`
+#   show: the user clicked to show the marking menu for the current modifiers
+#   rmb: the user right clicked, showing any registered rmb menus
+#   panel: the pointer moved to another panel, given as the menu name
+# Modifiers are strings like 'Alt+Shift', see `utils.getModifiersFromString`.
+
+# the menu names registered while simulating
+SIMULATED_MENU_NAME = "SimulatedMenus"
+SIMULATED_VARIANT_NAMES = {"": "SimulatedVariantMenus", "Alt": "SimulatedAltVariantMenus"}
+
+# the panels that the pointer moves between
+SIMULATED_PANELS = ["modelPanel1", "modelPanel4"]
+
+# sequences that have caused failures, indexed by name, see `runRegressionTests`
+REGRESSION_SEQUENCES = {
+    # a press after a dropped release and another key is a new hold,
+    # and must run the secondary command even though a menu was shown before
+    "droppedReleaseThenOtherKey": """
+        press SimulatedMenus
+        show SimulatedMenus
+        drop SimulatedMenus
+        press SimulatedVariantMenus
+        release SimulatedVariantMenus
+        press SimulatedMenus
+        release SimulatedMenus
+    """,
+    # a key released after another key was pressed skips the secondary
+    # command only if a menu was shown while it was held
+    "lateRelease": """
+        press SimulatedMenus
+        show SimulatedMenus
+        press SimulatedVariantMenus
+        release SimulatedMenus
+        release SimulatedVariantMenus
+        press SimulatedMenus
+        release SimulatedMenus
+    """,
+}
+
+
+class StubUI(object):
+    """
+    Replaces the pymel UI commands used when building and destroying
+    menus, and records the popup menus that currently exist
+    """
+
+    class PopupMenu(str):
+        def postMenuCommand(self, command):
+            self.command = command
+
+    def __init__(self, pm):
+        # the real pymel module, used for anything that isn't stubbed
+        self._pm = pm
+        self.cmds = self
+        # the existing popup menus, indexed by name
+        self.popups = {}
+        # the current modifier key flags, as returned by `getModifiers`
+        self.modifiers = 0
+        # the panel under the pointer
+        self.panel = SIMULATED_PANELS[0]
+        self._itemCount = 0
+
+    def __getattr__(self, name):
+        return getattr(self._pm, name)
+
+    def setModifiers(self, modifierString):
+        shift, ctrl, alt = utils.getModifiersFromString(modifierString)
+        self.modifiers = (1 if shift else 0) | (4 if ctrl else 0) | (8 if alt else 0)
+
+    def getModifiers(self):
+        return self.modifiers
+
+    def getPanel(self, up=False, typeOf=None):
+        if typeOf:
+            return 'modelPanel'
+        return self.panel
+
+    def popupMenu(self, name=None, q=False, ex=False, e=False, **kwargs):
+        if q:
+            return name in self.popups
+        if e:
+            return
+        popup = StubUI.PopupMenu(name)
+        popup.command = None
+        popup.modifiers = (kwargs.get('sh', False), kwargs.get('ctl', False), kwargs.get('alt', False))
+        popup.button = kwargs.get('b', 1)
+        self.popups[name] = popup
+        return popup
+
+    def deleteUI(self, name):
+        del self.popups[name]
+
+    def menuItem(self, *args, **kwargs):
+        self._itemCount += 1
+        return 'menuItem{0}'.format(self._itemCount)
+
+    def menu(self, *args, **kwargs):
+        pass
+
+    def setParent(self, *args, **kwargs):
+        pass
+
+    def radioMenuItemCollection(self, *args, **kwargs):
+        return 'radioMenuItemCollection1'
+
+
+class StubRMBMenuHook(object):
+    """
+    Replaces rmbmenuhook, and records the registered rmb menus
+    """
+
+    def __init__(self):
+        self.Menu = rmbmenuhook.Menu
+        # the registered rmb menu classes, indexed by menu name
+        self.menus = {}
+
+    def registerMenu(self, menuName, menuCls):
+        self.menus[menuName] = menuCls
+
+    def unregisterMenu(self, menuName):
+        self.menus.pop(menuName, None)
+
+
+class SimulatedMarkingMenu(core.MarkingMenu):
+    """
+    A marking menu with a few static items, used for simulating
+    """
+
+    def __init__(self):
+        super(SimulatedMarkingMenu, self).__init__()
+        self.popupMenuId = 'QuickMenus_SimulatedMarkingMenu'
+        self.buildItemsOnShow = True
+
+    def getMenuItems(self):
+        return [MenuItem(p, p) for p in ('N', 'E', 'S', 'W')]
+
+
+class SimulatedVariantMenu(SimulatedMarkingMenu):
+    """
+    A simulated marking menu that is registered as a modifier variant
+    """
+
+    def __init__(self):
+        super(SimulatedVariantMenu, self).__init__()
+        self.popupMenuId = 'QuickMenus_SimulatedVariantMenu'
+
+
+class SimulatedAltVariantMenu(SimulatedMarkingMenu):
+    """
+    A simulated marking menu that is registered as the Alt modifier variant
+    """
+
+    def __init__(self):
+        super(SimulatedAltVariantMenu, self).__init__()
+        self.popupMenuId = 'QuickMenus_SimulatedAltVariantMenu'
+
+
+class SimulatedRMBMenu(core.RMBMarkingMenu):
+    """
+    An rmb marking menu with a few static items, used for simulating
+    """
+
+    def getMenuItems(self):
+        return [MenuItem(p, p) for p in ('N', 'S')]
+
+
+class _SimulatedState(object):
+    """
+    Swaps the UI layer and menu registry of `core` with
+    simulated ones, and restores them when done
+    """
+
+    def __init__(self):
+        self.ui = StubUI(core.pm)
+        self.rmbHook = StubRMBMenuHook()
+
+    def __enter__(self):
+        self.saved = (core.pm, utils.pm, core.rmbmenuhook, core.REGISTERED_MENUS, core.MENU_VARIANTS,
+                      core._REGISTERED_MENU_SNAPSHOTS, core._ACTIVE_SESSION, core._ENDED_SESSIONS)
+        core.pm = utils.pm = self.ui
+        core.rmbmenuhook = self.rmbHook
+        core.REGISTERED_MENUS = {}
+        core.MENU_VARIANTS = {}
+        core._REGISTERED_MENU_SNAPSHOTS = {}
+        core._ACTIVE_SESSION = None
+        core._ENDED_SESSIONS = {}
+        core.registerMenu(SIMULATED_MENU_NAME, SimulatedMarkingMenu)
+        core.registerMenu(SIMULATED_MENU_NAME, SimulatedRMBMenu)
+        core.registerMenu(SIMULATED_VARIANT_NAMES[""], SimulatedVariantMenu)
+        core.registerMenu(SIMULATED_VARIANT_NAMES["Alt"], SimulatedAltVariantMenu)
+        core.registerMenuVariants(SIMULATED_VARIANT_NAMES)
+        return self
+
+    def __exit__(self, *args):
+        (core.pm, utils.pm, core.rmbmenuhook, core.REGISTERED_MENUS, core.MENU_VARIANTS,
+         core._REGISTERED_MENU_SNAPSHOTS, core._ACTIVE_SESSION, core._ENDED_SESSIONS) = self.saved
+
+
+def parseSequence(text):
+    """
+    Return a list of events from text with one event per line,
+    e.g. 'press SimulatedMenus Shift', blank lines and lines
+    starting with # are ignored
+
+    Args:
+        text: A string containing the sequence
+    """
+    events = []
+    for line in text.splitlines():
+        parts = line.split()
+        if parts and not parts[0].startswith('#'):
+            events.append((parts[0], parts[1], parts[2] if len(parts) > 2 else ''))
+    return events
+
+
+def generateSequence(count=1000, seed=None, dropRate=0.1):
+    """
+    Return a list of random events that simulate fast repeated tapping,
+    holding, and switching between menu keys, with some releases dropped
+
+    Args:
+        count: An int number of events
+        seed: An optional seed for the random sequence
+        dropRate: A float chance of dropping each release
+    """
+    rand = random.Random(seed)
+    variantNames = list(SIMULATED_VARIANT_NAMES.values())
+    menuNames = [SIMULATED_MENU_NAME, SIMULATED_VARIANT_NAMES[""], SIMULATED_VARIANT_NAMES["Alt"]]
+    events = []
+    held = None
+    modifiers = ''
+    while len(events) < count:
+        if held is None or rand.random() < 0.1:
+            # press a new key, possibly while another is held, which is released late
+            previous = held
+            held = rand.choice(menuNames)
+            modifiers = _randomModifiers(rand, held)
+            events.append(('press', held, modifiers))
+            # all variants are one key, so switching between them is key repeat
+            isSameKey = previous == held or (previous in variantNames and held in variantNames)
+            if previous is not None and not isSameKey:
+                events.append(('drop' if rand.random() < dropRate else 'release', previous, ''))
+            continue
+        action = rand.choice(['press', 'release', 'release', 'show', 'rmb', 'panel'])
+        if action == 'release':
+            events.append(('drop' if rand.random() < dropRate else 'release', held, ''))
+            held = None
+        elif action == 'panel':
+            events.append(('panel', rand.choice(SIMULATED_PANELS), ''))
+        elif action == 'press':
+            # key repeat, sometimes with different modifiers
+            if rand.random() < 0.3:
+                modifiers = _randomModifiers(rand, held)
+            events.append(('press', held, modifiers))
+        else:
+            events.append((action, held, modifiers))
+    return events
+
+
+def _randomModifiers(rand, menuName):
+    if menuName == SIMULATED_MENU_NAME:
+        return rand.choice(['', '', 'Shift'])
+    # only modifiers that have a variant, others show no menu
+    return rand.choice(list(SIMULATED_VARIANT_NAMES))
+
+
+def runSequence(events):
+    """
+    Replay a list of events against a stub UI layer, and return a dict containing
+    'failures', a list of (eventIndex, event, message), and 'latencies', a dict of
+    lists of the duration in seconds of each event, indexed by action
+
+    Args:
+        events: A list of (action, menuName, modifiers) events
+    """
+    failures = []
+    latencies = {}
+    # whether a menu was shown since the first press of each held key, indexed by key name
+    shown = {}
+    # the same for keys whose release was dropped, until they are pressed again
+    dropped = {}
+    # the key name of the last press, whose session is still active
+    activeKey = None
+
+    with _SimulatedState() as state:
+        ui = state.ui
+
+        def fail(index, event, message):
+            failures.append((index, event, message))
+
+        for index, event in enumerate(events):
+            action, menuName, modifiers = event
+            # all variants of a menu are built and destroyed together, as one key
+            key = _getKeyName(menuName)
+            startTime = time.time()
+            if action == 'press':
+                ui.setModifiers(modifiers)
+                core.buildMenus(menuName)
+                if key in dropped:
+                    # while its session is active, a press of a dropped key can't be told
+                    # apart from key repeat and continues the hold, otherwise it's a new hold
+                    wasShown = dropped.pop(key)
+                    shown[key] = wasShown if key == activeKey else False
+                else:
+                    shown.setdefault(key, False)
+                activeKey = key
+            elif action == 'drop':
+                dropped[key] = shown.pop(key, False)
+            elif action == 'release':
+                secondary = not core.destroyMenus(menuName)
+                expected = shown.pop(key, False)
+                if key == activeKey:
+                    activeKey = None
+                if secondary == expected:
+                    fail(index, event, 'secondary command {0}, expected it to be {1}'.format(
+                        'ran' if secondary else 'skipped', 'skipped' if expected else 'run'))
+            elif action == 'show':
+                ui.setModifiers(modifiers)
+                popup = _findPopup(ui, menuName)
+                if popup is None:
+                    fail(index, event, 'no popup menu to show')
+                else:
+                    popup.command(popup, None)
+                    shown[key] = True
+            elif action == 'rmb':
+                menuCls = state.rmbHook.menus.get(menuName)
+                if menuCls:
+                    menuCls('rmbPopupMenu').build()
+                    shown[key] = True
+            elif action == 'panel':
+                ui.panel = menuName
+            latencies.setdefault(action, []).append(time.time() - startTime)
+            _checkLeaks(ui, index, event, fail)
+
+        # release any keys that are still held, nothing should remain afterwards
+        for menuName in list(shown) + list(dropped):
+            core.destroyMenus(menuName)
+        core.destroyMenus(SIMULATED_MENU_NAME)
+        if ui.popups or state.rmbHook.menus:
+            fail(len(events), ('end', '', ''), 'menus remain after all keys were released: {0}'.format(
+                sorted(ui.popups) + sorted(state.rmbHook.menus)))
+
+    return {'failures': failures, 'latencies': latencies}
+
+
+def _getKeyName(menuName):
+    variants = core.getMenuVariants(menuName)
+    return variants[0][1] if variants else menuName
+
+
+def _findPopup(ui, menuName):
+    """
+    Return the popup menu maya would show for a held menu key, or None
+    """
+    session = core.getActiveSession()
+    if not session or menuName not in session.menuNames:
+        return
+    modifiers = utils.getModifiers()
+    for m in session.menus:
+        popup = ui.popups.get(m.popupMenuId)
+        if popup is not None and popup.modifiers == modifiers:
+            return popup
+
+
+def _checkLeaks(ui, index, event, fail):
+    session = core.getActiveSession()
+    expected = set([m.popupMenuId for m in session.menus]) if session else set()
+    leaked = set(ui.popups) - expected
+    if leaked:
+        fail(index, event, 'leaked popup menus: {0}'.format(sorted(leaked)))
+
+
+def runStressTest(count=10000, seed=0, dropRate=0.1):
+    """
+    Replay a random sequence of events and return the results, see `runSequence`
+    """
+    return runSequence(generateSequence(count, seed, dropRate))
+
+
+def runRegressionTests():
+    """
+    Replay each of the `REGRESSION_SEQUENCES`, and return a dict
+    of the results of each sequence, indexed by name
+    """
+    return dict([(name, runSequence(parseSequence(text))) for name, text in REGRESSION_SEQUENCES.items()])
+
+
+def formatResults(results, maxFailures=20):
+    """
+    Return a text summary of simulation results, including
+    failures and the latency of each type of event
+
+    Args:
+        results: A dict of results from `runSequence`
+        maxFailures: An int maximum number of failures to list
+    """
+    lines = []
+    for index, event, message in results['failures'][:maxFailures]:
+        lines.append('#{0} {1}: {2}'.format(index, ' '.join(event).strip(), message))
+    lines.append('{0} failures'.format(len(results['failures'])))
+    for action, durations in sorted(results['latencies'].items()):
+        durations = sorted(durations)
+        lines.append('{0}: {1} events, mean {2:.3f}ms, p95 {3:.3f}ms, max {4:.3f}ms'.format(
+            action, len(durations), sum(durations) / len(durations) * 1000,
+            durations[int(len(durations) * 0.95)] * 1000, durations[-1] * 1000))
+    return '\n'.join(lines)
@@ -0,0 +1,366 @@
+
+import os
+import time
+import logging
+import pymel.core as pm
+
+import events
+import utils
+
+
+__all__ = [
+    "disableTelemetry",
+    "enableTelemetry",
+    "flushTelemetry",
+    "formatUsageReport",
+    "getTelemetryPath",
+    "getUsageReport",
+    "isTelemetryEnabled",
+    "readTelemetry",
+    "recordPick",
+    "suggestRadialAssignments",
+]
+
+
+LOG = logging.getLogger("quickmenus")
+
+
+# Usage Telemetry
+# ---------------
+# When enabled, every menu item that is picked is recorded to a local append-only log,
+# one tab separated line per pick: (time, menu class, group, radial path, pick time ms,
+# label), where group identifies the menu data the items were built from, e.g. the
+# collection of a quick select menu, the radial path is the positions of the item and
+# its parent sub menus joined by '/', and pick time is the time from the menu being
+# shown to the item being picked.
+# Picks are buffered in memory, and written in batches during idle time.
+
+# environment variable that can be used to override the default log path
+TELEMETRY_PATH_ENV = "QUICKMENUS_USAGE_LOG"
+
+# the number of buffered picks that queues writing them to the log
+FLUSH_BATCH_SIZE = 20
+
+# the owner of all event callbacks registered for telemetry
+TELEMETRY_EVENT_OWNER = 'quickmenus.telemetry'
+
+# the radial path recorded for items without a radial position
+NO_RADIAL_POSITION = '-'
+
+# radial positions in the order they are assumed to be fastest to
+# reach, used to rank positions that have too few recorded picks
+DEFAULT_POSITION_ORDER = ['N', 'S', 'E', 'W', 'NE', 'NW', 'SE', 'SW']
+
+# the resolution in seconds of pick times when ranking positions, so that
+# positions with nearly the same pick time are ranked by the default order
+POSITION_TIME_RESOLUTION = 0.025
+
+# the log path while telemetry is enabled, or None when disabled
+_TELEMETRY_PATH = None
+
+# picks that have not been written to the log yet
+_BUFFER = []
+
+# whether a flush is currently queued to run during idle time
+_IS_FLUSH_QUEUED = False
+
+
+def getTelemetryPath():
+    """
+    Return the path of the usage log
+    """
+    if _TELEMETRY_PATH:
+        return _TELEMETRY_PATH
+    if os.environ.get(TELEMETRY_PATH_ENV):
+        return os.environ[TELEMETRY_PATH_ENV]
+    return os.path.join(pm.internalVar(userAppDir=True), 'quickmenus', 'usage.log')
+
+
+def enableTelemetry(path=None):
+    """
+    Start recording the menu items that are picked. Telemetry
+    is disabled by default, and is not remembered between sessions.
+
+    Args:
+        path: An optional string path of the log to append to,
+            defaults to the path returned by `getTelemetryPath`
+    """
+    global _TELEMETRY_PATH
+    disableTelemetry()
+    _TELEMETRY_PATH = path or getTelemetryPath()
+    events.addEventCallback('quitApplication', flushTelemetry, TELEMETRY_EVENT_OWNER)
+    LOG.debug('Recording menu usage to: {0}'.format(_TELEMETRY_PATH))
+
+
+def disableTelemetry():
+    """
+    Stop recording the menu items that are picked, and
+    write any picks that are still buffered to the log
+    """
+    global _TELEMETRY_PATH
+    flushTelemetry()
+    events.removeEventCallbacks(TELEMETRY_EVENT_OWNER)
+    _TELEMETRY_PATH = None
+
+
+def isTelemetryEnabled():
+    """
+    Return True if picked menu items are being recorded
+    """
+    return _TELEMETRY_PATH is not None
+
+
+def recordPick(menuCls, label, radialPath, pickTime=None, group=''):
+    """
+    Record that a menu item was picked. Only buffers the pick,
+    so that it can be called when the item is picked.
+
+    Args:
+        menuCls: The MarkingMenu or RMBMarkingMenu class of the menu
+        label: A string label of the item
+        radialPath: A tuple of radial positions of the item and its parent sub
+            menus, e.g. ('NW', 'E'), containing None for items without a position
+        pickTime: A float number of seconds from the menu being shown to the pick
+        group: A string identifying the menu data the item was built from,
+            see `MenuMixin.getTelemetryGroup`
+    """
+    global _IS_FLUSH_QUEUED
+    if _TELEMETRY_PATH is None:
+        return
+    _BUFFER.append((time.time(), menuCls, label, radialPath, pickTime, group))
+    if len(_BUFFER) >= FLUSH_BATCH_SIZE and not _IS_FLUSH_QUEUED:
+        _IS_FLUSH_QUEUED = True
+        pm.evalDeferred(flushTelemetry, lowestPriority=True)
+
+
+def flushTelemetry():
+    """
+    Write all buffered picks to the log
+    """
+    global _IS_FLUSH_QUEUED
+    _IS_FLUSH_QUEUED = False
+    if not _BUFFER:
+        return
+    picks = list(_BUFFER)
+    del _BUFFER[:]
+    path = _TELEMETRY_PATH or getTelemetryPath()
+    lines = [_formatPick(*pick) for pick in picks]
+    try:
+        dirName = os.path.dirname(path)
+        if dirName and not os.path.isdir(dirName):
+            os.makedirs(dirName)
+        with open(path, 'a') as fp:
+            fp.write(''.join(lines))
+    except (IOError, OSError) as e:
+        LOG.warning('Failed to write menu usage to {0}: {1}'.format(path, e))
+
+
+def _formatPick(timestamp, menuCls, label, radialPath, duration, group):
+    menuName = '{0}.{1}'.format(menuCls.__module__, menuCls.__name__)
+    path = '/'.join([p or NO_RADIAL_POSITION for p in radialPath])
+    durationMs = int(duration * 1000) if duration is not None else -1
+    # groups and labels may not contain the separators
+    group = _stripSeparators(group)
+    label = _stripSeparators(label)
+    return '{0}\t{1}\t{2}\t{3}\t{4}\t{5}\n'.format(int(timestamp), menuName, group, path, durationMs, label)
+
+
+def _stripSeparators(text):
+    return (text or '').replace('\t', ' ').replace('\n', ' ')
+
+
+def readTelemetry(path=None):
+    """
+    Iterate over all picks in a usage log, yielding (time, menuName, group, radialPath,
+    pickTime, label) for each pick, where menuName is the 'module.Class' name of
+    the menu class, group is the string passed to `recordPick`, radialPath is a tuple
+    of radial positions, and pickTime is a float number of seconds, or None if unknown.
+
+    Args:
+        path: An optional string path of the log, defaults to `getTelemetryPath`
+    """
+    path = path or getTelemetryPath()
+    if not os.path.isfile(path):
+        return
+    with open(path, 'r') as fp:
+        for line in fp:
+            parts = line.rstrip('\n').split('\t', 5)
+            if len(parts) == 5:
+                # picks recorded before groups were added
+                parts.insert(2, '')
+            if len(parts) != 6:
+                # the last line may be partial if maya exited while writing
+                continue
+            try:
+                timestamp = int(parts[0])
+                durationMs = int(parts[4])
+            except ValueError:
+                continue
+            radialPath = tuple([p if p != NO_RADIAL_POSITION else None for p in parts[3].split('/')])
+            pickTime = durationMs / 1000.0 if durationMs >= 0 else None
+            yield (timestamp, parts[1], parts[2], radialPath, pickTime, parts[5])
+
+
+def _median(values):
+    values = sorted(values)
+    if not values:
+        return None
+    return values[len(values) // 2]
+
+
+def getUsageReport(path=None, since=None):
+    """
+    Return a dict of usage statistics for each menu class, indexed by menu name.
+    Each value is a list of dicts, one per item of each group, sorted by most picked,
+    containing 'label', 'group', 'radialPath' (the path it was most picked at), 'count',
+    and 'pickTime' (the median pick time in seconds, or None).
+
+    Args:
+        path: An optional string path of the log, defaults to `getTelemetryPath`
+        since: An optional time in seconds since the epoch, picks before it are ignored
+    """
+    # (count per radial path, pick times) of each item, indexed by (menuName, group, label)
+    stats = {}
+    for timestamp, menuName, group, radialPath, duration, label in readTelemetry(path):
+        if since is not None and timestamp < since:
+            continue
+        counts, durations = stats.setdefault((menuName, group, label), ({}, []))
+        counts[radialPath] = counts.get(radialPath, 0) + 1
+        if duration is not None:
+            durations.append(duration)
+    report = {}
+    for (menuName, group, label), (counts, durations) in stats.items():
+        report.setdefault(menuName, []).append({
+            'label': label,
+            'group': group,
+            'radialPath': max(counts, key=lambda p: (counts[p], [x or '' for x in p])),
+            'count': sum(counts.values()),
+            'pickTime': _median(durations),
+        })
+    for items in report.values():
+        items.sort(key=lambda i: (-i['count'], i['group'], i['label']))
+    return report
+
+
+def _getPositionTimes(report, minCount):
+    """
+    Return the median pick time of each top level radial position across
+    all menus, for positions that were picked at least minCount times
+    """
+    durations = {}
+    for items in report.values():
+        for item in items:
+            if len(item['radialPath']) == 1 and item['pickTime'] is not None:
+                durations.setdefault(item['radialPath'][0], []).extend([item['pickTime']] * item['count'])
+    return dict([(p, _median(d)) for p, d in durations.items() if p and len(d) >= minCount])
+
+
+def _rankPositions(positions, positionTimes):
+    """
+    Return radial paths sorted from fastest to slowest to reach. Top level positions with
+    recorded pick times are ranked by them, followed by the rest in the default order,
+    and then nested paths, which always take an extra gesture.
+    """
+    def getOrder(p):
+        if p in DEFAULT_POSITION_ORDER:
+            return DEFAULT_POSITION_ORDER.index(p)
+        return len(DEFAULT_POSITION_ORDER)
+
+    def sortKey(radialPath):
+        order = [getOrder(p) for p in radialPath]
+        if len(radialPath) != 1 or radialPath[0] not in utils.RADIAL_POSITIONS:
+            return (2, len(radialPath), 0, order)
+        if radialPath[0] in positionTimes:
+            return (0, 0, int(positionTimes[radialPath[0]] / POSITION_TIME_RESOLUTION), order)
+        return (1, 0, 0, order)
+    return sorted(positions, key=sortKey)
+
+
+def suggestRadialAssignments(path=None, since=None, minCount=5):
+    """
+    Return a list of suggested radial position changes that would put the most
+    picked items of each menu on the fastest positions it currently uses. Each
+    suggestion is a dict containing 'menu', 'group', 'label', 'count', 'from', and
+    'to', where from and to are radial paths. Items are only moved between positions
+    that are used by the same group of the menu, each holding the item most picked
+    there, so applying all suggestions for a group swaps items without changing
+    the menu's layout.
+
+    Args:
+        path: An optional string path of the log, defaults to `getTelemetryPath`
+        since: An optional time in seconds since the epoch, picks before it are ignored
+        minCount: An int minimum number of picks of a position before its recorded pick
+            time is used for ranking, and of an item before it is suggested to move
+    """
+    report = getUsageReport(path, since)
+    positionTimes = _getPositionTimes(report, minCount)
+    suggestions = []
+    for menuName in sorted(report):
+        # the item at each radial path, indexed by group, where items that were
+        # picked at the same path as a more picked item are no longer there
+        occupants = {}
+        for item in report[menuName]:
+            occupants.setdefault(item['group'], {}).setdefault(item['radialPath'], item)
+        for group in sorted(occupants):
+            items = [i for i in report[menuName] if occupants[group].get(i['radialPath']) is i]
+            ranked = _rankPositions(occupants[group].keys(), positionTimes)
+            suggestions.extend(_suggestMoves(menuName, group, items, ranked, minCount))
+    return suggestions
+
+
+def _suggestMoves(menuName, group, items, ranked, minCount):
+    """
+    Return suggestions that move each item, sorted by most picked,
+    to the radial path with the same index in `ranked`
+    """
+    suggestions = []
+    for item, radialPath in zip(items, ranked):
+        if item['count'] < minCount:
+            break
+        if item['radialPath'] != radialPath:
+            suggestions.append({
+                'menu': menuName,
+                'group': group,
+                'label': item['label'],
+                'count': item['count'],
+                'from': item['radialPath'],
+                'to': radialPath,
+            })
+    return suggestions
+
+
+def formatUsageReport(path=None, since=None, minCount=5, maxItems=10):
+    """
+    Return a text report of the most picked items of each
+    menu, and suggested radial position changes
+
+    Args:
+        path: An optional string path of the log, defaults to `getTelemetryPath`
+        since: An optional time in seconds since the epoch, picks before it are ignored
+        minCount: An int minimum number of picks, see `suggestRadialAssignments`
+        maxItems: An int maximum number of items to list per menu
+    """
+    def formatPath(radialPath):
+        return '/'.join([p or NO_RADIAL_POSITION for p in radialPath])
+
+    def formatMenu(menuName, group):
+        return '{0} ({1})'.format(menuName, group) if group else menuName
+
+    lines = []
+    report = getUsageReport(path, since)
+    for menuName in sorted(report):
+        for group in sorted(set([i['group'] for i in report[menuName]])):
+            lines.append(formatMenu(menuName, group))
+            items = [i for i in report[menuName] if i['group'] == group]
+            for item in items[:maxItems]:
+                pickTime = '{0:.0f}ms'.format(item['pickTime'] * 1000) if item['pickTime'] is not None else '-'
+                lines.append('  {0:>5} {1:<6} {2:>7}  {3}'.format(
+                    item['count'], formatPath(item['radialPath']), pickTime, item['label']))
+    suggestions = suggestRadialAssignments(path, since, minCount)
+    if suggestions:
+        lines.append('suggested radial positions:')
+        for s in suggestions:
+            lines.append('  {0}: move {1!r} ({2} picks) from {3} to {4}'.format(
+                formatMenu(s['menu'], s['group']), s['label'], s['count'],
+                formatPath(s['from']), formatPath(s['to'])))
+    return '\n'.join(lines)
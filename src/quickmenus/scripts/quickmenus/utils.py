@@ -5,10 +5,31 @@ import pymel.core as pm
 __all__ = [
     "getHotkeyKwargs",
     "getModifiers",
+    "getModifiersFromString",
+    "getRadialMenuPaths",
     "getRadialMenuPositions",
+    "getRadialVacancies",
+    "RADIAL_POSITIONS",
+    "RadialLayout",
 ]
 
 
+# all radial positions, in clockwise order starting at north
+RADIAL_POSITIONS = ['N', 'NE', 'E', 'SE', 'S', 'SW', 'W', 'NW']
+
+# distributed radial positions for small numbers of items, indexed by count
+DISTRIBUTED_RADIAL_POSITIONS = [
+    [], ['N'], ['N', 'S'], ['N', 'E', 'W'], ['N', 'E', 'S', 'W'],
+]
+
+# the radial position used for the overflow sub menu when
+# there are more items than positions at one level
+RADIAL_OVERFLOW_POSITION = 'NW'
+
+# cached radial paths for a number of items, indexed by (count, distribute, positions)
+_RADIAL_PATHS_CACHE = {}
+
+
 def getModifiers():
     """
     Return the state of all modifier keys
@@ -23,6 +44,23 @@ def getModifiers():
     return (isShiftPressed, isCtrlPressed, isAltPressed)
 
 
+def getModifiersFromString(modifierString):
+    """
+    Return the state of modifier keys represented by a string
+
+    Args:
+        modifierString: A string representing modifier keys, e.g. 'Alt+Shift'
+
+    Returns:
+        A tuple of bools representing (isShiftPressed, isCtrlPressed, isAltPressed)
+    """
+    split = [s for s in modifierString.lower().split('+') if s]
+    for s in split:
+        if s not in ('shift', 'ctrl', 'alt'):
+            raise ValueError('Invalid modifierString: ' + modifierString)
+    return ('shift' in split, 'ctrl' in split, 'alt' in split)
+
+
 def getHotkeyKwargs(keyString):
     """
     Return kwargs to be given to the maya `hotkey` command given a hotkey string
@@ -52,24 +90,120 @@ def getHotkeyKwargs(keyString):
 def getRadialMenuPositions(count):
     """
     Return a list of radial positions for the given number of items.
-    Positions are distributed when count is lower than 8
+    Positions are distributed when count is lower than 5,
+    and items beyond the 8th are given None.
 
     Args:
         count: An int representing number of items in the menu
     """
     if count < 0:
         raise ValueError("count cannot be negative")
-    defaults = [
-        [], ['N'], ['N', 'S'], ['N', 'E', 'W'], ['N', 'E', 'S', 'W'],
-    ]
-    ordered = ['N', 'NE', 'E', 'SE', 'S', 'SW', 'W', 'NW']
-    if count < len(defaults):
-        return defaults[count]
-    else:
-        results = []
-        for i in range(count):
-            if i < len(ordered):
-                results.append(ordered[i])
+    if count < len(DISTRIBUTED_RADIAL_POSITIONS):
+        return DISTRIBUTED_RADIAL_POSITIONS[count][:]
+    results = RADIAL_POSITIONS[:count]
+    results.extend([None] * (count - len(results)))
+    return results
+
+
+def getRadialMenuPaths(count, distribute=True, positions=None):
+    """
+    Return a tuple of radial paths for the given number of items, where
+    each path is a tuple of radial positions, one per sub menu level.
+    When there are more than 8 items, the overflow position holds a
+    radial sub menu containing the remaining items, so that every
+    item can be reached with a gesture, e.g. ('NW', 'E').
+    Results are precomputed once per count.
+
+    Args:
+        count: An int representing number of items in the menu
+        distribute: A bool, when True, positions are distributed
+            when count is lower than 5
+        positions: An optional list of the top level radial positions that are
+            available, e.g. those not used by items with fixed positions. When
+            there are more items, the last of them holds the overflow sub menu.
+            Top level positions are not distributed when given.
+    """
+    if count < 0:
+        raise ValueError("count cannot be negative")
+    if positions is not None:
+        positions = tuple(positions)
+        if count and not positions:
+            raise ValueError("no radial positions are available")
+    key = (count, distribute, positions)
+    paths = _RADIAL_PATHS_CACHE.get(key)
+    if paths is None:
+        if positions is not None:
+            if count <= len(positions):
+                paths = tuple([(p,) for p in positions[:count]])
             else:
-                results.append(None)
-        return results
\ No newline at end of file
+                overflow = getRadialMenuPaths(count - len(positions) + 1, distribute)
+                paths = tuple([(p,) for p in positions[:-1]] + [(positions[-1],) + p for p in overflow])
+        elif count <= len(RADIAL_POSITIONS):
+            if distribute and count < len(DISTRIBUTED_RADIAL_POSITIONS):
+                positions = DISTRIBUTED_RADIAL_POSITIONS[count]
+            else:
+                positions = RADIAL_POSITIONS[:count]
+            paths = tuple([(p,) for p in positions])
+        else:
+            positions = [p for p in RADIAL_POSITIONS if p != RADIAL_OVERFLOW_POSITION]
+            overflow = getRadialMenuPaths(count - len(positions), distribute)
+            paths = tuple([(p,) for p in positions] + [(RADIAL_OVERFLOW_POSITION,) + p for p in overflow])
+        _RADIAL_PATHS_CACHE[key] = paths
+    return paths
+
+
+def getRadialVacancies(occupied):
+    """
+    Return the list of radial positions that are not occupied,
+    in clockwise order starting at north
+
+    Args:
+        occupied: An iterable of occupied radial positions
+    """
+    occupied = set(occupied)
+    return [p for p in RADIAL_POSITIONS if p not in occupied]
+
+
+
+
+class RadialLayout(object):
+    """
+    Assigns radial paths (see `getRadialMenuPaths`) to any number of keyed items.
+    Each key keeps its slot for as long as it is laid out, so adding items
+    never moves existing ones, with one exception: when a 9th item is added,
+    the item in the overflow position moves to the first position of
+    the overflow sub menu. Freed slots are reused by new keys.
+    """
+
+    def __init__(self):
+        # the slot index of each key, indexed by key
+        self.slots = {}
+
+    def layout(self, keys, positions=None):
+        """
+        Return a list of radial paths, one for each key
+
+        Args:
+            keys: A list of hashable keys identifying each item, e.g. names
+            positions: An optional list of the top level radial positions
+                that are available, see `getRadialMenuPaths`
+        """
+        keySet = set(keys)
+        self.slots = dict([(k, i) for k, i in self.slots.items() if k in keySet])
+        used = set(self.slots.values())
+        nextSlot = 0
+        for k in keys:
+            if k not in self.slots:
+                while nextSlot in used:
+                    nextSlot += 1
+                self.slots[k] = nextSlot
+                used.add(nextSlot)
+        count = max(used) + 1 if used else 0
+        paths = getRadialMenuPaths(count, distribute=False, positions=positions)
+        return [paths[self.slots[k]] for k in keys]
+
+    def clear(self):
+        """
+        Clear all assignments
+        """
+        self.slots = {}
@@ -0,0 +1,135 @@
+
+import os
+import sys
+import types
+import importlib.util
+
+# Stub maya, pymel and rmbmenuhook modules, so that the menu session and event
+# code can be tested with plain python. The package uses implicit relative
+# imports, so its modules are imported from the package directory directly,
+# and a `quickmenus` package is assembled from them the same way __init__ does.
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+PACKAGE_DIR = os.path.join(TESTS_DIR, '..', 'src', 'quickmenus', 'scripts', 'quickmenus')
+
+# the modules that make up the top level of the quickmenus package
+PACKAGE_MODULES = ['core', 'events', 'telemetry', 'utils']
+
+
+class StubCommand(object):
+    """
+    A maya command, api class or constant that does nothing
+    and returns stub commands for all its attributes
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return '<StubCommand {0}>'.format(self.name)
+
+    def __call__(self, *args, **kwargs):
+        return None
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return StubCommand('{0}.{1}'.format(self.name, name))
+
+
+class StubModule(types.ModuleType):
+    """
+    A module that returns stub commands for all attributes that are not defined
+    """
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return StubCommand('{0}.{1}'.format(self.__name__, name))
+
+
+class Callback(object):
+    def __init__(self, func, *args, **kwargs):
+        self.func, self.args, self.kwargs = func, args, kwargs
+
+    def __call__(self, *args):
+        return self.func(*self.args, **self.kwargs)
+
+
+class CallbackWithArgs(Callback):
+    def __call__(self, *args):
+        return self.func(*(self.args + args), **self.kwargs)
+
+
+class Menu(object):
+    def __init__(self, menu, obj=None):
+        self.menu = menu
+        self.obj = obj
+
+
+def _addModule(name, **attrs):
+    if name in sys.modules:
+        return sys.modules[name]
+    module = StubModule(name)
+    for k, v in attrs.items():
+        setattr(module, k, v)
+    sys.modules[name] = module
+    parentName, _, childName = name.rpartition('.')
+    if parentName:
+        setattr(sys.modules[parentName], childName, module)
+    return module
+
+
+def install():
+    """
+    Install stubs for the maya modules that are not already loaded,
+    and return the `quickmenus` package assembled from its modules
+    """
+    if 'quickmenus' in sys.modules:
+        return sys.modules['quickmenus']
+    _addModule('maya')
+    _addModule('maya.OpenMaya')
+    _addModule('maya.utils')
+    _addModule('pymel')
+    _addModule('pymel.core', Callback=Callback, CallbackWithArgs=CallbackWithArgs)
+    _addModule('rmbmenuhook', Menu=Menu)
+    _addModule('pymetanode')
+
+    sys.path.insert(0, os.path.abspath(PACKAGE_DIR))
+    package = types.ModuleType('quickmenus')
+    package.__path__ = [os.path.abspath(PACKAGE_DIR)]
+    for name in PACKAGE_MODULES:
+        module = importlib.import_module(name)
+        setattr(package, name, module)
+        sys.modules['quickmenus.' + name] = module
+        for k in module.__all__:
+            setattr(package, k, getattr(module, k))
+    sys.modules['quickmenus'] = package
+    return package
+
+
+def importSubPackageCore(name):
+    """
+    Return the core module of a sub package, e.g. 'qmenus', whose
+    other modules are imported as top level modules by its implicit imports
+
+    Args:
+        name: A string name of the sub package
+    """
+    install()
+    fullName = 'quickmenus.{0}.core'.format(name)
+    if fullName in sys.modules:
+        return sys.modules[fullName]
+    subPackageDir = os.path.abspath(os.path.join(PACKAGE_DIR, name))
+    subPackage = types.ModuleType('quickmenus.' + name)
+    subPackage.__path__ = [subPackageDir]
+    sys.modules[subPackage.__name__] = subPackage
+    # the package modules are already loaded, so they can't be shadowed
+    sys.path.insert(0, subPackageDir)
+    try:
+        spec = importlib.util.spec_from_file_location(fullName, os.path.join(subPackageDir, 'core.py'))
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[fullName] = module
+        spec.loader.exec_module(module)
+    finally:
+        sys.path.remove(subPackageDir)
+    return module
@@ -0,0 +1,185 @@
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+# mafile does not import maya, so it can be tested with plain python
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(TESTS_DIR, '..', 'src', 'quickmenus', 'scripts', 'quickmenus', 'fmenus'))
+
+import mafile
+
+
+FIXTURES_DIR = os.path.join(TESTS_DIR, 'fixtures')
+
+DEFAULT_SETS = [
+    {'id': 'a1', 'nodes': ['|ctl_1', '|ctl_2'], 'position': 'N', 'title': 'say "hi"'},
+    {'id': 'a2', 'nodes': ['|ctl_3'], 'position': 'S', 'title': "it's"},
+]
+
+ANIM_DATA = {
+    'isTemplate': True,
+    'sets': [{'id': 'b1', 'nodes': ['|grp|body_ctl', '|grp|arm_ctl'], 'position': 'E', 'title': 'body'}],
+    'groups': [{
+        'id': 'g1', 'position': 'W', 'title': 'face', 'groups': [],
+        'sets': [{'id': 'b2', 'nodes': ['|grp|jaw_ctl'], 'position': 'N', 'title': 'jaw'}],
+    }],
+}
+
+
+def readLines(path):
+    with open(path, 'rb') as fp:
+        return fp.read().splitlines(True)
+
+
+def isMetaDataLine(line):
+    # the first line of a pyMetaData setAttr, or a continuation line of a long string
+    line = line.strip()
+    return line.startswith(b'setAttr ".pyMetaData"') or line.startswith(b'"') or line.startswith(b'+ "')
+
+
+class MelStringTest(unittest.TestCase):
+
+    def test_decode(self):
+        self.assertEqual(mafile.decodeMelString(r'"a \"b\" \\ c\nd"'), 'a "b" \\ c\nd')
+
+    def test_roundTrip(self):
+        for value in ['', 'plain', 'say "hi"', "it's", 'back\\slash', 'tab\tnew\nline']:
+            self.assertEqual(mafile.decodeMelString(mafile.encodeMelString(value)), value)
+
+
+class MaFileTestCase(unittest.TestCase):
+
+    fixture = 'scene.ma'
+
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tempDir, self.fixture)
+        shutil.copy(os.path.join(FIXTURES_DIR, self.fixture), self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tempDir)
+
+
+class IterCollectionsTest(MaFileTestCase):
+
+    def test_findsCollections(self):
+        names = [name for name, data in mafile.iterCollections(self.path)]
+        self.assertEqual(names, ['quickSelectCollection_Default', 'char1:quickSelectCollection_Anim'])
+
+    def test_escapedQuotes(self):
+        data = mafile.readCollections(self.path)['quickSelectCollection_Default']
+        self.assertEqual(data['sets'], DEFAULT_SETS)
+
+    def test_multiLineStrings(self):
+        data = mafile.readCollections(self.path)['char1:quickSelectCollection_Anim']
+        self.assertEqual(data, ANIM_DATA)
+
+    def test_ignoresOtherNodes(self):
+        collections = mafile.readCollections(self.path)
+        self.assertNotIn('someOtherNetwork', collections)
+        # network nodes with a collection name, but no collection metadata
+        self.assertNotIn('quickSelectCollection_Other', collections)
+        # collection metadata on a node that is not a network
+        self.assertNotIn('quickSelectCollection_NotANetwork', collections)
+
+
+class IterCollectionsCRLFTest(IterCollectionsTest):
+
+    fixture = 'scene_crlf.ma'
+
+
+class RewriteCollectionsTest(MaFileTestCase):
+
+    def test_unchanged(self):
+        before = readLines(self.path)
+        changed = mafile.rewriteCollections(self.path, lambda name, data: None)
+        self.assertEqual(changed, [])
+        self.assertEqual(readLines(self.path), before)
+        self.assertEqual(os.listdir(self.tempDir), [self.fixture])
+
+    def test_sameData(self):
+        # rewriting the same data only changes the metadata lines
+        before = readLines(self.path)
+        changed = mafile.rewriteCollections(self.path, lambda name, data: data)
+        self.assertEqual(sorted(changed), ['char1:quickSelectCollection_Anim', 'quickSelectCollection_Default'])
+        after = readLines(self.path)
+        self.assertEqual([l for l in after if not isMetaDataLine(l)],
+                         [l for l in before if not isMetaDataLine(l)])
+        self.assertEqual(mafile.readCollections(self.path)['char1:quickSelectCollection_Anim'], ANIM_DATA)
+
+    def test_rewriteData(self):
+        def transform(name, data):
+            if name == 'quickSelectCollection_Default':
+                data['sets'].append({'id': 'a3', 'nodes': ['|ctl_4'], 'position': 'E', 'title': 'new'})
+                return data
+
+        changed = mafile.rewriteCollections(self.path, transform)
+        self.assertEqual(changed, ['quickSelectCollection_Default'])
+        collections = mafile.readCollections(self.path)
+        self.assertEqual([s['title'] for s in collections['quickSelectCollection_Default']['sets']],
+                         ['say "hi"', "it's", 'new'])
+        self.assertEqual(collections['char1:quickSelectCollection_Anim'], ANIM_DATA)
+
+    def test_headerAttributes(self):
+        def transform(name, data):
+            if name == 'quickSelectCollection_Default':
+                data['sets'] = data['sets'][:1]
+                data['isTemplate'] = True
+            else:
+                data['isTemplate'] = False
+            return data
+
+        mafile.rewriteCollections(self.path, transform)
+        lines = [l.rstrip(b'\r\n') for l in readLines(self.path)]
+        setCounts = [l.strip() for l in lines if b'setAttr ".quickSelectSetCount"' in l]
+        templates = [l.strip() for l in lines if b'setAttr ".quickSelectIsTemplate"' in l]
+        # the Default set count, and the Anim count of one set and one nested set
+        self.assertEqual(setCounts, [b'setAttr ".quickSelectSetCount" 1;', b'setAttr ".quickSelectSetCount" 2;'])
+        self.assertEqual(templates, [b'setAttr ".quickSelectIsTemplate" yes;', b'setAttr ".quickSelectIsTemplate" no;'])
+
+    def test_longStrings(self):
+        nodes = ['|grp|ctl_{0}'.format(i) for i in range(200)]
+
+        def transform(name, data):
+            data['sets'][0]['nodes'] = nodes
+            return data
+
+        mafile.rewriteCollections(self.path, transform)
+        lines = readLines(self.path)
+        self.assertTrue(max([len(l) for l in lines]) < mafile.STRING_CHUNK_SIZE + 20)
+        collections = mafile.readCollections(self.path)
+        self.assertEqual(collections['quickSelectCollection_Default']['sets'][0]['nodes'], nodes)
+
+    def test_outPath(self):
+        before = readLines(self.path)
+        outPath = os.path.join(self.tempDir, 'out.ma')
+        mafile.rewriteCollections(self.path, lambda name, data: data, outPath)
+        self.assertEqual(readLines(self.path), before)
+        self.assertEqual(mafile.readCollections(outPath), mafile.readCollections(self.path))
+
+    def test_failureRemovesTempFile(self):
+        before = readLines(self.path)
+
+        def transform(name, data):
+            raise RuntimeError('failed')
+
+        self.assertRaises(RuntimeError, mafile.rewriteCollections, self.path, transform)
+        self.assertEqual(readLines(self.path), before)
+        self.assertEqual(os.listdir(self.tempDir), [self.fixture])
+
+
+class RewriteCollectionsCRLFTest(RewriteCollectionsTest):
+
+    fixture = 'scene_crlf.ma'
+
+    def test_lineEndings(self):
+        mafile.rewriteCollections(self.path, lambda name, data: data)
+        lines = readLines(self.path)
+        self.assertTrue(all([l.endswith(b'\r\n') for l in lines]))
+
+
+if __name__ == '__main__':
+    unittest.main()
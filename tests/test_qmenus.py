@@ -0,0 +1,56 @@
+
+import unittest
+
+import mayastubs
+
+quickmenus = mayastubs.install()
+qmenus = mayastubs.importSubPackageCore('qmenus')
+core = quickmenus.core
+events = quickmenus.events
+
+
+class OtherMenu(core.MarkingMenu):
+
+    prewarmEvents = ['Undo']
+
+
+class EnableDisableTest(unittest.TestCase):
+
+    def setUp(self):
+        self.saved = (core.REGISTERED_MENUS, core.MENU_VARIANTS, core._REGISTERED_MENU_SNAPSHOTS)
+        core.REGISTERED_MENUS = {}
+        core.MENU_VARIANTS = {}
+        core._REGISTERED_MENU_SNAPSHOTS = {}
+        events.removeEventCallbacks()
+
+    def tearDown(self):
+        events.removeEventCallbacks()
+        core.REGISTERED_MENUS, core.MENU_VARIANTS, core._REGISTERED_MENU_SNAPSHOTS = self.saved
+
+    def test_enable(self):
+        qmenus.enable()
+        self.assertEqual(sorted(core.REGISTERED_MENUS), ['AltQMenus', 'QMenus'])
+        self.assertTrue(events.hasEventCallbacks(qmenus.EVENT_OWNER))
+        self.assertTrue(events.hasEventCallbacks(qmenus.display.TRACKING_EVENT_OWNER))
+        self.assertIn('SelectTypeChanged', events._EVENT_JOBS)
+
+    def test_disableRemovesCallbacks(self):
+        qmenus.enable()
+        qmenus.disable()
+        self.assertEqual(core.REGISTERED_MENUS, {})
+        self.assertEqual(core.MENU_VARIANTS, {})
+        self.assertEqual(events.getEventCallbacks(), [])
+        self.assertEqual(events._EVENT_JOBS, {})
+
+    def test_disableKeepsOtherMenus(self):
+        core.registerMenu('OtherMenus', OtherMenu)
+        qmenus.enable()
+        qmenus.disable()
+        self.assertEqual(sorted(core.REGISTERED_MENUS), ['OtherMenus'])
+        # only the prewarm events of the remaining menus are installed
+        self.assertEqual(sorted(events._EVENT_JOBS), ['Undo'])
+        self.assertEqual(len(events.getEventCallbacks(owner=core.PREWARM_EVENT_OWNER)), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,32 @@
+
+import unittest
+
+import mayastubs
+
+mayastubs.install()
+
+import simulation
+
+
+class SimulationTest(unittest.TestCase):
+
+    def assertNoFailures(self, results):
+        self.assertEqual(results['failures'], [], simulation.formatResults(results))
+
+    def test_regressionSequences(self):
+        results = simulation.runRegressionTests()
+        self.assertEqual(sorted(results), sorted(simulation.REGRESSION_SEQUENCES))
+        for name, result in sorted(results.items()):
+            self.assertNoFailures(result)
+
+    def test_stress(self):
+        for seed in range(5):
+            self.assertNoFailures(simulation.runStressTest(5000, seed=seed))
+
+    def test_stressDroppedReleases(self):
+        for seed in range(5):
+            self.assertNoFailures(simulation.runStressTest(2000, seed=seed, dropRate=0.3))
+
+
+if __name__ == '__main__':
+    unittest.main()